@@ -0,0 +1,84 @@
+"""
+Micro-benchmark: decode cost of nested (list/dict) cells.
+
+Compares the legacy Python repr cells, decoded one by one with
+ast.literal_eval(), with the canonical JSON cells written since, decoded one
+by one with json.loads() and as a whole column by nested.decode_column().
+The cells are the 'json' columns of recorded exports when available (see
+bench_flatten.py) and synthetic exports otherwise. Reports time per cell.
+
+Usage: python benchmarks/bench_decode.py --source unhcr [--exports DIR] [--records 1000]
+"""
+
+import argparse
+import ast
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+import pandas as pd
+from bench_flatten import load_records
+from sources import registry
+from schemas.column_mappings import get_schema_for_source
+from schemas.extractor import SchemaExtractor
+from storage import nested
+from storage.csv_format import format_cell
+
+
+def nested_cells(records, schema):
+    """Return the non-empty 'json' cells of the records as (repr, JSON) text pairs."""
+    extractor = SchemaExtractor(schema)
+    columns = set(nested.json_columns(schema))
+    cells = []
+    for record in records:
+        for column, value in extractor.extract(record).items():
+            if column in columns and isinstance(value, (list, dict)):
+                cells.append((repr(value), format_cell(value)))
+    return cells
+
+
+def measure(label, function, cells, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function(cells)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    print(f"{label:<22}{best / len(cells) * 1e6:>12.2f}")
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark nested cell decoding")
+    parser.add_argument("--source", choices=registry.names(), default="unhcr")
+    parser.add_argument("--exports", help="directory of recorded export JSON files")
+    parser.add_argument("--records", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    schema = get_schema_for_source(args.source)
+    records, description = load_records(args.source, args.exports, args.records)
+    cells = nested_cells(records, schema)
+    if not cells:
+        print(f"{args.source}: no nested cells in {description}")
+        return
+    repr_cells = [text for text, _ in cells]
+    json_series = pd.Series([text for _, text in cells])
+
+    print(f"{args.source}: {len(cells)} nested cells from {description}")
+    print(f"{'decoder':<22}{'us/cell':>12}")
+    old, expected = measure("repr literal_eval", lambda c: [ast.literal_eval(text) for text in c],
+                            repr_cells, args.repeat)
+    _, per_cell = measure("json.loads", lambda c: [json.loads(text) for text in c], json_series.tolist(),
+                          args.repeat)
+    new, batch = measure("decode_column", nested.decode_column, json_series, args.repeat)
+    if per_cell != expected or batch.tolist() != expected:
+        raise SystemExit("The decoders disagree")
+    print(f"speed-up: {old / new:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Requests-per-second benchmark for the dataset fetch engines.
+
+Compares, against the local NADA stand-in server:
+
+- legacy:   20-thread pool with a bare requests.get per ID (the original behaviour)
+- threads:  fetch_engine thread pool over the shared per-host requests pool
+- async:    fetch_engine asyncio mode over one aiohttp keep-alive pool
+- adaptive: threads, starting low and letting the source's AdaptiveLimiter find the limit
+
+With --error-rate the server answers that share of requests with 503 +
+Retry-After, which exercises the retries and the limiter's back-off.
+
+Usage: python benchmarks/bench_fetch.py --ids 2000 --latency 0.005 [--error-rate 0.02]
+"""
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from nada_server import start_server
+from orchestrators import fetch_engine
+from sources import http_client, registry
+
+
+def point_source_at(source, base_url, concurrency):
+    """Redirect a source's listing and export URLs to the stand-in server."""
+    source.list_url = base_url + "/index.php" + source.list_url.split("/index.php", 1)[1]
+    source.export_url = base_url + "/index.php" + source.export_url.split("/index.php", 1)[1]
+    source.base_url = base_url
+    source.max_concurrency = concurrency
+    http_client.close_sessions()
+    source.connect()
+
+
+def legacy_results(ids, fetch_function, concurrency):
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = {executor.submit(fetch_function, id): id for id in ids}
+        for future in as_completed(futures):
+            try:
+                yield futures[future], future.result(), None
+            except Exception as e:
+                yield futures[future], None, e
+
+
+def run_mode(mode, source, ids, concurrency):
+    if mode == "legacy":
+        def legacy_fetch(id):
+            response = requests.get(source.export_url.format(id=id))
+            response.raise_for_status()
+            return response.json()
+        results = legacy_results(ids, legacy_fetch, concurrency)
+    elif mode == "threads":
+        results = fetch_engine.fetch_results(ids, source.fetch_dataset, "threads", concurrency)
+    elif mode == "adaptive":
+        results = fetch_engine.fetch_results(ids, source.fetch_dataset, "threads", limiter=source.limiter)
+    else:
+        results = fetch_engine.fetch_results(ids, source.fetch_dataset_async, "async", concurrency)
+
+    start = time.perf_counter()
+    errors = sum(1 for _, _, error in results if error is not None)
+    elapsed = time.perf_counter() - start
+    return elapsed, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark dataset fetch engines")
+    parser.add_argument("--ids", type=int, default=2000, help="number of IDs to fetch")
+    parser.add_argument("--latency", type=float, default=0.005, help="server latency per request (s)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered with 503")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--source", choices=registry.names(), default="worldbank")
+    parser.add_argument("--modes", nargs="+", default=["legacy", "threads", "async", "adaptive"])
+    args = parser.parse_args()
+
+    server = start_server(catalog_size=args.ids, latency=args.latency)
+    source = registry.get(args.source)
+    point_source_at(source, server.base_url, args.concurrency)
+    ids = list(range(1, args.ids + 1))
+
+    # Warm the server's document cache so every mode sees the same server cost.
+    run_mode("threads", source, ids, args.concurrency)
+    server.error_rate = args.error_rate
+
+    print(f"{args.ids} {args.source} exports, latency {args.latency * 1000:.1f} ms, concurrency {args.concurrency}")
+    print(f"{'mode':<10}{'seconds':>10}{'req/s':>10}{'errors':>8}")
+    for mode in args.modes:
+        elapsed, errors = run_mode(mode, source, ids, args.concurrency)
+        print(f"{mode:<10}{elapsed:>10.2f}{len(ids) / elapsed:>10.1f}{errors:>8}")
+    print(f"adaptive limit ended at {source.limiter.limit} of {source.limiter.maximum}")
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Micro-benchmark: per-record flatten cost of the schema extractor.
+
+Compares the previous three-step path
+    pd.json_normalize() -> apply_prefix_mapping() -> enforce_schema()
+with the compiled SchemaExtractor, on recorded exports when available
+(the response cache under .cache/http/<source>/, or any directory of
+export JSON files) and synthetic exports otherwise. Reports time per
+record and the tracemalloc allocation peak.
+
+Usage: python benchmarks/bench_flatten.py --source unhcr [--exports DIR] [--records 1000]
+"""
+
+import argparse
+import glob
+import json
+import logging
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+import pandas as pd
+from nada_server import synthetic_export
+from sources import registry
+from schemas.column_mappings import apply_prefix_mapping, enforce_schema, get_schema_for_source
+from schemas.extractor import SchemaExtractor
+from utils import CACHE_PATH
+
+
+def load_records(source_name, exports_dir, limit):
+    exports_dir = exports_dir or os.path.join(CACHE_PATH, "http", source_name)
+    paths = sorted(p for p in glob.glob(os.path.join(exports_dir, "*.json")) if not p.endswith(".meta.json"))
+    if paths:
+        records = []
+        for path in paths[:limit]:
+            with open(path, encoding="utf-8") as f:
+                records.append(json.load(f))
+        return records, f"{len(records)} recorded exports from {exports_dir}"
+    schema = get_schema_for_source(source_name)
+    return [synthetic_export(id, schema) for id in range(1, limit + 1)], f"{limit} synthetic exports"
+
+
+def three_step(records, schema):
+    return enforce_schema(apply_prefix_mapping(pd.json_normalize(records)), schema)
+
+
+def measure(label, function, records):
+    start = time.perf_counter()
+    function(records)
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    function(records)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    per_record = elapsed / len(records) * 1e6
+    print(f"{label:<14}{per_record:>12.1f}{peak / 1024:>14.0f}{peak / len(records):>16.0f}")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark per-record flatten cost")
+    parser.add_argument("--source", choices=registry.names(), default="unhcr")
+    parser.add_argument("--exports", help="directory of recorded export JSON files")
+    parser.add_argument("--records", type=int, default=1000)
+    args = parser.parse_args()
+
+    logging.getLogger("schemas.column_mappings").setLevel(logging.WARNING)
+    schema = get_schema_for_source(args.source)
+    records, description = load_records(args.source, args.exports, args.records)
+    extractor = SchemaExtractor(schema)
+
+    print(f"{args.source}: {description}")
+    print(f"{'path':<14}{'us/record':>12}{'peak KiB':>14}{'peak B/record':>16}")
+    old = measure("three-step", lambda r: three_step(r, schema), records)
+    new = measure("extractor", extractor.to_frame, records)
+    print(f"speed-up: {old / new:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Memory report: datasets.csv loaded untyped vs with the schema dtypes.
+
+Loads a source's datasets.csv three ways and reports the DataFrame's deep
+memory usage and the load time:
+
+- inferred: pd.read_csv() with default type inference
+- text:     every cell as a Python str (fetch_datasets.read_datasets())
+- typed:    schema dtypes (read_datasets(schema=...)): nullable integer ids,
+            categoricals for 'category' and low-cardinality columns, and
+            STRING_DTYPE for other text
+
+followed by the columns that shrank the most.
+
+Usage: python benchmarks/bench_memory.py [--source unhcr] [--file data/unhcr/datasets.csv] [--top 15]
+"""
+
+import argparse
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+import pandas as pd
+from orchestrators.fetch_datasets import read_datasets
+from schemas.column_mappings import STRING_DTYPE, get_schema_for_source
+from sources import registry
+
+MIB = 1 << 20
+
+
+def load(label, function):
+    start = time.perf_counter()
+    df = function()
+    seconds = time.perf_counter() - start
+    usage = df.memory_usage(deep=True, index=False)
+    print(f"{label:<10}{usage.sum() / MIB:>10.2f}{seconds:>10.3f}")
+    return df, usage
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report DataFrame memory of datasets.csv with and without schema dtypes")
+    parser.add_argument("--source", choices=registry.names(), default="unhcr")
+    parser.add_argument("--file", help="datasets.csv to load (default: the source's)")
+    parser.add_argument("--top", type=int, default=15, help="columns to list")
+    args = parser.parse_args()
+
+    logging.getLogger("schemas.column_mappings").setLevel(logging.WARNING)
+    schema = get_schema_for_source(args.source)
+    path = args.file or registry.get(args.source).datasets_file
+
+    print(f"{path}, text dtype {STRING_DTYPE}")
+    print(f"{'read':<10}{'MiB':>10}{'seconds':>10}")
+    load("inferred", lambda: pd.read_csv(path))
+    _, text = load("text", lambda: read_datasets(path))
+    typed_df, typed = load("typed", lambda: read_datasets(path, schema))
+    print(f"reduction vs text: {1 - typed.sum() / text.sum():.0%}")
+
+    saved = (text - typed).sort_values(ascending=False).head(args.top)
+    print(f"\n{'column':<50}{'dtype':>18}{'text KiB':>10}{'typed KiB':>10}")
+    for column in saved.index:
+        print(f"{column[:49]:<50}{str(typed_df[column].dtype):>18}{text[column] / 1024:>10.0f}"
+              f"{typed[column] / 1024:>10.0f}")
+    print(f"\n{typed_df.dtypes.astype(str).value_counts().to_string()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,286 @@
+"""
+End-to-end stage benchmark of the collector against the local NADA stand-in.
+
+Runs the real code paths of a run for a synthetic (or recorded) catalog:
+list_metadata.list_source(), then process_meta_merge() through
+fetch_datasets.run_source(), with fetched rows in memory (--path merge) or
+spilled to disk (--path streaming). Each catalog size runs in a fresh subprocess, so
+peak RSS is per size; the stand-in server runs in this process. For each stage
+it reports calls, seconds, throughput, p50/p99 per-call latency and the
+process's peak RSS at the end of the stage:
+
+- list:    listing page requests (seconds: all of list_source(), including the metadata.csv write)
+- fetch:   successful export requests including JSON decoding (seconds: first request to last response)
+- flatten: SchemaExtractor.extract() per record
+- enforce: schema alignment, i.e. SchemaExtractor.values() beyond extract()
+- write:   datasets.csv output (the merge)
+
+Flatten, enforce and write report busy seconds; they overlap with fetching.
+The collector's state for the run lives under the source name bench-<source>
+in .cache/ and is removed afterwards.
+
+Usage: python benchmarks/bench_pipeline.py --sizes 1000 10000 100000 --latency 0.005
+       [--error-rate 0.01] [--source unhcr] [--path merge] [--recorded .cache/http/unhcr] [--save FILE]
+"""
+
+import argparse
+import functools
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+import numpy as np
+
+from nada_server import start_server
+
+STAGES = ["list", "fetch", "flatten", "enforce", "write"]
+RESULT_PREFIX = "RESULT "
+
+
+def peak_rss_mb():
+    """Return this process's peak resident set size in MiB (ru_maxrss is KiB on Linux)."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class StageStats:
+    """Per-call durations and the time span of one stage; safe to record from several threads."""
+
+    def __init__(self):
+        self.durations = []
+        self.start = None
+        self.end = None
+        self.items = 0
+        self.peak_rss = 0.0
+        self._lock = threading.Lock()
+        self._last = threading.local()
+
+    def record(self, start, end, items=1):
+        with self._lock:
+            self.durations.append(end - start)
+            self.start = start if self.start is None else min(self.start, start)
+            self.end = end if self.end is None else max(self.end, end)
+            self.items += items
+        self._last.duration = end - start
+
+    def last_duration(self):
+        """Duration of the last call recorded from the current thread."""
+        return getattr(self._last, "duration", 0.0)
+
+    def summary(self, seconds=None):
+        durations = np.array(self.durations) if self.durations else np.zeros(1)
+        if seconds is None:
+            seconds = float(durations.sum()) if self.durations else 0.0
+        return {
+            "calls": len(self.durations),
+            "items": self.items,
+            "seconds": seconds,
+            "per_second": self.items / seconds if seconds else 0.0,
+            "p50_ms": float(np.percentile(durations, 50)) * 1000,
+            "p99_ms": float(np.percentile(durations, 99)) * 1000,
+            "peak_rss_mb": self.peak_rss,
+        }
+
+
+def timed(function, stats, count=None):
+    """Wrap a blocking callable so every call is recorded in `stats`."""
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        result = function(*args, **kwargs)
+        stats.record(start, time.perf_counter(), count(result) if count else 1)
+        return result
+    return wrapper
+
+
+def timed_async(function, stats):
+    """Wrap a coroutine function so every call is recorded in `stats`."""
+    @functools.wraps(function)
+    async def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        result = await function(*args, **kwargs)
+        stats.record(start, time.perf_counter())
+        return result
+    return wrapper
+
+
+def bench_source(base, name, base_url, data_path, page_size):
+    """A copy of a registered source's configuration, pointed at the stand-in server."""
+    from sources.nada import NadaSource
+    return NadaSource(
+        name=name,
+        label=f"{base.label} (bench)",
+        base_url=base_url,
+        schema=base.schema,
+        listing_format=base.listing_format,
+        list_url=base_url + "/index.php" + base.list_url.split("/index.php", 1)[1],
+        export_url=base_url + "/index.php" + base.export_url.split("/index.php", 1)[1],
+        headers=base.headers,
+        page_size=page_size or base.page_size,
+        data_path=data_path,
+        volatile_columns=base.volatile_columns,
+        max_concurrency=base.max_concurrency,
+        tag_id=base.tag_id,
+    )
+
+
+def remove_state(name):
+    """Remove the collector's .cache/ state for a source name."""
+    from utils import CACHE_PATH
+    for path in (os.path.join(CACHE_PATH, "http", name), os.path.join(CACHE_PATH, "store", name)):
+        shutil.rmtree(path, ignore_errors=True)
+    for path in (os.path.join(CACHE_PATH, "manifest", f"{name}.sqlite"),
+                 os.path.join(CACHE_PATH, "journal", f"{name}.jsonl")):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def run_child(options):
+    """Run one benchmark in this process and return its stage summaries."""
+    from orchestrators import fetch_datasets, list_metadata
+    from schemas.extractor import get_extractor
+    from sources import registry
+    from storage import spill
+
+    name = f"bench-{options['source']}"
+    data_path = tempfile.mkdtemp(prefix="bench_pipeline_") + "/"
+    source = registry.register(bench_source(registry.get(options["source"]), name, options["base_url"],
+                                            data_path, options["page_size"]))
+    source.max_concurrency = options["concurrency"] or source.max_concurrency
+    source.connect()
+    remove_state(name)
+    stats = {stage: StageStats() for stage in STAGES}
+
+    source.fetch_listing_page = timed(source.fetch_listing_page, stats["list"], count=lambda result: len(result[1]))
+    source.fetch_dataset = timed(source.fetch_dataset, stats["fetch"])
+    source.fetch_dataset_async = timed_async(source.fetch_dataset_async, stats["fetch"])
+
+    extractor = get_extractor(name)
+    extract, values = extractor.extract, extractor.values
+
+    def timed_extract(record):
+        start = time.perf_counter()
+        result = extract(record)
+        stats["flatten"].record(start, time.perf_counter())
+        stats["flatten"].peak_rss = peak_rss_mb()
+        return result
+
+    def timed_values(record):
+        start = time.perf_counter()
+        result = values(record)
+        end = time.perf_counter()
+        stats["enforce"].record(start, end - stats["flatten"].last_duration())
+        return result
+
+    extractor.extract, extractor.values = timed_extract, timed_values
+    spill.merge_sorted = timed(spill.merge_sorted, stats["write"])
+
+    try:
+        started = time.perf_counter()
+        list_metadata.list_source(source)
+        stats["list"].peak_rss = peak_rss_mb()
+        list_seconds = time.perf_counter() - started
+
+        fetch_datasets.run_source(source, options["mode"], streaming=options["path"] == "streaming")
+        stats["fetch"].peak_rss = peak_rss_mb()
+        stats["write"].peak_rss = peak_rss_mb()
+        stats["enforce"].peak_rss = max(stats["enforce"].peak_rss, stats["flatten"].peak_rss)
+        wall = time.perf_counter() - started
+
+        with open(source.datasets_file, newline="", encoding="utf-8") as f:
+            rows = sum(1 for _ in spill.iter_records(f)) - 1
+        stats["write"].items = rows
+        fetch = stats["fetch"]
+        return {
+            "size": options["size"],
+            "rows": rows,
+            "wall": wall,
+            "peak_rss_mb": peak_rss_mb(),
+            "stages": {
+                "list": stats["list"].summary(list_seconds),
+                "fetch": fetch.summary(fetch.end - fetch.start if fetch.durations else 0.0),
+                "flatten": stats["flatten"].summary(),
+                "enforce": stats["enforce"].summary(),
+                "write": stats["write"].summary(),
+            },
+        }
+    finally:
+        remove_state(name)
+        shutil.rmtree(data_path, ignore_errors=True)
+
+
+def run_size(size, args):
+    """Serve a catalog of `size` IDs and benchmark it in a subprocess."""
+    server = start_server(catalog_size=size, latency=args.latency, error_rate=args.error_rate,
+                          recorded=args.recorded)
+    options = dict(size=server.catalog_size, source=args.source, base_url=server.base_url, path=args.path,
+                   mode=args.mode, page_size=args.page_size, concurrency=args.concurrency)
+    try:
+        completed = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", json.dumps(options)],
+                                   stdout=subprocess.PIPE, stderr=None if args.verbose else subprocess.DEVNULL,
+                                   text=True)
+    finally:
+        server.shutdown()
+        server.server_close()
+    lines = completed.stdout.splitlines()
+    if args.verbose:
+        print("\n".join(line for line in lines if not line.startswith(RESULT_PREFIX)))
+    results = [line[len(RESULT_PREFIX):] for line in lines if line.startswith(RESULT_PREFIX)]
+    if completed.returncode != 0 or not results:
+        raise RuntimeError(f"Benchmark of {size} IDs failed (exit code {completed.returncode})")
+    return json.loads(results[-1])
+
+
+def print_result(result):
+    print(f"\n{result['size']} IDs -> {result['rows']} rows, wall {result['wall']:.1f}s, "
+          f"peak RSS {result['peak_rss_mb']:.0f} MiB")
+    print(f"{'stage':<10}{'calls':>9}{'seconds':>10}{'items/s':>11}{'p50 ms':>10}{'p99 ms':>10}{'RSS MiB':>10}")
+    for stage in STAGES:
+        s = result["stages"][stage]
+        print(f"{stage:<10}{s['calls']:>9}{s['seconds']:>10.2f}{s['per_second']:>11.0f}"
+              f"{s['p50_ms']:>10.2f}{s['p99_ms']:>10.2f}{s['peak_rss_mb']:>10.0f}")
+
+
+def main():
+    if len(sys.argv) == 3 and sys.argv[1] == "--child":
+        print(RESULT_PREFIX + json.dumps(run_child(json.loads(sys.argv[2]))))
+        return
+
+    from sources import registry
+    parser = argparse.ArgumentParser(description="Benchmark the collector's stages end to end")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000], help="catalog sizes to run")
+    parser.add_argument("--latency", type=float, default=0.005, help="server latency per request (s)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered with 503")
+    parser.add_argument("--source", choices=registry.names(), default="unhcr")
+    parser.add_argument("--path", choices=["merge", "streaming"], default="merge",
+                        help="process_meta_merge with fetched rows in memory or spilled")
+    parser.add_argument("--mode", choices=["threads", "async"], default="threads")
+    parser.add_argument("--page-size", type=int, help="listing page size (default: the source's)")
+    parser.add_argument("--concurrency", type=int, help="max concurrency (default: the source's)")
+    parser.add_argument("--recorded", help="directory of recorded exports to replay (ignores --sizes)")
+    parser.add_argument("--save", help="write the results as JSON to this file")
+    parser.add_argument("--verbose", action="store_true", help="show the collector's own output")
+    args = parser.parse_args()
+
+    sizes = [0] if args.recorded else args.sizes
+    print(f"{args.source} via {args.path} ({args.mode}), latency {args.latency * 1000:.1f} ms, "
+          f"error rate {args.error_rate:.1%}")
+    results = []
+    for size in sizes:
+        result = run_size(size, args)
+        print_result(result)
+        results.append(result)
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump({"options": vars(args), "results": results}, f, indent=1)
+
+
+if __name__ == "__main__":
+    main()
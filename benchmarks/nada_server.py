@@ -0,0 +1,273 @@
+"""
+Local stand-in for a NADA microdata library, for benchmarks.
+
+Serves synthetic responses for the endpoints the collector uses:
+
+- /index.php/api/catalog/list_idno/survey      (World Bank listing)
+- /index.php/api/catalog/search                (UNHCR listing, supports ps/page)
+- /index.php/metadata/export/<id>              (World Bank-shaped export)
+- /index.php/metadata/export/<id>/json         (UNHCR-shaped export)
+
+Exports carry an ETag and answer If-None-Match with 304.
+
+Export documents are generated from WORLD_BANK_SCHEMA / UNHCR_SCHEMA, reversing
+PREFIX_MAPPINGS and adding fields outside the schema, so they exercise the same
+flatten/prefix/enforce work as the real exports. Alternatively, recorded
+exports (a response cache directory, .cache/http/<source>/) are replayed
+as-is, and the catalog consists of the recorded IDs.
+
+Run standalone with: python benchmarks/nada_server.py --size 5000 --port 8765
+"""
+
+import argparse
+import functools
+import hashlib
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from schemas.column_mappings import PREFIX_MAPPINGS, UNHCR_SCHEMA, WORLD_BANK_SCHEMA
+
+# Repeated NADA structures and the keys their entries carry.
+LIST_FIELDS = {
+    'keywords': ['keyword', 'vocab', 'uri'],
+    'topics': ['topic', 'vocab', 'uri'],
+    'nation': ['name', 'abbreviation'],
+    'producers': ['name', 'abbr', 'affiliation', 'role'],
+    'authoring_entity': ['name', 'affiliation'],
+    'coll_dates': ['start', 'end', 'cycle'],
+    'contact': ['name', 'affiliation', 'email', 'uri'],
+    'distributors': ['name', 'abbr', 'affiliation', 'uri'],
+    'funding_agencies': ['name', 'abbr', 'role', 'grant'],
+    'data_collectors': ['name', 'abbr', 'affiliation'],
+}
+
+WORDS = ("survey household refugee displacement sample population camp settlement "
+         "interview questionnaire protection livelihood health education income "
+         "assessment region district enumerator weighting response methodology").split()
+
+# Distinct export documents served; IDs beyond this reuse one with their own ID stamped in.
+EXPORT_TEMPLATES = 512
+TEMPLATE_ID = 987654321
+
+EXPORT_PATTERN = re.compile(r"^/index\.php/metadata/export/(\d+)(/json)?$")
+
+
+def _text(rng, max_words):
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(3, max_words))).capitalize()
+
+
+def _raw_path(rng, column):
+    """Undo PREFIX_MAPPINGS for a schema column, picking one raw prefix at random."""
+    candidates = [old + column[len(new):] for old, new in PREFIX_MAPPINGS.items() if column.startswith(new)]
+    return rng.choice(candidates) if candidates else column
+
+
+def _leaf_value(rng, id, path):
+    name = path.rsplit(".", 1)[-1]
+    if name == "id":
+        return id
+    if name in LIST_FIELDS:
+        return [{key: _text(rng, 4) for key in LIST_FIELDS[name]} for _ in range(rng.randint(1, 6))]
+    if name == "idno":
+        return f"SYN_{id:06d}_v01_M"
+    return _text(rng, rng.choice((6, 40, 300)))
+
+
+def _set_path(document, path, value):
+    parts = path.split(".")
+    node = document
+    for part in parts[:-1]:
+        child = node.get(part)
+        if not isinstance(child, dict):
+            child = node[part] = {}
+        node = child
+    if not isinstance(node.get(parts[-1]), dict):
+        node[parts[-1]] = value
+
+
+def synthetic_export(id, schema, seed=None):
+    """
+    Build a NADA-like export document for one ID.
+
+    Parameters:
+    - id (int): Dataset ID.
+    - schema (dict): WORLD_BANK_SCHEMA or UNHCR_SCHEMA.
+    - seed (int): Seed for the generated content; defaults to `id`.
+
+    Returns:
+    - dict: Nested document whose flattened, prefix-mapped form covers the schema.
+    """
+    rng = random.Random(id if seed is None else seed)
+    document = {}
+    # Longest paths first so parents become dicts before shorter leaves are placed.
+    for column in sorted(schema, key=lambda c: -c.count(".")):
+        if rng.random() < 0.25 and column != "id":
+            continue
+        path = _raw_path(rng, column)
+        _set_path(document, path, _leaf_value(rng, id, path))
+    # Fields outside the schema, which enforce_schema drops.
+    document["schematype"] = "survey"
+    for i in range(40):
+        _set_path(document, f"doc_desc.extra.field_{i}", _text(rng, 8))
+    return document
+
+
+def synthetic_listing_row(id):
+    """Build a catalog/search row with the columns of data/unhcr/metadata.csv."""
+    rng = random.Random(-id)
+    year = rng.randint(1995, 2025)
+    return {
+        "id": id, "type": "survey", "idno": f"SYN_{id:06d}_v01_M", "doi": None,
+        "title": _text(rng, 8), "subtitle": None, "nation": rng.choice(["Kenya", "Chad", "Jordan", "Peru"]),
+        "authoring_entity": "UNHCR", "form_model": "remote", "formid": 5, "data_class_id": None,
+        "year_start": year, "year_end": year, "thumbnail": None, "repositoryid": "SYN",
+        "link_da": None, "repo_title": "Synthetic", "created": f"{year}-01-01T00:00:00+00:00",
+        "changed": f"{year}-06-01T00:00:00+00:00", "total_views": rng.randint(0, 5000),
+        "total_downloads": rng.randint(0, 500), "varcount": 0,
+        "url": f"http://localhost/index.php/catalog/{id}",
+    }
+
+
+class NadaHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload, extra_headers=None):
+        body = payload if isinstance(payload, bytes) else json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (extra_headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        server = self.server
+        if server.latency:
+            time.sleep(server.latency)
+        if server.error_rate and server.rng.random() < server.error_rate:
+            self._send_json(503, {"status": "unavailable"}, {"Retry-After": "1"})
+            return
+
+        url = urlsplit(self.path)
+        query = parse_qs(url.query)
+        ids = server.ids
+
+        if url.path == "/index.php/api/catalog/list_idno/survey":
+            records = [{"id": id, "idno": f"SYN_{id:06d}_v01_M", "type": "survey"} for id in ids]
+            self._send_json(200, {"records": records})
+            return
+
+        if url.path == "/index.php/api/catalog/search":
+            page_size = int(query.get("ps", [server.catalog_size])[0])
+            page = int(query.get("page", [1])[0])
+            offset = (page - 1) * page_size
+            rows = [synthetic_listing_row(id) for id in ids[offset:offset + page_size]]
+            self._send_json(200, {"result": {"found": server.catalog_size, "total": server.catalog_size,
+                                             "limit": page_size, "offset": offset, "rows": rows}})
+            return
+
+        match = EXPORT_PATTERN.match(url.path)
+        if match and int(match.group(1)) in server.id_set:
+            id = int(match.group(1))
+            body = _recorded_body(server.recorded, id) if server.recorded else _export_body(id, bool(match.group(2)))
+            etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+            if self.headers.get("If-None-Match") == etag:
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self._send_json(200, body, {"ETag": etag})
+            return
+
+        self._send_json(404, {"status": "not found"})
+
+
+@functools.lru_cache(maxsize=None)
+def _export_template(slot, unhcr_shaped):
+    schema = UNHCR_SCHEMA if unhcr_shaped else WORLD_BANK_SCHEMA
+    return json.dumps(synthetic_export(TEMPLATE_ID, schema, seed=slot)).encode("utf-8")
+
+
+def _export_body(id, unhcr_shaped):
+    # Generating a document takes milliseconds, which would make the server
+    # the bottleneck on large catalogs; stamp the ID into one of a fixed set
+    # of pre-generated documents instead.
+    body = _export_template(id % EXPORT_TEMPLATES, unhcr_shaped)
+    body = body.replace(f"SYN_{TEMPLATE_ID}".encode(), f"SYN_{id:06d}".encode())
+    return body.replace(str(TEMPLATE_ID).encode(), str(id).encode())
+
+
+def _recorded_body(directory, id):
+    with open(os.path.join(directory, f"{id}.json"), "rb") as f:
+        return f.read()
+
+
+def recorded_ids(directory):
+    """Return the sorted IDs of the recorded exports in a response cache directory."""
+    names = (name[:-len(".json")] for name in os.listdir(directory)
+             if name.endswith(".json") and not name.endswith(".meta.json"))
+    return sorted(int(name) for name in names if name.isdigit())
+
+
+def start_server(catalog_size=1000, latency=0.0, error_rate=0.0, port=0, recorded=None):
+    """
+    Start the stand-in server on loopback in a background thread.
+
+    Parameters:
+    - catalog_size (int): Number of IDs (1..catalog_size) in the catalog.
+    - latency (float): Seconds of delay added to every response.
+    - error_rate (float): Fraction of requests answered with 503 + Retry-After.
+    - port (int): Port to bind; 0 picks a free one.
+    - recorded (str): Directory of recorded exports to replay instead of
+      synthetic ones; its IDs replace 1..catalog_size.
+
+    Returns:
+    - ThreadingHTTPServer: Running server with a `base_url` attribute. Call shutdown() when done.
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", port), NadaHandler)
+    server.daemon_threads = True
+    server.recorded = recorded
+    server.ids = recorded_ids(recorded) if recorded else range(1, catalog_size + 1)
+    server.id_set = frozenset(server.ids)
+    server.catalog_size = len(server.ids)
+    server.latency = latency
+    server.error_rate = error_rate
+    server.rng = random.Random(0)
+    server.base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--size", type=int, default=1000, help="catalog size")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added per response")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of 503 responses")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--recorded", help="directory of recorded exports to replay")
+    args = parser.parse_args()
+
+    server = start_server(args.size, args.latency, args.error_rate, args.port, args.recorded)
+    print(f"NADA stand-in serving {server.catalog_size} IDs at {server.base_url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+Command line for partial runs: chosen sources, stages and dataset IDs.
+
+Usage: python src/cli.py [--source unhcr] [--stage fetch] [--ids 1000,1200-1300]
+                         [--concurrency 8] [--plan]
+
+Without options it runs what main.py runs: every source's listing and fetch.
+--ids fetches exactly the listed IDs among those given, changed or not, and
+removes nothing. --plan prints each source's work set and the requests a run
+would make, from metadata.csv and the run manifest, without touching the
+network. The orchestrators, and with them pandas, are only imported for a
+run, so --help and --plan start quickly.
+"""
+
+import argparse
+import math
+import os
+
+# scheduler.STAGES, which cannot be imported without loading pandas.
+STAGES = ["list", "fetch"]
+
+
+def parse_ids(text):
+    """
+    Parse a comma-separated list of IDs and inclusive ranges, e.g. "1000,1200-1300".
+
+    Parameters:
+    - text (str): The option value.
+
+    Returns:
+    - list: Dataset IDs.
+    """
+    ids = []
+    for part in text.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        start, dash, end = part.partition("-")
+        try:
+            if not dash:
+                ids.append(int(part))
+                continue
+            start, end = int(start), int(end)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"invalid ID or range: {part!r}") from None
+        if start > end:
+            raise argparse.ArgumentTypeError(f"empty range: {part!r}")
+        ids.extend(range(start, end + 1))
+    return ids
+
+
+def plan_source(source, stages, ids=None):
+    """
+    Print the work a run of `stages` would do for one source, and the
+    requests it would make. Reads only local files.
+
+    Parameters:
+    - source (NadaSource): Catalog to plan.
+    - stages (list): Stages to run.
+    - ids (list): Explicit IDs, as for planner.plan().
+
+    Returns:
+    - int: Estimated number of requests.
+    """
+    from orchestrators import planner
+
+    stored_file = source.stored_file
+    if not os.path.exists(stored_file) and os.path.exists(source.datasets_file):
+        # A source just switched to the 'shards' layout: its datasets.csv is split first.
+        stored_file = source.datasets_file
+    manifest = planner.open_manifest(source.name, source.metadata_file, stored_file)
+    try:
+        print(f"{source.label} ({source.name}): {manifest.listed_count()} listed, "
+              f"{manifest.stored_count()} stored")
+        requests = 0
+        if "list" in stages:
+            pages = 1
+            if source.listing_format == "search":
+                pages = max(1, math.ceil(manifest.listed_count() / source.page_size))
+            requests += pages
+            print(f"  listing: {pages} requests to {source.list_url.split('?')[0]}")
+        if "fetch" in stages:
+            work = planner.plan(manifest, ids)
+            to_fetch = work.added + work.modified
+            cached = sum(1 for id in to_fetch if source.cache.lookup(id) is not None)
+            requests += len(to_fetch)
+            basis = " (from the current metadata.csv)" if "list" in stages and ids is None else ""
+            print(f"  fetch{basis}: {len(work.added)} new, {len(work.modified)} modified, "
+                  f"{len(work.removed)} removed")
+            print(f"  exports: {len(to_fetch)} requests, {cached} of them conditional on a cached copy, "
+                  f"at most {source.max_concurrency} at a time")
+            if to_fetch:
+                shown = " ".join(str(id) for id in sorted(to_fetch)[:20])
+                print(f"  ids: {shown}{' ...' if len(to_fetch) > 20 else ''}")
+            if ids is None:
+                deferred = manifest.deferred_ids()
+                if deferred:
+                    print(f"  deferred: {len(deferred)} failing datasets until their retry is due")
+        return requests
+    finally:
+        manifest.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run or plan the collector for chosen sources, stages and IDs")
+    parser.add_argument("--source", action="append", help="source to run (repeatable; default: all)")
+    parser.add_argument("--stage", action="append", choices=STAGES,
+                        help="stage to run (repeatable; default: list and fetch)")
+    parser.add_argument("--ids", action="append", type=parse_ids,
+                        help="fetch only these IDs, e.g. 1000,1200-1300 (repeatable)")
+    parser.add_argument("--concurrency", type=int, help="maximum requests in flight per host")
+    parser.add_argument("--mode", choices=["threads", "async"], help="fetch engine")
+    parser.add_argument("--streaming", action="store_true", help="spill fetched rows to disk")
+    parser.add_argument("--store-format", choices=["csv", "parquet"], help="working format")
+    parser.add_argument("--catalog", choices=["source", "combined"], help="also keep the SQLite catalog")
+    parser.add_argument("--no-pipeline", action="store_true", help="list fully before fetching")
+    parser.add_argument("--profile", action="append", metavar="STAGE", help="run a stage under cProfile")
+    parser.add_argument("--plan", action="store_true", help="print the work and requests, without running")
+    args = parser.parse_args()
+
+    from sources import registry
+
+    unknown = sorted(set(args.source or ()) - set(registry.names()))
+    if unknown:
+        parser.error(f"unknown source: {', '.join(unknown)} (choose from {', '.join(registry.names())})")
+    if args.concurrency is not None and args.concurrency < 1:
+        parser.error("--concurrency must be at least 1")
+    sources = registry.all_sources(args.source)
+    stages = args.stage or STAGES
+    ids = sorted({id for part in args.ids for id in part}) if args.ids else None
+
+    if args.plan:
+        requests = sum(plan_source(source, stages, ids) for source in sources)
+        print(f"About {requests} requests in total, not counting retries")
+        return
+
+    import telemetry
+    from orchestrators import scheduler
+
+    if args.concurrency is not None:
+        for source in sources:
+            source.set_concurrency(args.concurrency)
+    if args.profile:
+        telemetry.enable_profiling(*args.profile)
+    options = dict(mode=args.mode, streaming=args.streaming or None, store_format=args.store_format,
+                   catalog=args.catalog)
+    options = {name: value for name, value in options.items() if value is not None}
+    scheduler.run(pipelined=not args.no_pipeline, sources=sources, stages=stages, ids=ids, **options)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+"""
+Write datasets.csv from the shards of sources with the 'shards' layout
+(storage/shards.py). Runs already keep it consolidated
+(fetch_datasets.publish_shards()); this rewrites it by hand, or writes a copy
+to --output.
+
+Usage: python src/consolidate.py [--source unhcr] [--output datasets.csv]
+"""
+
+import argparse
+from orchestrators import fetch_datasets
+from sources import registry
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Consolidate sharded datasets into one datasets.csv")
+    parser.add_argument("--source", action="append", choices=registry.names(),
+                        help="source to consolidate (repeatable; default: all)")
+    parser.add_argument("--output", help="output file (default: the source's datasets.csv; one source only)")
+    args = parser.parse_args()
+
+    sources = registry.all_sources(args.source)
+    if args.output and len(sources) != 1:
+        parser.error("--output needs exactly one --source")
+    for source in sources:
+        shards = fetch_datasets.sharded_datasets(source)
+        if shards is None or not shards.exists():
+            print(f"{source.name}: not sharded")
+            continue
+        output_file = args.output or source.datasets_file
+        count = shards.consolidate(output_file)
+        print(f"{source.name}: {count} rows from {len(shards.paths())} shards written to {output_file}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,7 @@
 import json, os
 import requests
 import logging
+import pandas as pd
 from utils import *
 
 UNHCR_OUTPUT_FILE = UNHCR_DATA_PATH + "metadata.csv"
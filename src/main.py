@@ -1,10 +1,7 @@
-from orchestrators import list_metadata, fetch_datasets
+from orchestrators import scheduler
 
 def main():
-    list_metadata.run()
-    fetch_datasets.run()
+    scheduler.run()
 
 if __name__ == "__main__":
     main()
-
-
@@ -1,117 +1,530 @@
+import hashlib
+import json
 import os
+import time
 import pandas as pd
 import tqdm
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from sources import unhcr, worldbank
-from utils import UNHCR_DATA_PATH, WB_DATA_PATH
-from schemas.column_mappings import apply_prefix_mapping, enforce_schema, get_schema_for_source
+import telemetry
+from orchestrators import fetch_engine, planner
+from storage import columnar, csv_format, nested, spill as spill_files
+from storage.catalog import CatalogUpdater, catalog_path
+from storage.child_tables import ChildTables, tables_path
+from storage.changeset import Changeset, changeset_path
+from storage.journal import Journal
+from storage.manifest import file_signature
+from storage.shards import ShardedDatasets
+from sources import http_client, registry
+from utils import CACHE_PATH
+from schemas.column_mappings import apply_schema_dtypes, get_schema_for_source, schema_dtypes, schema_version
+from schemas.extractor import get_extractor
 
 MAX_WORKERS = 20
 
-def process_meta(input_file, output_file, fetch_function, source_name):
+# 'threads' (ThreadPoolExecutor over a shared requests pool) or 'async' (aiohttp).
+FETCH_MODE = "threads"
+
+# Spill fetched rows to disk as they arrive instead of holding them in memory until the merge.
+STREAMING = False
+
+# Working format: 'csv' (datasets.csv only) or 'parquet' (columnar store under
+# .cache/store/<source>/, with datasets.csv exported from it).
+STORE_FORMAT = "csv"
+ROWS_PER_PART = 1000
+
+# Optional SQLite catalog with full-text search (storage/catalog.py): None, 'source'
+# (.cache/catalog/<source>.sqlite) or 'combined' (.cache/catalog/catalog.sqlite).
+CATALOG = None
+CATALOG_MODES = (None, "source", "combined")
+
+def fetch_rows(ids, fetch_function, source_name, manifest, journal=None, mode="threads",
+               concurrency=MAX_WORKERS, limiter=None, stamps=None, schema=None):
+    """
+    Fetch IDs and yield each schema-ordered row as soon as it arrives.
+
+    Every attempt is recorded in the manifest with its HTTP status, and the
+    body digest and schema version on success. With a journal, rows it already
+    holds for `ids` (from an interrupted run) are yielded first without
+    fetching, and each new row is journaled before it is yielded. Journal rows
+    are matched to the listing by their stamp (storage.manifest.listing_stamp()).
+
+    Parameters:
+    - ids (list): Dataset IDs to fetch.
+    - fetch_function (callable): As for process_meta_merge().
+    - source_name (str): Registered source name, e.g. 'unhcr'
+    - manifest (Manifest): Manifest of the source.
+    - journal (Journal): Fetch journal of the source, or None.
+    - mode (str): Fetch engine, 'threads' or 'async'.
+    - concurrency (int): Worker threads or in-flight requests for this source.
+    - limiter (AdaptiveLimiter): Adaptive limit of the source's host; overrides `concurrency`.
+    - stamps (dict): id -> listing stamp the fetch is for; read from the
+      manifest's recorded listing if None.
+    - schema (dict): The source's schema (NadaSource.schema); looked up by
+      `source_name` in the registry if None.
+
+    Yields:
+    - tuple: (id, row values in schema order)
+
+    Time spent is recorded in telemetry as the 'fetch' stage, and flattening
+    alone as 'flatten' (profiled when telemetry profiling covers 'flatten').
+    """
+    if schema is None:
+        schema = get_schema_for_source(source_name)
+    extractor = get_extractor(source_name, schema)
+    version = schema_version(schema)
+    profile = telemetry.profiler(source_name, "flatten")
+    started = time.perf_counter()
+    fetched = 0
+    flatten_seconds = 0.0
+
+    outstanding = ids
+    if journal is not None:
+        if stamps is None:
+            stamps = manifest.listing_stamps()
+        journaled = journal.replay(version, stamps)
+        outstanding = [id for id in ids if id not in journaled]
+        if len(outstanding) < len(ids):
+            print(f"Resuming from journal: {len(ids) - len(outstanding)} datasets already fetched")
+        for id in ids:
+            if id in journaled:
+                yield id, journaled[id]
+
+    results = fetch_engine.fetch_results(outstanding, fetch_function, mode, concurrency, limiter)
+    try:
+        for id, data, error in tqdm.tqdm(results, total=len(outstanding), disable=True):
+            if error is not None:
+                print(f"An error occurred for ID {id}: {error}")
+                manifest.record_fetch(id, http_client.status_of(error), error=str(error))
+                continue
+            # Attach the ID from metadata to ensure downstream processing has a key.
+            if isinstance(data, dict) and "id" not in data:
+                data["id"] = id
+            digest = hashlib.sha256(json.dumps(data, sort_keys=True).encode("utf-8")).hexdigest()
+            manifest.record_fetch(id, 200, digest=digest, schema_version=version)
+            flatten_start = time.perf_counter()
+            if profile is None:
+                values = extractor.values(data)
+            else:
+                profile.enable()
+                try:
+                    values = extractor.values(data)
+                finally:
+                    profile.disable()
+            flatten_seconds += time.perf_counter() - flatten_start
+            fetched += 1
+            if journal is not None:
+                journal.append(id, values, version, stamps.get(id))
+            yield id, values
+    finally:
+        if journal is not None:
+            journal.sync()
+        if outstanding:
+            telemetry.record_stage(source_name, "fetch", time.perf_counter() - started, fetched)
+            telemetry.record_stage(source_name, "flatten", flatten_seconds, fetched)
+    if limiter is not None and outstanding:
+        print(f"Concurrency ended at {limiter.limit} of {limiter.maximum}")
+
+def write_changeset(output_file, changes, derived=(), shards=None):
+    """
+    Write the run's changeset next to datasets.csv and print its summary, and
+    apply it to the `derived` outputs (see process_meta_merge()).
+
+    An empty changeset leaves the previous run's changeset.json in place, and
+    only derived outputs that are not built yet are written, to build them.
+
+    With `shards` (storage/shards.py), `output_file` is their index, and
+    derived outputs that still have to be built are given a consolidated copy
+    of the shards to build from.
+    """
+    print(f"Changeset: {changes.summary()}")
+    if changes:
+        changes.write(changeset_path(output_file))
+    else:
+        derived = [output for output in derived if not output.is_built()]
+    if shards is not None and not all(output.is_built() for output in derived):
+        with shards.consolidated() as consolidated_file:
+            for output in derived:
+                output.write(consolidated_file, changes)
+        return
+    for output in derived:
+        output.write(output_file, changes)
+
+def read_datasets(output_file, schema=None):
+    """
+    Read an existing datasets.csv with every cell as text (ids as integers),
+    so values round-trip unchanged.
+
+    With a schema, columns are read straight into their schema dtypes
+    (schema_dtypes()), with no type inference: nullable integer ids, text as
+    STRING_DTYPE and low-cardinality columns as categoricals. Empty cells
+    still read as "".
     """
-    Process metadata by fetching detailed data for each ID in parallel.
-    Only fetches NEW IDs not present in existing datasets.csv.
+    if schema is None:
+        df = pd.read_csv(output_file, dtype=str, keep_default_na=False)
+        df['id'] = pd.to_numeric(df['id']).astype('int64')
+        return df
+    dtype = schema_dtypes(schema, csv_format.read_header(output_file))
+    dtype['id'] = str
+    df = pd.read_csv(output_file, dtype=dtype, keep_default_na=False)
+    return apply_schema_dtypes(df, schema)
+
+def sort_datasets(output_file, schema):
+    """
+    Sort an existing datasets.csv by id in place; older files may not be sorted.
+
+    The table is read with its schema dtypes (read_datasets()), which holds it
+    in a fraction of the memory of all-text columns, and every cell is written
+    back with the same text.
+    """
+    csv_format.write_frame(read_datasets(output_file, schema).sort_values('id', kind='stable'), output_file)
+
+def plan_work(manifest, ids=None):
+    """Plan a run from the manifest (or for explicit `ids`, see planner.plan()) and print what it will do."""
+    work = planner.plan(manifest, ids)
+    if work.added or work.modified or work.removed:
+        print(f"Fetching {len(work.added)} new and {len(work.modified)} modified datasets "
+              f"out of {manifest.listed_count()} total; removing {len(work.removed)}")
+    else:
+        print(f"No new or modified datasets to fetch")
+    deferred = manifest.deferred_ids()
+    if deferred:
+        print(f"Deferring {len(deferred)} failing datasets until their retry is due")
+    return work
+
+def process_meta_merge(input_file, output_file, fetch_function, source_name, mode="threads",
+                       concurrency=MAX_WORKERS, manifest=None, journal=None, limiter=None, spill_to_disk=False,
+                       derived=(), shards=None, ids=None, schema=None):
+    """
+    Fetch detailed data for each new or modified ID (planner.plan()) and
+    sort-merge the fetched rows into the existing file, pruning IDs no
+    longer listed.
+
+    Fetched rows are schema-projected and encoded as they arrive and kept in a
+    small in-memory batch (or, with `spill_to_disk`, a spill file next to the
+    output). datasets.csv is then produced by one linear merge of the existing
+    file (sorted by id, read in buffered chunks) with the batch in id order.
+    The existing table is never loaded, and untouched rows are copied through
+    as text, so a routine run costs about as much as copying the file.
 
     Parameters:
     - input_file (str): Path to the metadata CSV file.
     - output_file (str): Path to the output datasets CSV file.
-    - fetch_function (callable): Function to fetch data for a single ID.
-    - source_name (str): 'worldbank' or 'unhcr'
+    - fetch_function (callable): Function to fetch data for a single ID
+      (a coroutine function taking (session, id) when mode is 'async').
+    - source_name (str): Registered source name, e.g. 'unhcr'
+    - mode (str): Fetch engine, 'threads' or 'async'.
+    - concurrency (int): Worker threads or in-flight requests for this source.
+    - manifest (Manifest): Manifest to plan from and stage into; opened if None.
+      Pass it to planner.commit() after the output has been written.
+    - journal (Journal): Fetch journal to resume from and append to, or None.
+    - limiter (AdaptiveLimiter): Adaptive limit of the source's host, or None for a fixed `concurrency`.
+    - spill_to_disk (bool): Hold fetched rows in a spill file instead of memory.
+    - derived (list): Outputs derived from datasets.csv, such as ChildTables
+      (storage/child_tables.py) or Catalog (storage/catalog.py). Each is given
+      every fetched row through add(id, values), and the run's changeset through
+      write(output_file, changes) once the changeset is written.
+    - shards (ShardedDatasets): Merge into these shards (storage/shards.py)
+      instead; `output_file` is then their index.
+    - ids (list): Fetch only these IDs, changed or not (planner.plan()); None for a normal run.
+    - schema (dict): As for fetch_rows().
 
     Returns:
-    - pd.DataFrame: Normalized DataFrame with all fetched data.
+    - bool: True if output_file is up to date.
     """
-    df_meta = pd.read_csv(input_file)
+    if manifest is None:
+        manifest = planner.open_manifest(source_name, input_file, output_file)
 
-    existing_df = None
-    existing_ids = set()
-    if os.path.exists(output_file):
-        existing_df = pd.read_csv(output_file)
-        existing_ids = set(existing_df['id'])
+    work = plan_work(manifest, ids)
+    to_fetch = work.added + work.modified
 
-    new_ids = [id for id in df_meta["id"] if id not in existing_ids]
+    columns = get_extractor(source_name, schema).columns
+    changes = Changeset(columns)
 
-    if not new_ids:
-        print(f"No new datasets to fetch")
-        return existing_df if existing_df is not None else pd.DataFrame()
+    if not to_fetch and not work.removed:
+        manifest.stage([], [])
+        if os.path.exists(output_file):
+            write_changeset(output_file, changes, derived, shards)
+        return True
 
-    print(f"Fetching {len(new_ids)} new datasets out of {len(df_meta)} total")
+    batch = spill_files.SpillFile(output_file + ".spill") if spill_to_disk else spill_files.RowBatch()
+    try:
+        rows = fetch_rows(to_fetch, fetch_function, source_name, manifest, journal, mode, concurrency, limiter,
+                          schema=schema)
+        for id, values in rows:
+            batch.append(id, csv_format.encode_row(values))
+            for output in derived:
+                output.add(id, values)
 
-    records = []
-    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-        futures = {executor.submit(fetch_function, id): id for id in new_ids}
+        fetched_ids = batch.ids()
+        if not fetched_ids and not work.removed:
+            # Every fetch failed; the file on disk is still current.
+            manifest.stage([], [])
+            if os.path.exists(output_file):
+                write_changeset(output_file, changes, derived, shards)
+            return True
+        if not fetched_ids and not os.path.exists(output_file):
+            print(f"No datasets to save for {output_file}")
+            return False
 
-        for future in tqdm.tqdm(as_completed(futures), total=len(futures), disable=True):
-            try:
-                data = future.result()
-                # Attach the ID from metadata to ensure downstream processing has a key.
-                if isinstance(data, dict) and "id" not in data:
-                    data["id"] = futures[future]
-                records.append(data)
-            except Exception as e:
-                print(f"An error occurred for ID {futures[future]}: {e}")
+        with telemetry.stage(source_name, "write") as timer:
+            if shards is not None:
+                count = shards.merge(batch, set(work.removed), changes)
+            else:
+                try:
+                    count = spill_files.merge_sorted(output_file, batch, columns, output_file, set(work.removed),
+                                                     changes)
+                except spill_files.UnsortedInputError:
+                    # Older files may not be sorted; sort once and merge again.
+                    sort_datasets(output_file, schema or get_schema_for_source(source_name))
+                    changes = Changeset(columns)
+                    count = spill_files.merge_sorted(output_file, batch, columns, output_file, set(work.removed),
+                                                     changes)
+            timer.records = count
+    finally:
+        batch.close()
 
-    new_df = pd.json_normalize(records)
+    print(f"Dataset with {count} rows saved to {shards.directory if shards is not None else output_file}")
+    manifest.stage(fetched_ids, work.removed)
+    write_changeset(output_file, changes, derived, shards)
+    return True
 
-    schema = get_schema_for_source(source_name)
-    new_df = apply_prefix_mapping(new_df)
-    new_df = enforce_schema(new_df, schema)
+def process_meta_streaming(input_file, output_file, fetch_function, source_name, mode="threads",
+                           concurrency=MAX_WORKERS, manifest=None, journal=None, limiter=None, derived=(),
+                           shards=None, ids=None, schema=None):
+    """
+    process_meta_merge() with fetched rows spilled to disk as they arrive, so
+    memory stays roughly constant even for a full backfill. Parameters and
+    return value are as for process_meta_merge().
+    """
+    return process_meta_merge(input_file, output_file, fetch_function, source_name, mode, concurrency, manifest,
+                              journal, limiter, spill_to_disk=True, derived=derived, shards=shards,
+                              ids=ids, schema=schema)
 
-    if existing_df is not None:
-        existing_df = enforce_schema(existing_df, schema)
-        combined_df = pd.concat([existing_df, new_df], ignore_index=True)
-    else:
-        combined_df = new_df
+def process_meta_columnar(input_file, output_file, fetch_function, source_name, store_dir, mode="threads",
+                          concurrency=MAX_WORKERS, manifest=None, journal=None, limiter=None, derived=(),
+                          ids=None, schema=None):
+    """
+    Variant of process_meta_merge() backed by a Parquet store.
 
-    if "id" in combined_df.columns:
-        combined_df = combined_df.sort_values('id').reset_index(drop=True)
+    The store is the working copy: fetched rows and removals are appended as
+    new parts, and datasets.csv is exported from it for the git archive. An
+    empty store is seeded from the current datasets.csv, and so is a store
+    whose nested cells predate the JSON format (storage/nested.py).
 
-    return combined_df
+    Parameters:
+    - input_file (str): Path to the metadata CSV file.
+    - output_file (str): Path to the exported datasets CSV file.
+    - fetch_function (callable): As for process_meta_merge().
+    - source_name (str): Registered source name, e.g. 'unhcr'
+    - store_dir (str): Directory of the source's Parquet store.
+    - mode (str): Fetch engine, 'threads' or 'async'.
+    - concurrency (int): Worker threads or in-flight requests for this source.
+    - manifest (Manifest): As for process_meta_merge().
+    - journal (Journal): As for process_meta_merge().
+    - limiter (AdaptiveLimiter): As for process_meta_merge().
+    - derived (list): As for process_meta_merge().
+    - ids (list): As for process_meta_merge().
+    - schema (dict): As for fetch_rows().
 
-def process_datasets(df, output_file):
+    Returns:
+    - bool: True if output_file is up to date.
     """
-    Saves the processed dataset to CSV.
+    if manifest is None:
+        manifest = planner.open_manifest(source_name, input_file, output_file)
 
-    Args:
-    - df (DataFrame): Metadata DataFrame (already schema-enforced).
-    - output_file (str): Path to save the processed CSV file.
+    extractor = get_extractor(source_name, schema)
+    store = columnar.ColumnarStore(store_dir, extractor.columns)
+    if store.exists() and store.cell_format() != nested.JSON_TYPE:
+        print(f"Clearing columnar store {store_dir}: its nested cells predate the JSON format")
+        store.clear()
+    if not store.exists() and os.path.exists(output_file):
+        print(f"Seeding columnar store {store_dir} from {output_file}")
+        store.import_csv(output_file)
+    if store.cell_format() != nested.JSON_TYPE:
+        store.set_cell_format(nested.JSON_TYPE)
 
-    Returns:
-    None
+    work = plan_work(manifest, ids)
+    to_fetch = work.added + work.modified
+
+    changes = Changeset(extractor.columns)
+    if not to_fetch and not work.removed:
+        manifest.stage([], [])
+        if not os.path.exists(output_file) and store.exists():
+            store.export_csv(output_file)
+        if os.path.exists(output_file):
+            write_changeset(output_file, changes, derived)
+        return True
+
+    previous_df = store.read(ids=set(to_fetch) | set(work.removed))
+    previous = {row[0]: row for row in previous_df[extractor.columns].itertuples(index=False, name=None)}
+
+    fetched_ids = set()
+    batch = []
+    rows = fetch_rows(to_fetch, fetch_function, source_name, manifest, journal, mode, concurrency, limiter,
+                      schema=schema)
+    for id, values in rows:
+        fetched_ids.add(id)
+        changes.replace_values(id, previous.get(id), values)
+        batch.append(values)
+        for output in derived:
+            output.add(id, values)
+        if len(batch) >= ROWS_PER_PART:
+            store.append(batch)
+            batch = []
+    store.append(batch, deleted_ids=work.removed)
+    store.compact()
+    for id in work.removed:
+        if id in previous:
+            changes.remove(id)
+
+    with telemetry.stage(source_name, "write") as timer:
+        timer.records = count = store.export_csv(output_file)
+    print(f"Dataset with {count} rows exported from {store_dir} to {output_file}")
+    manifest.stage(fetched_ids, work.removed)
+    write_changeset(output_file, changes, derived)
+    return True
+
+def upgrade_nested_cells(manifest, output_file, schema):
     """
-    if df is None or df.empty:
-        print(f"No datasets to save for {output_file}")
+    Rewrite legacy Python-repr list/dict cells of datasets.csv as JSON
+    (storage/nested.py), once per manifest, so that rows kept from earlier
+    runs and freshly fetched rows are encoded alike.
+
+    Parameters:
+    - manifest (Manifest): The source's manifest; records that the upgrade ran.
+    - output_file (str): Path to datasets.csv.
+    - schema (dict): The source's schema.
+    """
+    if manifest.get_meta("cell_format") == nested.JSON_TYPE:
         return
+    if os.path.exists(output_file):
+        in_sync = manifest.get_meta("datasets_signature") == file_signature(output_file)
+        changed = nested.upgrade_file(output_file, nested.json_columns(schema))
+        if changed:
+            print(f"Rewrote {changed} nested cells of {output_file} as JSON")
+            if in_sync:
+                manifest.set_meta("datasets_signature", file_signature(output_file))
+    manifest.set_meta("cell_format", nested.JSON_TYPE)
+
+def derived_outputs(source, catalog=CATALOG):
+    """
+    Return the outputs maintained alongside a source's datasets.csv: its child
+    tables, and its rows of the SQLite catalog if `catalog` is set.
+    """
+    if catalog not in CATALOG_MODES:
+        raise ValueError(f"Unknown catalog mode: {catalog}. Must be one of {CATALOG_MODES}")
+    columns = get_extractor(source.name, source.schema).columns
+    derived = [ChildTables(tables_path(source.datasets_file), columns)]
+    if catalog is not None:
+        path = catalog_path(source.name if catalog == "source" else None)
+        derived.append(CatalogUpdater(path, source.name, columns))
+    return derived
+
+def sharded_datasets(source):
+    """Return the ShardedDatasets of a source with the 'shards' layout, or None."""
+    if source.layout != "shards":
+        return None
+    return ShardedDatasets(source.shards_path, source.stored_file, get_extractor(source.name, source.schema).columns)
+
+def publish_shards(source, shards):
+    """
+    Rewrite a sharded source's datasets.csv from its shards.
+
+    Runs read and update only the shards; datasets.csv is kept as the single
+    file the README download links point to, rewritten after every run that
+    writes the shards so it never lags behind them.
+    """
+    count = shards.consolidate(source.datasets_file)
+    print(f"Consolidated {count} rows from {len(shards.paths())} shards into {source.datasets_file}")
+
+def open_source_manifest(source):
+    """
+    Open a source's manifest against its stored rows (planner.open_manifest()).
 
-    if "id" not in df.columns:
-        print(f"Dataset DataFrame missing 'id' column; skipping save for {output_file}")
+    A source just switched to the 'shards' layout first has its shards split
+    from datasets.csv, with any legacy nested cells upgraded on the way.
+    datasets.csv stays, as the consolidated copy publish_shards() rewrites.
+    """
+    shards = sharded_datasets(source)
+    if shards is not None and not shards.exists() and os.path.exists(source.datasets_file):
+        nested.upgrade_file(source.datasets_file, nested.json_columns(source.schema))
+        try:
+            count = shards.split(source.datasets_file)
+        except spill_files.UnsortedInputError:
+            sort_datasets(source.datasets_file, source.schema)
+            count = shards.split(source.datasets_file)
+        print(f"Split {count} rows of {source.datasets_file} into {len(shards.paths())} shards in {shards.directory}")
+    return planner.open_manifest(source.name, source.metadata_file, source.stored_file)
+
+def run_source(source, mode=FETCH_MODE, streaming=STREAMING, store_format=STORE_FORMAT, catalog=CATALOG, ids=None):
+    """
+    Fetch and save detailed datasets for one source.
+
+    Parameters:
+    - source (NadaSource): Catalog to fetch (sources/registry.py).
+    - mode (str): Fetch engine, 'threads' or 'async'.
+    - streaming (bool): Spill fetched rows to disk (process_meta_streaming()) instead of
+      holding them in memory until the merge.
+    - store_format (str): 'csv', or 'parquet' to work from the columnar store.
+    - catalog (str): Also keep the SQLite catalog: None, 'source' or 'combined'.
+    - ids (list): Fetch only these IDs, changed or not; None for a normal run.
+
+    If the listing is unchanged since the last run and nothing is due
+    (planner.up_to_date()), nothing is read or written.
+    """
+    source_name = source.name
+    input_file = source.metadata_file
+    output_file = source.stored_file
+    shards = sharded_datasets(source)
+    if shards is not None and store_format == "parquet":
+        raise ValueError(f"The columnar store does not support the 'shards' layout of {source_name}")
+    manifest = open_source_manifest(source)
+    derived = derived_outputs(source, catalog)
+    published = shards is None or os.path.exists(source.datasets_file)
+    if (ids is None and published and planner.up_to_date(manifest, output_file)
+            and all(output.is_built() for output in derived)):
+        print(f"The {source.label} listing is unchanged since the last run; nothing to fetch")
+        manifest.close()
         return
+    fetch_function = source.fetch_dataset_async if mode == "async" else source.fetch_dataset
+    options = dict(mode=mode, concurrency=source.max_concurrency, manifest=manifest,
+                   journal=Journal.for_source(source_name), limiter=source.limiter, derived=derived, ids=ids,
+                   schema=source.schema)
+    if shards is None:
+        upgrade_nested_cells(options["manifest"], output_file, source.schema)
 
-    try:
-        df = df.sort_values('id')
-        df.to_csv(output_file, index=False)
-        print(f"Dataset with shape {df.shape} saved to {output_file}")
+    if store_format == "parquet":
+        store_dir = os.path.join(CACHE_PATH, "store", source_name)
+        written = process_meta_columnar(input_file, output_file, fetch_function, source_name, store_dir, **options)
+    else:
+        written = process_meta_merge(input_file, output_file, fetch_function, source_name,
+                                     spill_to_disk=streaming, shards=shards, **options)
 
-    except Exception as e:
-        print(f"Error saving dataframe: {e}")
+    if written:
+        planner.commit(options["manifest"], output_file)
+        if shards is not None:
+            publish_shards(source, shards)
+        # Journaled rows are now in datasets.csv; otherwise keep them for the next run.
+        options["journal"].clear()
+    options["journal"].close()
+    options["manifest"].close()
+    source.cache.evict()
 
-def run():
-    """Orchestrate fetching detailed datasets from all sources."""
-    try:
-        print(f"Fetching datasets from the World Bank MDL")
-        input_file = WB_DATA_PATH + "metadata.csv"
-        output_file = WB_DATA_PATH + "datasets.csv"
-        rawdf = process_meta(input_file, output_file, worldbank.fetch_dataset, 'worldbank')
-        process_datasets(rawdf, output_file)
-    except Exception as e:
-        print(f"An error occurred with World Bank: {e}")
+def run(mode=FETCH_MODE, streaming=STREAMING, store_format=STORE_FORMAT, sources=None, catalog=CATALOG, ids=None):
+    """
+    Orchestrate fetching detailed datasets from all sources.
 
-    try:
-        print(f"Fetching datasets from the UNHCR MDL")
-        input_file = UNHCR_DATA_PATH + "metadata.csv"
-        output_file = UNHCR_DATA_PATH + "datasets.csv"
-        rawdf = process_meta(input_file, output_file, unhcr.fetch_dataset, 'unhcr')
-        process_datasets(rawdf, output_file)
-    except Exception as e:
-        print(f"An error occurred with UNHCR: {e}")
+    Parameters:
+    - mode (str): Fetch engine, 'threads' or 'async'.
+    - streaming (bool): Spill fetched rows to disk as they arrive instead of
+      holding them in memory until the merge.
+    - store_format (str): 'csv', or 'parquet' to work from the columnar store.
+    - sources (list): NadaSource objects; defaults to every registered catalog.
+    - catalog (str): Also keep the SQLite catalog: None, 'source' or 'combined'.
+    - ids (list): Fetch only these IDs of each source, changed or not; None for a normal run.
+    """
+    for source in sources or registry.all_sources():
+        try:
+            print(f"Fetching datasets from the {source.label} MDL")
+            run_source(source, mode, streaming, store_format, catalog, ids)
+        except Exception as e:
+            print(f"An error occurred with {source.label}: {e}")
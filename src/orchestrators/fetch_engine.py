@@ -0,0 +1,179 @@
+"""
+Fetch engines used by fetch_datasets.fetch_rows().
+
+Both engines take a list of IDs and yield (id, data, error) tuples as requests
+complete, so callers can switch between them without changing their loop.
+
+- 'threads': a ThreadPoolExecutor calling the source's blocking fetch_dataset(id)
+  over the shared per-host requests pool.
+- 'async': an asyncio event loop calling the source's fetch_dataset_async(session, id)
+  over a single aiohttp keep-alive pool.
+
+In both, requests in flight are bounded by the host's AdaptiveLimiter
+(sources/throttle.py), and an ID that fails with a transient error (429, 5xx,
+timeout, reset connection) is retried up to RETRY_LIMIT times with jittered
+exponential backoff, waiting at least as long as the server's Retry-After.
+Only the last error of an ID is yielded.
+"""
+
+import asyncio
+import queue
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from sources import http_client, throttle
+
+FETCH_MODES = ("threads", "async")
+
+# Attempts per ID within one run, and the backoff between them in seconds.
+RETRY_LIMIT = 4
+BACKOFF_BASE = 1.0
+BACKOFF_CAP = 60.0
+
+_DONE = object()
+
+
+def backoff_delay(attempt, error):
+    """Return the wait before retry number `attempt` (0-based) after `error`."""
+    delay = random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+    requested = http_client.retry_after(error)
+    if requested is not None:
+        delay = max(delay, min(requested, throttle.MAX_PAUSE))
+    return delay
+
+
+def _release(limiter, started, error=None):
+    latency = time.monotonic() - started
+    if error is None:
+        limiter.release(latency)
+        return
+    throttled = http_client.status_of(error) in http_client.THROTTLE_STATUSES
+    limiter.release(latency, throttled=throttled, failed=not throttled and http_client.is_transient(error),
+                    retry_after=http_client.retry_after(error))
+
+
+def _should_retry(attempt, error):
+    return attempt + 1 < RETRY_LIMIT and http_client.is_transient(error)
+
+
+def _fetch_with_retries(fetch_function, id, limiter):
+    for attempt in range(RETRY_LIMIT):
+        limiter.acquire()
+        started = time.monotonic()
+        try:
+            data = fetch_function(id)
+        except Exception as e:
+            _release(limiter, started, e)
+            if not _should_retry(attempt, e):
+                raise
+            time.sleep(backoff_delay(attempt, e))
+        else:
+            _release(limiter, started)
+            return data
+
+
+def fetch_with_threads(ids, fetch_function, limiter):
+    """
+    Fetch IDs from a thread pool.
+
+    Parameters:
+    - ids (list): Dataset IDs to fetch.
+    - fetch_function (callable): Blocking function taking a single ID.
+    - limiter (AdaptiveLimiter): Bounds requests in flight; its maximum sizes the pool.
+
+    Yields:
+    - tuple: (id, data, error); exactly one of data/error is None.
+    """
+    with ThreadPoolExecutor(max_workers=limiter.maximum) as executor:
+        futures = {executor.submit(_fetch_with_retries, fetch_function, id, limiter): id for id in ids}
+        for future in as_completed(futures):
+            try:
+                yield futures[future], future.result(), None
+            except Exception as e:
+                yield futures[future], None, e
+
+
+async def _fetch_all(ids, fetch_function, limiter, results):
+    async with http_client.open_async_session(limiter.maximum) as session:
+        async def fetch_one(id):
+            for attempt in range(RETRY_LIMIT):
+                await limiter.acquire_async()
+                started = time.monotonic()
+                try:
+                    data = await fetch_function(session, id)
+                except Exception as e:
+                    _release(limiter, started, e)
+                    if not _should_retry(attempt, e):
+                        results.put((id, None, e))
+                        return
+                    await asyncio.sleep(backoff_delay(attempt, e))
+                else:
+                    _release(limiter, started)
+                    results.put((id, data, None))
+                    return
+
+        await asyncio.gather(*(fetch_one(id) for id in ids))
+
+
+def fetch_with_asyncio(ids, fetch_function, limiter):
+    """
+    Fetch IDs from an asyncio event loop running in a background thread.
+
+    Results are handed back through a queue so the caller can consume them
+    synchronously as they arrive.
+
+    Parameters:
+    - ids (list): Dataset IDs to fetch.
+    - fetch_function (coroutine function): Called as fetch_function(session, id).
+    - limiter (AdaptiveLimiter): Bounds requests in flight; its maximum sizes the pool.
+
+    Yields:
+    - tuple: (id, data, error); exactly one of data/error is None.
+    """
+    results = queue.Queue()
+
+    def run_loop():
+        try:
+            asyncio.run(_fetch_all(ids, fetch_function, limiter, results))
+        except Exception as e:
+            results.put(e)
+        finally:
+            results.put(_DONE)
+
+    thread = threading.Thread(target=run_loop, daemon=True)
+    thread.start()
+
+    while True:
+        item = results.get()
+        if item is _DONE:
+            break
+        if isinstance(item, Exception):
+            raise item
+        yield item
+
+    thread.join()
+
+
+def fetch_results(ids, fetch_function, mode="threads", concurrency=20, limiter=None):
+    """
+    Dispatch to the engine selected by `mode`.
+
+    Parameters:
+    - ids (list): Dataset IDs to fetch.
+    - fetch_function (callable): fetch_dataset for 'threads', fetch_dataset_async for 'async'.
+    - mode (str): One of FETCH_MODES.
+    - concurrency (int): Worker threads or in-flight requests; ignored with `limiter`.
+    - limiter (AdaptiveLimiter): Shared limiter of the host; without one the
+      run starts at `concurrency` and only backs off from there.
+
+    Yields:
+    - tuple: (id, data, error)
+    """
+    if limiter is None:
+        limiter = throttle.AdaptiveLimiter(concurrency, initial=concurrency)
+    if mode == "threads":
+        return fetch_with_threads(ids, fetch_function, limiter)
+    if mode == "async":
+        return fetch_with_asyncio(ids, fetch_function, limiter)
+    raise ValueError(f"Unknown fetch mode: {mode}. Must be one of {FETCH_MODES}")
@@ -1,45 +1,207 @@
+import hashlib
+import math
 import os
 import logging
-from sources import unhcr, worldbank
-from utils import UNHCR_DATA_PATH, WB_DATA_PATH
+import pandas as pd
+import telemetry
+from orchestrators import fetch_engine
+from sources import registry
+from storage import csv_format
+from storage.manifest import Manifest, file_signature
+from storage.timeseries import CounterSeries
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+STATS_DIRNAME = "stats"
+
+# Full passes over the listing before giving up on a catalog that keeps
+# changing size while it is being paged.
+LISTING_ATTEMPTS = 2
+
+# Columns the collector reads from a listing, given to an empty one so it is
+# saved, fingerprinted and recorded like any other.
+LISTING_COLUMNS = ["id", "idno", "created", "changed"]
+
+
+class InconsistentListingError(RuntimeError):
+    """The catalog changed while it was being paged, so the pages do not add up."""
+
+
+def fetch_pages(source, pages, on_page=None):
+    """
+    Fetch listing pages concurrently through the source's adaptive limiter,
+    retrying each page on transient errors.
+
+    Parameters:
+    - source (NadaSource): Catalog to list.
+    - pages (list): Page numbers to fetch.
+    - on_page (callable): Called with each page's rows as soon as it arrives.
+
+    Returns:
+    - dict: page -> (found, rows)
+    """
+    results = {}
+    for page, data, error in fetch_engine.fetch_results(pages, source.fetch_listing_page, limiter=source.limiter):
+        if error is not None:
+            raise error
+        results[page] = data
+        if on_page is not None:
+            on_page(data[1])
+    return results
+
+
+def fetch_metadata_list(source, on_page=None):
+    """
+    Fetch a source's whole catalog listing page by page.
+
+    The first page gives the catalog size; the remaining pages are fetched
+    concurrently. Each page is parsed on its own, so no response holds more
+    than the source's page_size rows. If the pages disagree on the catalog size, or
+    do not add up to it, the listing is fetched again.
+
+    Parameters:
+    - source (NadaSource): Catalog to list.
+    - on_page (callable): Called with each page's rows as soon as it arrives,
+      e.g. to start fetching details before the listing is complete.
+
+    Returns:
+    - pd.DataFrame: The metadata as a pandas DataFrame.
+    """
+    for attempt in range(LISTING_ATTEMPTS):
+        found, rows = fetch_pages(source, [1], on_page)[1]
+        pages = math.ceil(found / source.page_size) if source.page_size else 1
+        others = fetch_pages(source, list(range(2, pages + 1)), on_page)
+
+        consistent = all(page_found == found for page_found, _ in others.values())
+        rows_by_id = {row["id"]: row for row in rows}
+        for page in sorted(others):
+            rows_by_id.update((row["id"], row) for row in others[page][1])
+        if consistent and len(rows_by_id) == found:
+            return pd.DataFrame(list(rows_by_id.values()), columns=None if rows_by_id else LISTING_COLUMNS)
+        logging.warning(f"Listing changed while paging ({len(rows_by_id)} rows, {found} expected); "
+                        f"attempt {attempt + 1} of {LISTING_ATTEMPTS}")
+    raise InconsistentListingError(f"Listing pages do not add up to the catalog size of {found}")
+
 def save_to_csv(df, output_file):
     """
-    Save a DataFrame to a CSV file.
+    Save a DataFrame to a CSV file in the canonical format (storage/csv_format.py),
+    keeping the column order of the file it replaces.
 
     Parameters:
     - df (pd.DataFrame): The DataFrame to save.
     - output_file (str): The file path to save the CSV to.
     """
     try:
-        df = df.sort_values('id')
-        df.to_csv(output_file, index=False)
+        df = df.sort_values('id', kind='stable')
+        columns = csv_format.stable_columns(df.columns, csv_format.read_header(output_file))
+        csv_format.write_frame(df, output_file, columns)
         logging.info(f"Data successfully saved to {output_file}")
     except IOError as e:
         logging.error(f"Failed to save CSV: {e}")
         raise
 
-def run():
-    """Orchestrate fetching metadata lists from all sources."""
-    os.makedirs(UNHCR_DATA_PATH, exist_ok=True)
-    os.makedirs(WB_DATA_PATH, exist_ok=True)
+def record_counters(source, df):
+    """
+    Move a listing's volatile counters (source.volatile_columns) into the
+    source's append-only time series under <data_path>/stats/.
+
+    Parameters:
+    - source (NadaSource): Catalog the listing belongs to.
+    - df (pd.DataFrame): Listing as fetched.
+
+    Returns:
+    - pd.DataFrame: The listing without the counter columns.
+    """
+    columns = [col for col in source.volatile_columns if col in df.columns]
+    if not columns:
+        return df
+    series = CounterSeries(os.path.join(source.data_path, STATS_DIRNAME), columns)
+    count = series.append(df)
+    logging.info(f"Recorded {count} changed counter rows in {series.directory}")
+    return df.drop(columns=columns)
+
+def listing_fingerprint(df):
+    """
+    Fingerprint a listing: its row count, a digest of its sorted (id, idno)
+    pairs, and a hash of all its other fields (pandas' vectorized row hash, so
+    it costs milliseconds). Two listings with the same fingerprint produce the
+    same metadata.csv and the same fetch plan.
+
+    Parameters:
+    - df (pd.DataFrame): Listing without its volatile counters (record_counters()).
+
+    Returns:
+    - str: The fingerprint.
+    """
+    df = df.sort_values('id', kind='stable').reset_index(drop=True)
+    idnos = df['idno'] if 'idno' in df.columns else [''] * len(df)
+    ids = "\n".join(f"{int(id)}\t{idno}" for id, idno in zip(df['id'], idnos))
+    columns = sorted(df.columns)
+    fields = hashlib.blake2b("\t".join(columns).encode("utf-8"), digest_size=16)
+    fields.update(pd.util.hash_pandas_object(df[columns].astype(str), index=False).to_numpy().tobytes())
+    return f"{len(df)}:{hashlib.sha256(ids.encode('utf-8')).hexdigest()[:32]}:{fields.hexdigest()}"
 
+def listing_unchanged(source_name, fingerprint, output_file):
+    """
+    Return True if the manifest's listing has this fingerprint and was
+    recorded from the metadata.csv now on disk, so neither needs rewriting.
+    """
+    manifest = Manifest.for_source(source_name)
     try:
-        print(f"Fetching metadata from the UNHCR MDL")
-        df_unhcr = unhcr.fetch_metadata_list()
-        output_file = UNHCR_DATA_PATH + "metadata.csv"
-        save_to_csv(df_unhcr, output_file)
-        logging.info(f"UNHCR Metadata {df_unhcr.shape} saved to {output_file}")
-    except Exception as e:
-        logging.error(f"An error occurred with UNHCR: {e}")
+        return (manifest.get_meta("listing_fingerprint") == fingerprint
+                and manifest.get_meta("listing_signature") == file_signature(output_file))
+    finally:
+        manifest.close()
 
+def record_listing(source_name, df, output_file, fingerprint=None):
+    """
+    Record a saved listing in the source's manifest, so the fetch stage can
+    plan without re-reading metadata.csv.
+    """
+    manifest = Manifest.for_source(source_name)
     try:
-        print(f"Fetching metadata from the World Bank MDL")
-        df_wb = worldbank.fetch_metadata_list()
-        output_file = WB_DATA_PATH + "metadata.csv"
-        save_to_csv(df_wb, output_file)
-        logging.info(f"World Bank Metadata {df_wb.shape} saved to {output_file}")
-    except Exception as e:
-        logging.error(f"An error occurred with World Bank: {e}")
+        manifest.record_listing_frame(df, output_file, fingerprint)
+    finally:
+        manifest.close()
+
+def list_source(source, on_page=None):
+    """
+    Fetch one source's listing and save it as <data_path>/metadata.csv.
+
+    If the listing's fingerprint (listing_fingerprint()) is the one already
+    recorded for metadata.csv, the file and the manifest are left as they are.
+
+    Parameters:
+    - source (NadaSource): Catalog to list.
+    - on_page (callable): As for fetch_metadata_list().
+
+    Returns:
+    - pd.DataFrame: The saved listing.
+    """
+    os.makedirs(source.data_path, exist_ok=True)
+    with telemetry.stage(source.name, "list") as timer:
+        df = record_counters(source, fetch_metadata_list(source, on_page))
+        output_file = source.metadata_file
+        timer.records = len(df)
+        fingerprint = listing_fingerprint(df)
+        if listing_unchanged(source.name, fingerprint, output_file):
+            logging.info(f"{source.name} listing unchanged; {output_file} kept")
+            return df
+        save_to_csv(df, output_file)
+        record_listing(source.name, df, output_file, fingerprint)
+    logging.info(f"{source.name} metadata {df.shape} saved to {output_file}")
+    return df
+
+def run(sources=None):
+    """
+    Orchestrate fetching metadata lists from all sources.
+
+    Parameters:
+    - sources (list): NadaSource objects; defaults to every registered catalog.
+    """
+    for source in sources or registry.all_sources():
+        try:
+            print(f"Fetching metadata from the {source.label} MDL")
+            list_source(source)
+        except Exception as e:
+            logging.error(f"An error occurred with {source.label}: {e}")
@@ -0,0 +1,130 @@
+"""
+Incremental refresh planning for fetch_datasets.
+
+The work set of a run is read from the source's manifest (storage/manifest.py):
+
+- added:    listed IDs not yet in datasets.csv
+- modified: IDs in datasets.csv whose listing `created`/`changed` moved since
+            their row was fetched
+- removed:  IDs in datasets.csv that are no longer listed
+
+state.csv, next to datasets.csv, is the git-tracked copy of the timestamps
+each row was fetched from. It seeds the manifest when the manifest is new or
+datasets.csv changed outside the collector, and is re-exported after each
+successful write.
+
+Each commit also records the fingerprint of the listing it was planned from
+(list_metadata.listing_fingerprint()). While the listing keeps that
+fingerprint and no retry is due, up_to_date() lets a run skip the fetch
+stage, and with it every file write.
+"""
+
+import logging
+import os
+from collections import namedtuple
+from storage.manifest import Manifest, file_signature
+
+STATE_FILENAME = "state.csv"
+
+# Refuse to prune more than this share of existing datasets in one run; a
+# listing that suddenly lost most of its rows is more likely broken than real.
+MAX_REMOVED_FRACTION = 0.5
+
+WorkSet = namedtuple("WorkSet", ["added", "modified", "removed"])
+
+
+def state_path(output_file):
+    """Return the state.csv path that sits next to a datasets.csv."""
+    return os.path.join(os.path.dirname(output_file), STATE_FILENAME)
+
+
+def open_manifest(source_name, input_file, output_file):
+    """
+    Open a source's manifest and bring it in line with the files on disk.
+
+    The listing is re-read only if metadata.csv changed since it was recorded,
+    and stored IDs only if datasets.csv changed since the collector last wrote it.
+
+    Parameters:
+    - source_name (str): Registered source name, e.g. 'unhcr'
+    - input_file (str): Path to metadata.csv.
+    - output_file (str): Path to datasets.csv.
+
+    Returns:
+    - Manifest
+    """
+    manifest = Manifest.for_source(source_name)
+    if manifest.get_meta("datasets_signature") != file_signature(output_file):
+        manifest.seed(output_file, state_path(output_file))
+    manifest.sync_listing(input_file)
+    return manifest
+
+
+def plan(manifest, ids=None):
+    """
+    Build the work set for one source.
+
+    IDs in datasets.csv with no recorded timestamps are taken as up to date;
+    their current listing timestamps become the baseline on commit.
+
+    With explicit `ids`, exactly those of them that are listed are fetched
+    again, whether or not they changed (or are waiting for a retry), and
+    nothing is removed.
+
+    Parameters:
+    - manifest (Manifest): Manifest from open_manifest().
+    - ids (iterable): Dataset IDs to fetch, or None to plan from the listing.
+
+    Returns:
+    - WorkSet: Lists of added, modified and removed IDs.
+    """
+    if ids is not None:
+        ids = sorted(set(int(id) for id in ids))
+        listed = manifest.listed_ids()
+        unlisted = [id for id in ids if id not in listed]
+        if unlisted:
+            logging.warning(f"Skipping {len(unlisted)} requested IDs that are not listed: "
+                            f"{' '.join(str(id) for id in unlisted[:20])}")
+        stored = manifest.stored_ids()
+        return WorkSet([id for id in ids if id in listed and id not in stored],
+                       [id for id in ids if id in listed and id in stored], [])
+
+    removed = manifest.removed_ids()
+    stored = manifest.stored_count()
+    if stored and len(removed) > MAX_REMOVED_FRACTION * stored:
+        logging.warning(f"Listing would remove {len(removed)} of {stored} datasets; "
+                        f"skipping pruning for this run")
+        removed = []
+
+    return WorkSet(manifest.added_ids(), manifest.modified_ids(), removed)
+
+
+def up_to_date(manifest, output_file):
+    """
+    Return True if a run would not change anything: the listing has the
+    fingerprint of the last commit, the stored rows are the ones it wrote, and
+    nothing is to be fetched or removed (e.g. no failed fetch is due for a retry).
+
+    Parameters:
+    - manifest (Manifest): Manifest from open_manifest().
+    - output_file (str): Path to datasets.csv.
+    """
+    fingerprint = manifest.get_meta("listing_fingerprint")
+    return (fingerprint is not None
+            and fingerprint == manifest.get_meta("datasets_fingerprint")
+            and manifest.get_meta("datasets_signature") == file_signature(output_file)
+            and not manifest.added_ids() and not manifest.modified_ids() and not manifest.removed_ids())
+
+
+def commit(manifest, output_file):
+    """
+    Apply the staged work set once datasets.csv has been written, and export state.csv.
+
+    Parameters:
+    - manifest (Manifest): Manifest the work was staged in.
+    - output_file (str): Path to the datasets.csv that was written.
+    """
+    manifest.commit()
+    manifest.export_state(state_path(output_file))
+    manifest.set_meta("datasets_signature", file_signature(output_file))
+    manifest.set_meta("datasets_fingerprint", manifest.get_meta("listing_fingerprint"))
@@ -0,0 +1,210 @@
+"""
+Full rebuild of datasets.csv, flattened in parallel processes.
+
+After a schema change (schemas/column_mappings.py) every stored row has to be
+projected again, and flattening and CSV-encoding are CPU-bound. A rebuild
+re-reads each stored dataset's export from the response cache instead of the
+network, so it is CPU-bound throughout:
+
+1. The stored IDs are split, in id order, into contiguous ID ranges
+   (SHARDS_PER_WORKER per worker, so uneven shards even out).
+2. A process pool flattens each shard independently: parse the cached body,
+   SchemaExtractor.values(), encode the row, write it to the shard's file.
+3. The shard files, each sorted and covering its own ID range, are merged in
+   id order into datasets.csv by spill.merge_sorted() (or into the shards of
+   the 'shards' layout, storage/shards.py), exactly as a normal run merges
+   fetched rows. The output depends only on the cached bodies and the
+   schema, not on the number of workers or the order they finish in.
+
+Stored IDs without a usable cached body are fetched as in a normal run. The
+changeset, child tables and catalog are written as after a normal run, the
+latter two rebuilt from the new datasets.csv.
+"""
+
+import json
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import telemetry
+from orchestrators import fetch_datasets, planner
+from schemas.column_mappings import schema_version
+from schemas.extractor import SchemaExtractor, get_extractor
+from sources import registry
+from storage import csv_format, spill as spill_files
+from storage.changeset import Changeset
+from utils import CACHE_PATH
+
+DEFAULT_WORKERS = os.cpu_count() or 1
+SHARDS_PER_WORKER = 4
+
+
+def shard_ids(ids, shards):
+    """
+    Split IDs into contiguous ID ranges of near-equal size.
+
+    Parameters:
+    - ids (list): Dataset IDs.
+    - shards (int): Number of ranges wanted.
+
+    Returns:
+    - list: Lists of IDs in id order, at most `shards` of them, none empty.
+    """
+    ids = sorted(ids)
+    shards = max(1, min(shards, len(ids)))
+    size, remainder = divmod(len(ids), shards)
+    ranges = []
+    start = 0
+    for shard in range(shards):
+        end = start + size + (shard < remainder)
+        ranges.append(ids[start:end])
+        start = end
+    return [ids for ids in ranges if ids]
+
+
+def flatten_shard(schema, cache, tag_id, ids, path):
+    """
+    Flatten the cached exports of one shard into a file of encoded rows.
+
+    Runs in a worker process; all arguments are picklable.
+
+    Parameters:
+    - schema (dict): The source's schema.
+    - cache (ResponseCache): The source's response cache.
+    - tag_id (bool): As for NadaSource.
+    - ids (list): Shard IDs, in id order.
+    - path (str): Shard file to write.
+
+    Returns:
+    - tuple: (IDs written, IDs without a usable cached body, seconds spent)
+    """
+    start = time.perf_counter()
+    extractor = SchemaExtractor(schema)
+    written, missing = [], []
+    with open(path, "w", newline="", encoding="utf-8", buffering=spill_files.IO_BUFFER) as f:
+        for id in ids:
+            body = cache.load(id)
+            if body is None:
+                missing.append(id)
+                continue
+            try:
+                data = json.loads(body)
+            except ValueError:
+                missing.append(id)
+                continue
+            # A body that is not an export document (e.g. a JSON error list) is
+            # fetched again, where it fails as it would in a normal run.
+            if not isinstance(data, dict):
+                missing.append(id)
+                continue
+            if tag_id or "id" not in data:
+                data["id"] = id
+            f.write(csv_format.encode_row(extractor.values(data)))
+            written.append(id)
+    return written, missing, time.perf_counter() - start
+
+
+def rebuild_source(source, workers=DEFAULT_WORKERS, mode=fetch_datasets.FETCH_MODE,
+                   catalog=fetch_datasets.CATALOG):
+    """
+    Rebuild one source's datasets.csv from its cached exports.
+
+    Parameters:
+    - source (NadaSource): Catalog to rebuild (sources/registry.py).
+    - workers (int): Worker processes.
+    - mode (str): Fetch engine for IDs without a cached export, 'threads' or 'async'.
+    - catalog (str): As for fetch_datasets.run_source().
+
+    Returns:
+    - int: Number of rows written.
+    """
+    source_name = source.name
+    output_file = source.stored_file
+    sharded = fetch_datasets.sharded_datasets(source)
+    manifest = fetch_datasets.open_source_manifest(source)
+    columns = get_extractor(source_name, source.schema).columns
+    version = schema_version(source.schema)
+    ids = sorted(manifest.stored_ids())
+    shard_dir = os.path.join(CACHE_PATH, "rebuild", source_name)
+    os.makedirs(shard_dir, exist_ok=True)
+    batch = None
+    try:
+        shards = shard_ids(ids, workers * SHARDS_PER_WORKER)
+        print(f"Rebuilding {len(ids)} {source.label} datasets in {len(shards)} shards on {workers} processes")
+        results = []
+        busy = 0.0
+        started = time.perf_counter()
+        with telemetry.stage(source_name, "flatten") as timer:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = [pool.submit(flatten_shard, source.schema, source.cache, source.tag_id, shard,
+                                       os.path.join(shard_dir, f"{number:05d}.csv"))
+                           for number, shard in enumerate(shards)]
+                # Collected in shard order, whatever order the workers finish in.
+                for number, future in enumerate(futures):
+                    written, missing, seconds = future.result()
+                    results.append((os.path.join(shard_dir, f"{number:05d}.csv"), written, missing))
+                    busy += seconds
+            timer.records = sum(len(written) for _, written, _ in results)
+        print(f"Flattened {timer.records} datasets in {time.perf_counter() - started:.1f}s "
+              f"({busy:.1f}s of worker time)")
+        rebuilt = [id for _, written, _ in results for id in written]
+        missing = [id for _, _, shard_missing in results for id in shard_missing]
+        manifest.record_schema(rebuilt, version)
+
+        # Stored IDs with no usable cached body are fetched like any other.
+        fetched = spill_files.RowBatch()
+        if missing:
+            print(f"Fetching {len(missing)} datasets without a cached export")
+            fetch_function = source.fetch_dataset_async if mode == "async" else source.fetch_dataset
+            for id, values in fetch_datasets.fetch_rows(missing, fetch_function, source_name, manifest, None, mode,
+                                                        source.max_concurrency, source.limiter,
+                                                        schema=source.schema):
+                fetched.append(id, csv_format.encode_row(values))
+        batch = spill_files.ShardFiles([(path, written) for path, written, _ in results], fetched)
+
+        changes = Changeset(columns)
+        with telemetry.stage(source_name, "write") as timer:
+            if sharded is not None:
+                count = sharded.merge(batch, (), changes)
+            else:
+                try:
+                    count = spill_files.merge_sorted(output_file, batch, columns, output_file, (), changes)
+                except spill_files.UnsortedInputError:
+                    fetch_datasets.sort_datasets(output_file, source.schema)
+                    changes = Changeset(columns)
+                    count = spill_files.merge_sorted(output_file, batch, columns, output_file, (), changes)
+            timer.records = count
+        print(f"Dataset with {count} rows rebuilt in {sharded.directory if sharded is not None else output_file}")
+
+        manifest.stage(fetched.ids(), [])
+        planner.commit(manifest, output_file)
+        if sharded is not None:
+            fetch_datasets.publish_shards(source, sharded)
+        fetch_datasets.write_changeset(output_file, changes)
+        # A sharded source's datasets.csv was just consolidated from the new shards.
+        for output in fetch_datasets.derived_outputs(source, catalog):
+            output.rebuild(source.datasets_file)
+        return count
+    finally:
+        if batch is not None:
+            batch.close()
+        manifest.close()
+        shutil.rmtree(shard_dir, ignore_errors=True)
+
+
+def run(sources=None, workers=DEFAULT_WORKERS, mode=fetch_datasets.FETCH_MODE, catalog=fetch_datasets.CATALOG):
+    """
+    Rebuild every source's datasets.csv, one source after another (each uses all workers).
+
+    Parameters:
+    - sources (list): NadaSource objects; defaults to every registered catalog.
+    - workers (int): Worker processes.
+    - mode, catalog: As for rebuild_source().
+    """
+    for source in sources or registry.all_sources():
+        try:
+            rebuild_source(source, workers, mode, catalog)
+        except Exception as e:
+            print(f"An error occurred with {source.label}: {e}")
+    telemetry.write_report()
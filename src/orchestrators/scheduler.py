@@ -0,0 +1,239 @@
+"""
+Pipelined, concurrent run of all sources.
+
+Every registered catalog (sources/registry.py) runs as its own pipeline in its
+own thread, so catalogs on different hosts are worked on at the same time and
+adding one does not add its run time to the others'. Requests are bounded per
+host, not per catalog: each catalog fetches through its host's shared adaptive
+limiter, so catalogs on the same host together stay within one budget. A
+failure in one catalog does not stop the others. Within a catalog:
+
+    listing --pages--> prefetch --> fetch (plan, merge, commit)
+
+As listing pages arrive, the IDs on them that will need fetching (new, or with
+moved timestamps according to the manifest) are fetched in the background and
+written to the source's fetch journal. The fetch stage then plans from the
+complete listing as usual, replays the prefetched rows from the journal and
+only fetches what is left before merging and committing.
+
+Stage timings are collected in a RunReport, which prints every stage and the
+critical path: the chain of stages that determined the wall time. The detailed
+telemetry of the run (telemetry.py) is written to .cache/telemetry/ at the end.
+"""
+
+import logging
+import queue
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import telemetry
+from orchestrators import fetch_datasets, list_metadata
+from sources import registry
+from storage.journal import Journal
+from storage.manifest import listing_stamp
+
+Stage = namedtuple("Stage", ["source", "name", "start", "end", "error"])
+
+# Stages a run can be limited to; a run of only 'fetch' plans from the
+# metadata.csv already on disk.
+STAGES = ("list", "fetch")
+
+_DONE = object()
+
+
+class RunReport:
+    """Thread-safe record of stage timings for one run."""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.stages = []
+        self._lock = threading.Lock()
+
+    def add(self, source, name, start, end, error=None):
+        with self._lock:
+            self.stages.append(Stage(source, name, start - self.started, end - self.started, error))
+
+    @contextmanager
+    def stage(self, source, name):
+        """
+        Time a stage. An exception inside it is logged and recorded rather than
+        raised, so the rest of the run carries on.
+        """
+        start = time.monotonic()
+        error = None
+        try:
+            yield
+        except Exception as e:
+            error = e
+            logging.error(f"{source} {name} failed: {e}")
+        finally:
+            self.add(source, name, start, time.monotonic(), error)
+
+    def critical_path(self):
+        """
+        Return the chain of stages ending with the last one to finish, each
+        preceded by the latest-ending stage of the same source that finished
+        before it started.
+        """
+        if not self.stages:
+            return []
+        path = [max(self.stages, key=lambda stage: stage.end)]
+        while True:
+            current = path[0]
+            before = [stage for stage in self.stages if stage.source == current.source
+                      and stage is not current and stage.end <= current.start + 1e-6]
+            if not before:
+                return path
+            path.insert(0, max(before, key=lambda stage: stage.end))
+
+    def print_report(self):
+        wall = time.monotonic() - self.started
+        print(f"{'source':<12}{'stage':<10}{'start':>8}{'seconds':>9}")
+        for stage in sorted(self.stages, key=lambda stage: stage.start):
+            status = f"  failed: {stage.error}" if stage.error else ""
+            print(f"{stage.source:<12}{stage.name:<10}{stage.start:>8.1f}{stage.end - stage.start:>9.1f}{status}")
+        serial = sum(stage.end - stage.start for stage in self.stages)
+        path = " -> ".join(f"{stage.source} {stage.name} ({stage.end - stage.start:.1f}s)"
+                           for stage in self.critical_path())
+        print(f"Wall time {wall:.1f}s (serial stages {serial:.1f}s); critical path: {path}")
+
+
+class Prefetcher:
+    """
+    Background fetcher fed with listing pages.
+
+    Runs in its own thread with its own manifest connection, and journals
+    every row it fetches so the fetch stage can replay it.
+
+    Parameters:
+    - source (NadaSource): Catalog being listed.
+    - mode (str): Fetch engine, 'threads' or 'async'.
+    - report (RunReport): Receives the prefetch stage timing.
+    """
+
+    def __init__(self, source, mode, report):
+        self.source = source
+        self.source_name = source.name
+        self.mode = mode
+        self.report = report
+        self.fetched = 0
+        self._queue = queue.Queue()
+        self._queued = set()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, rows):
+        """Queue the rows of one listing page (use as list_source()'s on_page)."""
+        self._queue.put(rows)
+
+    def finish(self):
+        """Wait for every queued page to be fetched."""
+        self._queue.put(_DONE)
+        self._thread.join()
+
+    def _run(self):
+        start = time.monotonic()
+        error = None
+        source = self.source
+        fetch_function = source.fetch_dataset_async if self.mode == "async" else source.fetch_dataset
+        manifest = fetch_datasets.open_source_manifest(source)
+        journal = Journal.for_source(self.source_name)
+        done = False
+        try:
+            while not done:
+                rows = self._queue.get()
+                if rows is _DONE:
+                    break
+                # Take every page that arrived meanwhile as one batch, so the
+                # tail of one small batch does not hold up the next.
+                rows = list(rows)
+                while True:
+                    try:
+                        more = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if more is _DONE:
+                        done = True
+                        break
+                    rows.extend(more)
+                listed = [(row["id"], row.get("created"), row.get("changed")) for row in rows if "id" in row]
+                stamps = {int(id): listing_stamp(created, changed) for id, created, changed in listed}
+                ids = [id for id in manifest.needs_fetch(listed) if id not in self._queued]
+                self._queued.update(ids)
+                if ids:
+                    for _ in fetch_datasets.fetch_rows(ids, fetch_function, self.source_name, manifest, journal,
+                                                       self.mode, source.max_concurrency, source.limiter, stamps,
+                                                       source.schema):
+                        self.fetched += 1
+        except Exception as e:
+            # The fetch stage re-plans from scratch, so a failed prefetch only costs time.
+            error = e
+            logging.error(f"{self.source_name} prefetch failed: {e}")
+            while not done and self._queue.get() is not _DONE:
+                pass
+        finally:
+            journal.close()
+            manifest.close()
+            self.report.add(self.source_name, "prefetch", start, time.monotonic(), error)
+
+
+def run_pipeline(source, report, mode=fetch_datasets.FETCH_MODE, streaming=fetch_datasets.STREAMING,
+                 store_format=fetch_datasets.STORE_FORMAT, pipelined=True, catalog=fetch_datasets.CATALOG,
+                 stages=STAGES, ids=None):
+    """
+    Run listing and detail fetching for one source.
+
+    Parameters:
+    - source (NadaSource): Catalog to run.
+    - report (RunReport): Collects stage timings.
+    - mode, streaming, store_format, catalog, ids: As for fetch_datasets.run_source().
+    - pipelined (bool): Prefetch details while the listing is still arriving
+      (not with explicit `ids`).
+    - stages (tuple): The STAGES to run.
+    """
+    if "list" in stages:
+        fetching = "fetch" in stages and ids is None
+        prefetcher = Prefetcher(source, mode, report) if pipelined and fetching else None
+        try:
+            with report.stage(source.name, "listing"):
+                list_metadata.list_source(source, prefetcher.submit if prefetcher else None)
+        finally:
+            if prefetcher is not None:
+                prefetcher.finish()
+    # A failed listing leaves the previous metadata.csv, which is still fetched against.
+    if "fetch" in stages:
+        with report.stage(source.name, "fetch"):
+            fetch_datasets.run_source(source, mode, streaming, store_format, catalog, ids)
+
+
+def run(mode=fetch_datasets.FETCH_MODE, streaming=fetch_datasets.STREAMING, store_format=fetch_datasets.STORE_FORMAT,
+        pipelined=True, sources=None, catalog=fetch_datasets.CATALOG, stages=STAGES, ids=None):
+    """
+    Run every source's pipeline concurrently, print the stage report and
+    write the run's telemetry.
+
+    Parameters:
+    - mode, streaming, store_format, catalog, ids: As for fetch_datasets.run_source().
+    - pipelined (bool): Prefetch details while listings are still arriving.
+    - sources (list): NadaSource objects; defaults to every registered catalog.
+    - stages (tuple): The STAGES to run.
+
+    Returns:
+    - RunReport
+    """
+    sources = sources or registry.all_sources()
+    report = RunReport()
+    # One thread per catalog: the pipelines mostly wait on the network, and the
+    # per-host limiters, not this pool, bound the load on each server.
+    with ThreadPoolExecutor(max_workers=len(sources)) as executor:
+        futures = [executor.submit(run_pipeline, source, report, mode, streaming, store_format, pipelined, catalog,
+                                   stages, ids)
+                   for source in sources]
+        for future in futures:
+            future.result()
+    report.print_report()
+    telemetry.write_report()
+    return report
@@ -0,0 +1,28 @@
+"""
+Rebuild datasets.csv from the cached exports after a schema change, flattening
+in parallel processes (orchestrators/rebuild.py).
+
+Usage: python src/rebuild.py [--source unhcr] [--workers 8] [--catalog combined]
+"""
+
+import argparse
+from orchestrators import fetch_datasets, rebuild
+from sources import registry
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild datasets.csv from cached exports in parallel")
+    parser.add_argument("--source", action="append", choices=registry.names(),
+                        help="source to rebuild (repeatable; default: all)")
+    parser.add_argument("--workers", type=int, default=rebuild.DEFAULT_WORKERS, help="worker processes")
+    parser.add_argument("--mode", choices=["threads", "async"], default=fetch_datasets.FETCH_MODE,
+                        help="fetch engine for datasets without a cached export")
+    parser.add_argument("--catalog", choices=["source", "combined"], default=fetch_datasets.CATALOG,
+                        help="also reload the SQLite catalog")
+    args = parser.parse_args()
+
+    rebuild.run(registry.all_sources(args.source), args.workers, args.mode, args.catalog)
+
+
+if __name__ == "__main__":
+    main()
@@ -6,16 +6,25 @@ Provides fixed schemas and column mapping utilities to prevent schema drift.
 
 from .column_mappings import (
     apply_prefix_mapping,
+    apply_schema_dtypes,
     enforce_schema,
     get_schema_for_source,
+    schema_dtypes,
+    schema_version,
     WORLD_BANK_SCHEMA,
     UNHCR_SCHEMA,
 )
+from .extractor import SchemaExtractor, get_extractor
 
 __all__ = [
     'apply_prefix_mapping',
+    'apply_schema_dtypes',
     'enforce_schema',
     'get_schema_for_source',
+    'schema_dtypes',
+    'schema_version',
     'WORLD_BANK_SCHEMA',
     'UNHCR_SCHEMA',
+    'SchemaExtractor',
+    'get_extractor',
 ]
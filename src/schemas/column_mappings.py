@@ -3,17 +3,39 @@ Column mapping and schema enforcement for microdata collector.
 
 This module provides:
 1. Smart prefix mapping to prevent column name collisions
-2. Fixed schema definitions for predictable column sets
+2. Fixed schema definitions for predictable column sets; columns typed 'json'
+   hold lists/dicts, written as canonical JSON (storage/nested.py), and
+   columns typed 'category' hold a small set of repeated values
 3. Schema enforcement to align dataframes before merging
+4. Schema-driven pandas dtypes (schema_dtypes(), apply_schema_dtypes())
 """
 
-import pandas as pd
+import hashlib
+import importlib.util
 import logging
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+# Text storage for 'str' and 'json' columns: Arrow-backed strings if pyarrow is
+# installed (one buffer per column instead of one Python object per cell).
+STRING_DTYPE = "string[pyarrow]" if importlib.util.find_spec("pyarrow") else "string"
+
+# Text columns with at most this share of distinct values are stored as
+# categoricals too (e.g. 'nation' or 'producers'), once a frame has
+# CATEGORY_MIN_ROWS rows.
+CATEGORY_MAX_RATIO = 0.5
+CATEGORY_MIN_ROWS = 100
+
+SCHEMA_DTYPES = {
+    'Int64': 'Int64',
+    'category': 'category',
+    'str': STRING_DTYPE,
+    'json': STRING_DTYPE,
+}
+
+
 PREFIX_MAPPINGS = {
     'study_desc.': 'study.',
     'doc_desc.': 'doc.',
@@ -34,17 +56,17 @@ WORLD_BANK_SCHEMA = {
     'study.title_statement.alternate_title': 'str',
     'study.title_statement.alt_title': 'str',
     'study.title_statement.translated_title': 'str',
-    'study.title_statement.identifiers': 'str',
-    'authoring_entity': 'str',
-    'study.production_statement.producers': 'str',
+    'study.title_statement.identifiers': 'json',
+    'authoring_entity': 'json',
+    'study.production_statement.producers': 'json',
     'study.production_statement.prod_date': 'str',
     'study.production_statement.prod_place': 'str',
     'study.production_statement.copyright': 'str',
-    'study.production_statement.funding_agencies': 'str',
+    'study.production_statement.funding_agencies': 'json',
     'study.production_statement.grant_no': 'str',
-    'study.distribution_statement.distributors': 'str',
-    'study.distribution_statement.contact': 'str',
-    'study.distribution_statement.depositor': 'str',
+    'study.distribution_statement.distributors': 'json',
+    'study.distribution_statement.contact': 'json',
+    'study.distribution_statement.depositor': 'json',
     'study.distribution_statement.deposit_date': 'str',
     'study.distribution_statement.distribution_date': 'str',
     'study.series_statement.series_name': 'str',
@@ -57,24 +79,24 @@ WORLD_BANK_SCHEMA = {
     'doc.version_statement.version_date': 'str',
     'doc.version_statement.version_resp': 'str',
     'doc.version_statement.version_notes': 'str',
-    'keywords': 'str',
-    'topics': 'str',
+    'keywords': 'json',
+    'topics': 'json',
     'info.notes': 'str',
-    'coll_dates': 'str',
-    'nation': 'str',
+    'coll_dates': 'json',
+    'nation': 'json',
     'geog_coverage': 'str',
     'geog_coverage_notes': 'str',
-    'geog_unit': 'str',
-    'analysis_unit': 'str',
+    'geog_unit': 'category',
+    'analysis_unit': 'category',
     'universe': 'str',
-    'data_kind': 'str',
-    'study_scope': 'str',
-    'time_periods': 'str',
-    'time_method': 'str',
-    'data_collectors': 'str',
+    'data_kind': 'category',
+    'study_scope': 'category',
+    'time_periods': 'json',
+    'time_method': 'category',
+    'data_collectors': 'json',
     'method.sampling_procedure': 'str',
     'method.sampling_deviation': 'str',
-    'method.coll_mode': 'str',
+    'method.coll_mode': 'json',
     'method.research_instrument': 'str',
     'method.coll_situation': 'str',
     'method.act_min': 'str',
@@ -84,7 +106,7 @@ WORLD_BANK_SCHEMA = {
     'method.data_processing': 'str',
     'method.coding_instructions': 'str',
     'method.instru_development': 'str',
-    'method.collector_training': 'str',
+    'method.collector_training': 'json',
     'method.collector_training.type': 'str',
     'method.collector_training.training': 'str',
     'method.control_operations': 'str',
@@ -107,10 +129,10 @@ WORLD_BANK_SCHEMA = {
     'data_access.dataset_availability.complete': 'str',
     'data_access.dataset_availability.file_quantity': 'str',
     'data_access.dataset_availability.notes': 'str',
-    'data_access.dataset_use.contact': 'str',
+    'data_access.dataset_use.contact': 'json',
     'data_access.dataset_use.cit_req': 'str',
     'data_access.dataset_use.conditions': 'str',
-    'data_access.dataset_use.conf_dec': 'str',
+    'data_access.dataset_use.conf_dec': 'json',
     'data_access.dataset_use.disclaimer': 'str',
     'data_access.dataset_use.deposit_req': 'str',
     'data_access.dataset_use.restrictions': 'str',
@@ -121,26 +143,26 @@ WORLD_BANK_SCHEMA = {
     'study_notes': 'str',
     'sources': 'str',
     'sources.data_source': 'str',
-    'holdings': 'str',
+    'holdings': 'json',
     'frequency': 'str',
     'bib_citation': 'str',
     'bib_citation_format': 'str',
     'additional.ticker_description': 'str',
     'additional.ticker_info': 'str',
     'idno': 'str',
-    'oth_id': 'str',
-    'producers': 'str',
+    'oth_id': 'json',
+    'producers': 'json',
     'prod_date': 'str',
-    'production_statement': 'str',
-    'distribution_statement': 'str',
-    'series_statement': 'str',
+    'production_statement': 'json',
+    'distribution_statement': 'json',
+    'series_statement': 'json',
 }
 
 
 UNHCR_SCHEMA = {
     'id': 'Int64',
     'title': 'str',
-    'producers': 'str',
+    'producers': 'json',
     'prod_date': 'str',
     'title_statement.idno': 'str',
     'title_statement.title': 'str',
@@ -148,66 +170,66 @@ UNHCR_SCHEMA = {
     'title_statement.sub_title': 'str',
     'title_statement.alternate_title': 'str',
     'title_statement.translated_title': 'str',
-    'authoring_entity': 'str',
-    'production_statement.producers': 'str',
+    'authoring_entity': 'json',
+    'production_statement.producers': 'json',
     'production_statement.prod_date': 'str',
     'production_statement.copyright': 'str',
-    'production_statement.funding_agencies': 'str',
+    'production_statement.funding_agencies': 'json',
     'production_statement.grant_no': 'str',
-    'production_statement': 'str',
-    'distribution_statement.contact': 'str',
-    'distribution_statement.depositor': 'str',
-    'distribution_statement.distributors': 'str',
-    'distribution_statement': 'str',
+    'production_statement': 'json',
+    'distribution_statement.contact': 'json',
+    'distribution_statement.depositor': 'json',
+    'distribution_statement.distributors': 'json',
+    'distribution_statement': 'json',
     'series_statement.series_name': 'str',
     'series_statement.series_info': 'str',
-    'series_statement': 'str',
+    'series_statement': 'json',
     'version_statement.version': 'str',
     'version_statement.version_date': 'str',
     'version_statement.version_notes': 'str',
-    'version_statement': 'str',
-    'keywords': 'str',
-    'topics': 'str',
+    'version_statement': 'json',
+    'keywords': 'json',
+    'topics': 'json',
     'abstract': 'str',
-    'coll_dates': 'str',
-    'nation': 'str',
+    'coll_dates': 'json',
+    'nation': 'json',
     'geog_coverage': 'str',
-    'geog_unit': 'str',
-    'analysis_unit': 'str',
+    'geog_unit': 'category',
+    'analysis_unit': 'category',
     'universe': 'str',
-    'data_kind': 'str',
-    'study_scope': 'str',
+    'data_kind': 'category',
+    'study_scope': 'category',
     'notes': 'str',
-    'time_periods': 'str',
-    'time_method': 'str',
-    'data_collectors': 'str',
+    'time_periods': 'json',
+    'time_method': 'category',
+    'data_collectors': 'json',
     'sampling_procedure': 'str',
     'sampling_deviation': 'str',
-    'coll_mode': 'str',
+    'coll_mode': 'json',
     'research_instrument': 'str',
     'coll_situation': 'str',
     'weight': 'str',
     'cleaning_operations': 'str',
-    'collector_training': 'str',
+    'collector_training': 'json',
     'act_min': 'str',
     'analysis_info.response_rate': 'str',
     'analysis_info.sampling_error_estimates': 'str',
     'analysis_info.data_appraisal': 'str',
-    'sample_frame.frame_unit': 'str',
-    'data_access.dataset_availability': 'str',
+    'sample_frame.frame_unit': 'json',
+    'data_access.dataset_availability': 'json',
     'data_access.dataset_availability.access_place': 'str',
     'data_access.dataset_availability.access_place_uri': 'str',
     'data_access.dataset_availability.original_archive': 'str',
-    'data_access.dataset_use': 'str',
-    'data_access.dataset_use.contact': 'str',
+    'data_access.dataset_use': 'json',
+    'data_access.dataset_use.contact': 'json',
     'data_access.dataset_use.cit_req': 'str',
     'data_access.dataset_use.conditions': 'str',
-    'data_access.dataset_use.conf_dec': 'str',
+    'data_access.dataset_use.conf_dec': 'json',
     'data_access.dataset_use.disclaimer': 'str',
-    'ex_post_evaluation': 'str',
-    'holdings': 'str',
+    'ex_post_evaluation': 'json',
+    'holdings': 'json',
     'idno': 'str',
-    'oth_id': 'str',
+    'oth_id': 'json',
 }
 
 
@@ -236,7 +258,7 @@ def apply_prefix_mapping(df):
 
     df = df.rename(columns=new_columns)
 
-    duplicates = set([col for col in df.columns if df.columns.tolist().count(col) > 1])
+    duplicates = set(df.columns[df.columns.duplicated()])
     if duplicates:
         logger.warning(f"Duplicate columns detected after prefix mapping: {duplicates}")
 
@@ -259,6 +281,8 @@ def enforce_schema(df, schema):
     Returns:
         DataFrame aligned to schema
     """
+    import pandas as pd
+
     extra_cols = set(df.columns) - set(schema.keys())
     if extra_cols:
         logger.info(f"Dropping {len(extra_cols)} extra columns not in schema")
@@ -276,19 +300,81 @@ def enforce_schema(df, schema):
     return df
 
 
+def schema_dtypes(schema, columns=None):
+    """
+    Map schema columns to pandas dtypes, for pd.read_csv(dtype=...).
+
+    Args:
+        schema: Dict mapping column names to types
+        columns: Restrict to these columns (e.g. a file's header); columns
+            not in the schema are read as text
+
+    Returns:
+        Dict mapping column names to dtypes
+    """
+    if columns is None:
+        columns = schema.keys()
+    return {col: SCHEMA_DTYPES.get(schema.get(col), STRING_DTYPE) for col in columns}
+
+
+def apply_schema_dtypes(df, schema):
+    """
+    Convert a dataframe's columns to their schema dtypes.
+
+    'Int64' columns become nullable integers (so IDs stay integers through
+    concat and missing values), 'category' columns categoricals, and 'str' or
+    'json' columns STRING_DTYPE, or categoricals if they have few distinct
+    values (CATEGORY_MAX_RATIO).
+
+    Args:
+        df: DataFrame whose columns are in the schema
+        schema: Dict mapping column names to types
+
+    Returns:
+        DataFrame with converted columns
+    """
+    import pandas as pd
+
+    df = df.copy()
+    for col, dtype in schema_dtypes(schema, df.columns).items():
+        values = df[col]
+        if dtype == 'Int64':
+            if values.dtype != 'Int64':
+                df[col] = pd.to_numeric(values.replace("", None)).astype('Int64')
+            continue
+        if values.dtype == 'category':
+            continue
+        if dtype != 'category' and len(values) >= CATEGORY_MIN_ROWS:
+            if values.nunique(dropna=False) <= CATEGORY_MAX_RATIO * len(values):
+                dtype = 'category'
+        if values.dtype != dtype:
+            df[col] = values.astype(dtype)
+    return df
+
+
 def get_schema_for_source(source_name):
     """
     Get the schema for a given data source.
 
     Args:
-        source_name: 'worldbank' or 'unhcr'
+        source_name: Name of a catalog in sources/registry.py, e.g. 'worldbank' or 'unhcr'
 
     Returns:
         Schema dictionary
     """
-    if source_name == 'worldbank':
-        return WORLD_BANK_SCHEMA
-    elif source_name == 'unhcr':
-        return UNHCR_SCHEMA
-    else:
-        raise ValueError(f"Unknown source: {source_name}. Must be 'worldbank' or 'unhcr'")
+    # Imported here: the registry itself imports the schemas defined above.
+    from sources import registry
+    return registry.get(source_name).schema
+
+
+def schema_version(schema):
+    """
+    Short digest identifying a schema's columns and their order.
+
+    Args:
+        schema: Dict mapping column names to types
+
+    Returns:
+        12-character hex string
+    """
+    return hashlib.sha1("\n".join(schema.keys()).encode("utf-8")).hexdigest()[:12]
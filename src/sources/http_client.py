@@ -0,0 +1,248 @@
+"""
+Shared HTTP plumbing for the NADA sources.
+
+Keeps one keep-alive connection pool per host, so repeated export requests
+reuse TCP/TLS connections instead of paying the setup cost on every call.
+Every request has a connect and a read timeout, and errors are classified
+here (is_transient(), retry_after()) for the retrying fetch engines.
+"""
+
+import asyncio
+import json
+import sys
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import telemetry
+
+DEFAULT_POOL_SIZE = 20
+
+# (connect, read) timeouts in seconds; the read timeout applies between bytes.
+REQUEST_TIMEOUT = (10, 120)
+
+# Statuses that mean the server is shedding load, and other statuses worth retrying.
+THROTTLE_STATUSES = (429, 503)
+TRANSIENT_STATUSES = (408, 425, 429, 500, 502, 503, 504)
+
+_sessions = {}
+_pool_sizes = {}
+_lock = threading.Lock()
+
+
+def host_of(url):
+    """Return the network location (host[:port]) of a URL."""
+    return urlsplit(url).netloc
+
+
+def set_pool_size(host, size):
+    """
+    Set the connection pool size used for a host.
+
+    Takes effect the next time a session for that host is created, so call it
+    before the first request (or after close_sessions()).
+
+    Parameters:
+    - host (str): Host as returned by host_of().
+    - size (int): Maximum number of pooled keep-alive connections.
+    """
+    with _lock:
+        _pool_sizes[host] = size
+
+
+def get_session(url):
+    """
+    Return the shared requests.Session for the host of `url`.
+
+    Parameters:
+    - url (str): Any URL on the target host.
+
+    Returns:
+    - requests.Session: Session with a keep-alive pool sized for the host.
+    """
+    host = host_of(url)
+    with _lock:
+        session = _sessions.get(host)
+        if session is None:
+            size = _pool_sizes.get(host, DEFAULT_POOL_SIZE)
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=size)
+            session = requests.Session()
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _sessions[host] = session
+    return session
+
+
+def close_sessions():
+    """Close and forget every pooled session."""
+    with _lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
+
+
+def status_of(error):
+    """Return the HTTP status carried by a requests or aiohttp error, or None."""
+    response = getattr(error, "response", None)
+    if response is not None and getattr(response, "status_code", None) is not None:
+        return response.status_code
+    return getattr(error, "status", None)
+
+
+def failure_label(error):
+    """Classify a request that got no HTTP response: 'timeout' or 'error'."""
+    if isinstance(error, (requests.Timeout, TimeoutError, asyncio.TimeoutError)):
+        return "timeout"
+    return "error"
+
+
+def is_transient(error):
+    """
+    Return True if a failed request is worth retrying: a retryable HTTP status,
+    a timeout or a dropped connection.
+    """
+    status = status_of(error)
+    if status is not None:
+        return status in TRANSIENT_STATUSES
+    if isinstance(error, (requests.ConnectionError, requests.Timeout, ConnectionError, TimeoutError,
+                          asyncio.TimeoutError)):
+        return True
+    aiohttp = sys.modules.get("aiohttp")
+    return aiohttp is not None and isinstance(error, (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError))
+
+
+def retry_after(error):
+    """
+    Return the delay in seconds requested by a Retry-After header on an error
+    response, or None.
+    """
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or getattr(error, "headers", None)
+    value = headers.get("Retry-After") if headers else None
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def get_json(url, headers=None, cache=None, key=None):
+    """
+    GET a URL over the shared pool and decode the JSON body.
+
+    With a cache, the request is made conditional on the stored validators and
+    a 304 is answered from the cached body.
+
+    Parameters:
+    - url (str): Request URL.
+    - headers (dict): Optional request headers.
+    - cache (ResponseCache): Optional response cache for the source.
+    - key: Cache key (the dataset ID); required with `cache`.
+
+    Returns:
+    - The decoded JSON document.
+    """
+    request_headers = dict(headers or {})
+    if cache is not None:
+        request_headers.update(cache.conditional_headers(key))
+
+    start = time.monotonic()
+    try:
+        response = get_session(url).get(url, headers=request_headers, timeout=REQUEST_TIMEOUT)
+    except Exception as e:
+        telemetry.record_request(host_of(url), failure_label(e), time.monotonic() - start)
+        raise
+    telemetry.record_request(host_of(url), response.status_code, time.monotonic() - start, len(response.content))
+    if response.status_code == 304 and cache is not None:
+        body = cache.revalidated(key)
+        if body is not None:
+            return json.loads(body)
+        # Cached copy is unusable; fall back to an unconditional fetch.
+        cache.remove(key)
+        return get_json(url, headers=headers, cache=cache, key=key)
+
+    response.raise_for_status()
+    # Parsed before it is stored, so a body that is not JSON is never cached.
+    document = response.json()
+    if cache is not None:
+        cache.store(key, url, response.headers, response.content)
+    return document
+
+
+def open_async_session(concurrency):
+    """
+    Open an aiohttp session with a single bounded keep-alive pool.
+
+    aiohttp is only needed for the 'async' fetch mode, so it is imported here
+    rather than at module level.
+
+    Parameters:
+    - concurrency (int): Maximum number of open connections per host.
+
+    Returns:
+    - aiohttp.ClientSession: Use as an async context manager.
+    """
+    try:
+        import aiohttp
+    except ImportError as e:
+        raise ImportError("The 'async' fetch mode requires aiohttp (pip install aiohttp)") from e
+
+    connector = aiohttp.TCPConnector(limit=concurrency, limit_per_host=concurrency)
+    connect_timeout, read_timeout = REQUEST_TIMEOUT
+    timeout = aiohttp.ClientTimeout(sock_connect=connect_timeout, sock_read=read_timeout)
+    return aiohttp.ClientSession(connector=connector, timeout=timeout)
+
+
+async def get_json_async(session, url, headers=None, cache=None, key=None):
+    """
+    Async counterpart of get_json() for an aiohttp session.
+
+    Parameters:
+    - session (aiohttp.ClientSession): Session from open_async_session().
+    - url (str): Request URL.
+    - headers (dict): Optional request headers.
+    - cache (ResponseCache): Optional response cache for the source.
+    - key: Cache key (the dataset ID); required with `cache`.
+
+    Returns:
+    - The decoded JSON document.
+    """
+    request_headers = dict(headers or {})
+    if cache is not None:
+        request_headers.update(cache.conditional_headers(key))
+
+    start = time.monotonic()
+    answered = False
+    try:
+        async with session.get(url, headers=request_headers) as response:
+            if response.status == 304 and cache is not None:
+                answered = True
+                telemetry.record_request(host_of(url), response.status, time.monotonic() - start)
+                body = cache.revalidated(key)
+            else:
+                content = await response.read()
+                answered = True
+                telemetry.record_request(host_of(url), response.status, time.monotonic() - start, len(content))
+                response.raise_for_status()
+                document = json.loads(content)
+                if cache is not None:
+                    cache.store(key, url, response.headers, content)
+                return document
+    except Exception as e:
+        if not answered:
+            telemetry.record_request(host_of(url), failure_label(e), time.monotonic() - start)
+        raise
+
+    if body is not None:
+        return json.loads(body)
+    cache.remove(key)
+    return await get_json_async(session, url, headers=headers, cache=cache, key=key)
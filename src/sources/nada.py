@@ -0,0 +1,192 @@
+"""
+Config-driven adapter for one NADA catalog.
+
+Every catalog the collector mirrors runs NADA, so listing and export differ
+only in configuration: the URLs, the request headers, how the listing
+response is shaped, the output schema and where the files go. A NadaSource
+holds that configuration and provides what the orchestrators call:
+fetch_listing_page(), fetch_dataset() and fetch_dataset_async(), plus the
+source's shared per-host `limiter` and its response `cache`.
+
+Two listing formats are supported:
+
+- 'search':    /api/catalog/search, paged; {"result": {"found": n, "rows": [...]}}
+- 'list_idno': /api/catalog/list_idno/<type>, unpaged; {"records": [...]}
+
+Catalogs are declared in sources/registry.py.
+"""
+
+import logging
+import os
+
+from sources import http_client, throttle
+from sources.response_cache import ResponseCache
+from utils import DATA_PATH
+
+LISTING_FORMATS = ("search", "list_idno")
+
+# How stored rows are kept: one datasets.csv, or ID-range shards with an index (storage/shards.py).
+LAYOUTS = ("file", "shards")
+
+# Paged listing, oldest first, so datasets added mid-listing land on the last page.
+SEARCH_PATH = "/index.php/api/catalog/search?ps={page_size}&page={page}&sort_by=created&sort_order=asc"
+LIST_IDNO_PATH = "/index.php/api/catalog/list_idno/survey"
+EXPORT_PATH = "/index.php/metadata/export/{id}/json"
+
+DEFAULT_PAGE_SIZE = 500
+DEFAULT_MAX_CONCURRENCY = 20
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+class NadaSource:
+    """
+    One NADA catalog.
+
+    Parameters:
+    - name (str): Source name; keys the manifest, journal and caches under .cache/.
+    - base_url (str): Catalog root, e.g. "https://microdata.unhcr.org".
+    - schema (dict): Fixed output schema for datasets.csv (schemas/column_mappings.py).
+    - label (str): Name used in log messages; defaults to `name`.
+    - listing_format (str): 'search' or 'list_idno'.
+    - list_url (str): Listing URL; defaults to the NADA path for the format. Paged
+      URLs take {page_size} and {page}.
+    - export_url (str): Dataset export URL taking {id}; defaults to EXPORT_PATH.
+    - headers (dict): Extra request headers for every request.
+    - page_size (int): Rows per listing page ('search' only).
+    - data_path (str): Directory for metadata.csv and datasets.csv; defaults to data/<name>/.
+    - volatile_columns (list): Live listing counters kept in a time series under
+      <data_path>/stats/ instead of metadata.csv.
+    - max_concurrency (int): Upper bound on concurrent requests against the host.
+    - tag_id (bool): Set "id" on each export to the requested ID (for exports that omit it).
+    - layout (str): 'file' (datasets.csv) or 'shards' (shards/ and shards.csv; datasets.csv
+      only when consolidated).
+    """
+
+    def __init__(self, name, base_url, schema, label=None, listing_format="search", list_url=None,
+                 export_url=None, headers=None, page_size=DEFAULT_PAGE_SIZE, data_path=None,
+                 volatile_columns=(), max_concurrency=DEFAULT_MAX_CONCURRENCY, tag_id=True,
+                 layout="file"):
+        if listing_format not in LISTING_FORMATS:
+            raise ValueError(f"Unknown listing format: {listing_format}. Must be one of {LISTING_FORMATS}")
+        if layout not in LAYOUTS:
+            raise ValueError(f"Unknown layout: {layout}. Must be one of {LAYOUTS}")
+        self.name = name
+        self.label = label or name
+        self.base_url = base_url.rstrip("/")
+        self.schema = schema
+        self.listing_format = listing_format
+        default_list_path = SEARCH_PATH if listing_format == "search" else LIST_IDNO_PATH
+        self.list_url = list_url or self.base_url + default_list_path
+        self.export_url = export_url or self.base_url + EXPORT_PATH
+        self.headers = dict(headers or {})
+        self.page_size = page_size if listing_format == "search" else None
+        self.data_path = data_path or os.path.join(DATA_PATH, name) + "/"
+        self.volatile_columns = list(volatile_columns)
+        self.max_concurrency = max_concurrency
+        self.tag_id = tag_id
+        self.layout = layout
+        # Conditional-GET cache of raw export bodies, keyed by dataset ID.
+        self.cache = ResponseCache(name)
+        self.connect()
+
+    def __repr__(self):
+        return f"NadaSource({self.name!r}, {self.base_url!r})"
+
+    @property
+    def host(self):
+        return http_client.host_of(self.export_url)
+
+    @property
+    def metadata_file(self):
+        return self.data_path + "metadata.csv"
+
+    @property
+    def datasets_file(self):
+        return self.data_path + "datasets.csv"
+
+    @property
+    def shards_path(self):
+        return self.data_path + "shards/"
+
+    @property
+    def stored_file(self):
+        """The file the manifest tracks stored rows by: datasets.csv, or the shard index."""
+        return self.data_path + "shards.csv" if self.layout == "shards" else self.datasets_file
+
+    def connect(self):
+        """
+        Size the host's connection pool and attach the host's shared adaptive
+        limiter. Catalogs on the same host share one limiter, so together they
+        never exceed the first one's max_concurrency. Call again after changing
+        export_url.
+        """
+        http_client.set_pool_size(self.host, self.max_concurrency)
+        self.limiter = throttle.limiter_for(self.host, self.max_concurrency)
+
+    def set_concurrency(self, maximum):
+        """
+        Override max_concurrency, e.g. for one run. The host's limiter is shared,
+        so its other catalogs get the new bound too.
+        """
+        self.max_concurrency = maximum
+        self.connect()
+        self.limiter.set_maximum(maximum)
+
+    def fetch_listing_page(self, page):
+        """
+        Fetch one page of the catalog listing.
+
+        Parameters:
+        - page (int): 1-based page number, page_size rows per page (always 1 for 'list_idno').
+
+        Returns:
+        - tuple: (total number of datasets in the catalog, list of row dicts)
+        """
+        if self.listing_format == "search":
+            data = http_client.get_json(self.list_url.format(page_size=self.page_size, page=page),
+                                        headers=self.headers)
+        else:
+            data = http_client.get_json(self.list_url, headers=self.headers)
+        try:
+            if self.listing_format == "search":
+                result = data["result"]
+                return int(result["found"]), result["rows"]
+            records = data["records"]
+            return len(records), records
+        except (KeyError, TypeError, ValueError) as e:
+            logging.error(f"{self.label} Failed to process listing page {page}: {e}")
+            raise
+
+    def fetch_dataset(self, id):
+        """
+        Fetch the export of one dataset.
+
+        Parameters:
+        - id: Dataset ID
+
+        Returns:
+        - dict: Dataset information
+        """
+        data = http_client.get_json(self.export_url.format(id=id), headers=self.headers,
+                                    cache=self.cache, key=id)
+        if self.tag_id:
+            data["id"] = id
+        return data
+
+    async def fetch_dataset_async(self, session, id):
+        """
+        Async variant of fetch_dataset() for the 'async' fetch mode.
+
+        Parameters:
+        - session (aiohttp.ClientSession): Session from http_client.open_async_session().
+        - id: Dataset ID
+
+        Returns:
+        - dict: Dataset information
+        """
+        data = await http_client.get_json_async(session, self.export_url.format(id=id), headers=self.headers,
+                                                  cache=self.cache, key=id)
+        if self.tag_id:
+            data["id"] = id
+        return data
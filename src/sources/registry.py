@@ -0,0 +1,97 @@
+"""
+Registry of the NADA catalogs the collector mirrors.
+
+Orchestrators iterate all_sources() in registration order; schema lookups by
+source name (schemas.get_schema_for_source()) resolve through get(). Given
+NadaSource objects (sources=...), they use each source's own schema, so a
+source need not be registered to be run. To mirror another catalog for good,
+register a NadaSource for it below, e.g.:
+
+    register(NadaSource(
+        name='ihsn',
+        label='IHSN',
+        base_url="https://catalog.ihsn.org",
+        schema=UNHCR_SCHEMA,
+    ))
+
+Its files go to data/ihsn/ and its state to .cache/*/ihsn*. Catalogs on
+different hosts are fetched in parallel; catalogs on the same host share that
+host's adaptive limiter.
+"""
+
+from schemas.column_mappings import UNHCR_SCHEMA, WORLD_BANK_SCHEMA
+from sources.nada import NadaSource
+from utils import UNHCR_DATA_PATH, WB_DATA_PATH
+
+_sources = {}
+
+
+def register(source):
+    """
+    Add a catalog to the registry.
+
+    Parameters:
+    - source (NadaSource): Catalog to add; its name must be unique.
+
+    Returns:
+    - NadaSource: `source`, for chaining.
+    """
+    if source.name in _sources:
+        raise ValueError(f"Source already registered: {source.name}")
+    _sources[source.name] = source
+    return source
+
+
+def get(name):
+    """Return the registered catalog called `name`."""
+    try:
+        return _sources[name]
+    except KeyError:
+        raise ValueError(f"Unknown source: {name}. Must be one of {names()}") from None
+
+
+def names():
+    """Return the names of all registered catalogs, in registration order."""
+    return list(_sources)
+
+
+def all_sources(selected=None):
+    """
+    Return registered catalogs in registration order.
+
+    Parameters:
+    - selected (iterable): Names to restrict to, or None for all.
+
+    Returns:
+    - list: NadaSource objects.
+    """
+    if selected is None:
+        return list(_sources.values())
+    return [get(name) for name in selected]
+
+
+register(NadaSource(
+    name='worldbank',
+    label='World Bank',
+    base_url="https://microdata.worldbank.org",
+    schema=WORLD_BANK_SCHEMA,
+    # id/idno/type of every survey in one compact response (the endpoint is not paged).
+    listing_format="list_idno",
+    export_url="https://microdata.worldbank.org/index.php/metadata/export/{id}",
+    data_path=WB_DATA_PATH,
+    tag_id=False,
+))
+
+register(NadaSource(
+    name='unhcr',
+    label='UNHCR',
+    base_url="https://microdata.unhcr.org",
+    schema=UNHCR_SCHEMA,
+    headers={
+        "User-Agent": "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+    },
+    data_path=UNHCR_DATA_PATH,
+    # Live listing counters, kept as a time series under data/unhcr/stats/ rather
+    # than in metadata.csv, which they would otherwise rewrite on every run.
+    volatile_columns=["total_views", "total_downloads"],
+))
@@ -0,0 +1,180 @@
+"""
+On-disk response cache for NADA metadata exports.
+
+Each (source, ID) pair is stored as two files under CACHE_PATH/http/<source>/:
+
+- <id>.json:      the raw response body
+- <id>.meta.json: validators (ETag, Last-Modified), SHA-256 digest, size and timestamps
+
+Re-fetches send If-None-Match / If-Modified-Since from the stored validators, so
+an unchanged export costs a 304 instead of the full body.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from utils import CACHE_PATH
+
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+DEFAULT_MAX_AGE_DAYS = 180
+
+
+def _atomic_write(path, data):
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+class ResponseCache:
+    """
+    Validator-aware cache of raw export bodies for one source.
+
+    Parameters:
+    - source_name (str): Source the cache belongs to, e.g. 'unhcr'.
+    - root (str): Base cache directory.
+    - max_bytes (int): Size budget enforced by evict().
+    - max_age_days (float): Entries not validated for this long are dropped by evict().
+    """
+
+    def __init__(self, source_name, root=CACHE_PATH, max_bytes=DEFAULT_MAX_BYTES,
+                 max_age_days=DEFAULT_MAX_AGE_DAYS):
+        self.source_name = source_name
+        self.directory = os.path.join(root, "http", source_name)
+        self.max_bytes = max_bytes
+        self.max_age_days = max_age_days
+
+    def _body_path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _meta_path(self, key):
+        return os.path.join(self.directory, f"{key}.meta.json")
+
+    def lookup(self, key):
+        """Return the stored metadata for `key`, or None."""
+        try:
+            with open(self._meta_path(key), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def conditional_headers(self, key):
+        """Return If-None-Match / If-Modified-Since headers for a re-fetch of `key`."""
+        meta = self.lookup(key)
+        if meta is None:
+            return {}
+        headers = {}
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+        return headers
+
+    def load(self, key):
+        """
+        Return the cached body for `key` if it matches its stored digest.
+
+        Returns:
+        - bytes or None: None when the entry is missing or corrupt.
+        """
+        meta = self.lookup(key)
+        if meta is None:
+            return None
+        try:
+            with open(self._body_path(key), "rb") as f:
+                body = f.read()
+        except OSError:
+            return None
+        if hashlib.sha256(body).hexdigest() != meta.get("sha256"):
+            logging.warning(f"Cached body for {self.source_name}/{key} failed digest check")
+            return None
+        return body
+
+    def revalidated(self, key):
+        """
+        Handle a 304 for `key`: refresh its validation time and return the body.
+
+        Returns:
+        - bytes or None: None if the cached body is unusable and a full fetch is needed.
+        """
+        body = self.load(key)
+        if body is not None:
+            meta = self.lookup(key)
+            meta["validated_at"] = time.time()
+            _atomic_write(self._meta_path(key), json.dumps(meta).encode("utf-8"))
+        return body
+
+    def store(self, key, url, headers, body):
+        """
+        Store a 200 response.
+
+        Parameters:
+        - key: Dataset ID.
+        - url (str): Request URL.
+        - headers (Mapping): Response headers.
+        - body (bytes): Raw response body.
+
+        Returns:
+        - str: SHA-256 hex digest of the body.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        digest = hashlib.sha256(body).hexdigest()
+        now = time.time()
+        meta = {
+            "url": url,
+            "etag": headers.get("ETag"),
+            "last_modified": headers.get("Last-Modified"),
+            "sha256": digest,
+            "size": len(body),
+            "stored_at": now,
+            "validated_at": now,
+        }
+        _atomic_write(self._body_path(key), body)
+        _atomic_write(self._meta_path(key), json.dumps(meta).encode("utf-8"))
+        return digest
+
+    def remove(self, key):
+        """Drop the entry for `key` if present."""
+        for path in (self._body_path(key), self._meta_path(key)):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def evict(self):
+        """
+        Drop entries older than max_age_days, then the least recently validated
+        entries until the cache fits in max_bytes.
+
+        Returns:
+        - tuple: (entries removed, bytes freed)
+        """
+        if not os.path.isdir(self.directory):
+            return 0, 0
+
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".meta.json"):
+                key = name[:-len(".meta.json")]
+                meta = self.lookup(key)
+                if meta is not None:
+                    entries.append((meta.get("validated_at", 0), meta.get("size", 0), key))
+
+        cutoff = time.time() - self.max_age_days * 86400
+        entries.sort()
+        total = sum(size for _, size, _ in entries)
+        removed = freed = 0
+        for validated_at, size, key in entries:
+            if validated_at >= cutoff and total <= self.max_bytes:
+                break
+            self.remove(key)
+            total -= size
+            removed += 1
+            freed += size
+
+        if removed:
+            logging.info(f"Evicted {removed} cached {self.source_name} responses ({freed} bytes)")
+        return removed, freed
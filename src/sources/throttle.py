@@ -0,0 +1,156 @@
+"""
+Adaptive per-host concurrency control.
+
+An AdaptiveLimiter bounds the number of requests in flight against one host
+and moves that bound with the host's behaviour (additive increase,
+multiplicative decrease):
+
+- after a full window of healthy responses (one per slot), the limit grows by
+  one, as long as smoothed latency stays within LATENCY_TOLERANCE times (or
+  LATENCY_SLACK seconds of) the best seen;
+- a 429/503, another transient error or a timeout halves the limit, at most
+  once per cooldown so a burst of failures from requests already in flight
+  counts as one signal;
+- a Retry-After pauses every request to the host until it has passed.
+
+Limiters are shared per host (limiter_for()), so every caller hitting the
+same server sees the same limit. Both the threaded and asyncio fetch engines
+use them: acquire() blocks, acquire_async() awaits.
+"""
+
+import asyncio
+import threading
+import time
+
+DEFAULT_MINIMUM = 1
+DECREASE_FACTOR = 0.5
+LATENCY_TOLERANCE = 2.0
+LATENCY_SLACK = 0.1
+LATENCY_SMOOTHING = 0.2
+MIN_COOLDOWN = 1.0
+MAX_PAUSE = 300.0
+
+_limiters = {}
+_lock = threading.Lock()
+
+
+class AdaptiveLimiter:
+    """
+    AIMD concurrency limit for one host.
+
+    Parameters:
+    - maximum (int): Upper bound on requests in flight.
+    - minimum (int): Lower bound the limit never drops below.
+    - initial (int): Starting limit; defaults to a quarter of `maximum`.
+    """
+
+    def __init__(self, maximum, minimum=DEFAULT_MINIMUM, initial=None):
+        self.maximum = maximum
+        self.minimum = min(minimum, maximum)
+        self.limit = max(self.minimum, min(maximum, initial or maximum // 4))
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self._successes = 0
+        self._latency = None
+        self._best_latency = None
+        self._last_decrease = 0.0
+        self._condition = threading.Condition()
+
+    def set_maximum(self, maximum):
+        """Change the upper bound, lowering the current limit to it if needed."""
+        with self._condition:
+            self.maximum = maximum
+            self.minimum = min(self.minimum, maximum)
+            self.limit = max(self.minimum, min(self.limit, maximum))
+            self._condition.notify_all()
+
+    def _wait_time(self):
+        # Called with the condition held: 0 if a slot is free, the remaining
+        # pause in seconds, or None while every slot is taken.
+        wait = self.paused_until - time.monotonic()
+        if wait > 0:
+            return wait
+        return 0 if self.in_flight < self.limit else None
+
+    def acquire(self):
+        """Block until a request may be sent."""
+        with self._condition:
+            while True:
+                wait = self._wait_time()
+                if wait == 0:
+                    self.in_flight += 1
+                    return
+                self._condition.wait(wait)
+
+    async def acquire_async(self):
+        """Await until a request may be sent."""
+        while True:
+            with self._condition:
+                wait = self._wait_time()
+                if wait == 0:
+                    self.in_flight += 1
+                    return
+            await asyncio.sleep(min(wait, 0.05) if wait is not None else 0.01)
+
+    def release(self, latency, throttled=False, failed=False, retry_after=None):
+        """
+        Free a slot and feed the outcome of the request back into the limit.
+
+        Parameters:
+        - latency (float): Seconds the request took.
+        - throttled (bool): The server answered 429 or 503.
+        - failed (bool): Another transient failure (5xx, timeout, reset connection).
+        - retry_after (float): Seconds the server asked us to wait, if any.
+        """
+        with self._condition:
+            self.in_flight -= 1
+            now = time.monotonic()
+            if retry_after:
+                self.paused_until = max(self.paused_until, now + min(retry_after, MAX_PAUSE))
+            if throttled or failed:
+                self._decrease(now)
+            else:
+                self._record_success(latency)
+            self._condition.notify_all()
+
+    def _decrease(self, now):
+        cooldown = max(MIN_COOLDOWN, self._latency or 0)
+        if now - self._last_decrease < cooldown:
+            return
+        self._last_decrease = now
+        self._successes = 0
+        self.limit = max(self.minimum, int(self.limit * DECREASE_FACTOR))
+
+    def _record_success(self, latency):
+        if self._latency is None:
+            self._latency = latency
+        else:
+            self._latency += LATENCY_SMOOTHING * (latency - self._latency)
+        if self._best_latency is None or latency < self._best_latency:
+            self._best_latency = latency
+        if self._latency > max(LATENCY_TOLERANCE * self._best_latency, self._best_latency + LATENCY_SLACK):
+            # The server is slowing down; hold the limit where it is.
+            self._successes = 0
+            return
+        self._successes += 1
+        if self._successes >= self.limit and self.limit < self.maximum:
+            self._successes = 0
+            self.limit += 1
+
+
+def limiter_for(host, maximum):
+    """
+    Return the shared limiter of a host, creating it on first use.
+
+    Parameters:
+    - host (str): Host as returned by http_client.host_of().
+    - maximum (int): Upper bound on requests in flight (used on creation).
+
+    Returns:
+    - AdaptiveLimiter
+    """
+    with _lock:
+        limiter = _limiters.get(host)
+        if limiter is None:
+            limiter = _limiters[host] = AdaptiveLimiter(maximum)
+    return limiter
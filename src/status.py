@@ -0,0 +1,43 @@
+"""
+Report fetch state from the per-source run manifests.
+
+Usage: python src/status.py [--stale-days 90] [--list]
+"""
+
+import argparse
+import os
+import time
+from schemas.column_mappings import get_schema_for_source, schema_version
+from sources import registry
+from storage.manifest import Manifest, manifest_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report stale and failing dataset fetches")
+    parser.add_argument("--stale-days", type=float, default=90,
+                        help="report stored IDs last fetched longer ago than this")
+    parser.add_argument("--list", action="store_true", help="list failing and stale IDs")
+    args = parser.parse_args()
+
+    for source_name in registry.names():
+        if not os.path.exists(manifest_path(source_name)):
+            print(f"{source_name}: no manifest yet")
+            continue
+        manifest = Manifest.for_source(source_name)
+        version = schema_version(get_schema_for_source(source_name))
+        failing = manifest.failing()
+        stale = manifest.stale(args.stale_days, version)
+        summary = manifest.summary()
+        print(f"{source_name}: {summary['listed']} listed, {summary['stored']} stored, "
+              f"{len(failing)} failing, {len(stale)} stale")
+        if args.list:
+            for id, status, attempts, error, retry_at in failing:
+                retry = time.strftime("%Y-%m-%d %H:%M", time.gmtime(retry_at)) if retry_at else "next run"
+                print(f"  failing {id}: status {status}, {attempts} attempts, retry {retry}: {error}")
+            if stale:
+                print(f"  stale: {' '.join(str(id) for id in stale)}")
+        manifest.close()
+
+
+if __name__ == "__main__":
+    main()
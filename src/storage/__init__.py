@@ -0,0 +1,5 @@
+"""
+Storage module for microdata collector.
+
+Provides file-level building blocks for writing the per-source outputs.
+"""
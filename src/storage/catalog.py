@@ -0,0 +1,345 @@
+"""
+Embedded SQLite catalog of datasets.csv with full-text search.
+
+An optional, queryable copy of one or more sources' datasets.csv, kept under
+.cache/catalog/ either per source (<source>.sqlite) or for all sources
+together (catalog.sqlite). For each source it holds:
+
+- a table src_<source> with every schema column as text (`id` as the
+  integer primary key) plus a derived `year`, indexed on the idno column and
+  on `year`; the prefix keeps source names clear of the shared tables below;
+- rows in `nations` (source, id, name, abbreviation), indexed by name and
+  abbreviation;
+- rows in `search`, an FTS5 index over title, abstract, keywords (with
+  topics) and methodology fields, linked to datasets through `documents`.
+
+Searching the whole catalog is then one query:
+
+    Catalog(catalog_path()).search("refugees AND kenya", limit=20)
+
+The catalog is maintained from the run's changeset like the child tables
+(storage/child_tables.py): only rows added, modified or removed in the run
+are upserted or deleted. A source that is not in the catalog yet is loaded
+from datasets.csv.
+"""
+
+import logging
+import os
+import re
+import sqlite3
+
+import pandas as pd
+
+from storage import nested
+from storage.csv_format import format_cell
+from utils import CACHE_PATH
+
+CATALOG_FILENAME = "catalog.sqlite"
+TABLE_PREFIX = "src_"
+
+# Tables shared by all sources (the FTS5 index also owns search_* shadow tables).
+SHARED_TABLES = ("documents", "nations", "search")
+
+# Lock wait for catalogs shared by sources fetched in parallel.
+TIMEOUT_SECONDS = 60
+
+# Candidate columns of each source-independent field, first match wins.
+IDNO_COLUMNS = ["idno", "title_statement.idno", "study.title_statement.idno"]
+NATION_COLUMNS = ["nation"]
+YEAR_COLUMNS = ["coll_dates", "prod_date", "production_statement.prod_date", "study.production_statement.prod_date"]
+
+# Full-text fields and the columns they index (all that the schema has).
+SEARCH_FIELDS = {
+    "title": ["title"],
+    "abstract": ["abstract"],
+    "keywords": ["keywords", "topics"],
+    "methodology": [
+        "universe", "analysis_unit", "data_kind", "time_method", "coll_mode", "method.coll_mode",
+        "sampling_procedure", "method.sampling_procedure", "sampling_deviation", "method.sampling_deviation",
+        "research_instrument", "method.research_instrument", "weight", "method.weight",
+        "cleaning_operations", "method.cleaning_operations", "method.data_processing", "method.notes",
+    ],
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    rowid INTEGER PRIMARY KEY,
+    source TEXT NOT NULL,
+    id INTEGER NOT NULL,
+    UNIQUE (source, id)
+);
+CREATE TABLE IF NOT EXISTS nations (
+    source TEXT NOT NULL,
+    id INTEGER NOT NULL,
+    name TEXT,
+    abbreviation TEXT
+);
+CREATE INDEX IF NOT EXISTS nations_source_id ON nations (source, id);
+CREATE INDEX IF NOT EXISTS nations_name ON nations (name);
+CREATE INDEX IF NOT EXISTS nations_abbreviation ON nations (abbreviation);
+CREATE VIRTUAL TABLE IF NOT EXISTS search USING fts5 (
+    title, abstract, keywords, methodology, tokenize = 'unicode61 remove_diacritics 2'
+);
+"""
+
+YEAR_PATTERN = re.compile(r"\b(1[89]\d\d|2\d\d\d)\b")
+
+
+def catalog_path(source_name=None, root=CACHE_PATH):
+    """Return the catalog of one source, or the combined catalog if `source_name` is None."""
+    filename = f"{source_name}.sqlite" if source_name else CATALOG_FILENAME
+    return os.path.join(root, "catalog", filename)
+
+
+def table_name(source_name):
+    """Return the table holding a source's rows."""
+    return TABLE_PREFIX + source_name
+
+
+def _quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _strings(value):
+    # Every string leaf of a decoded cell, in order.
+    if isinstance(value, dict):
+        for item in value.values():
+            yield from _strings(item)
+    elif isinstance(value, list):
+        for item in value:
+            yield from _strings(item)
+    elif value is not None and value != "":
+        yield str(value)
+
+
+def _year(values):
+    for value in values:
+        for text in _strings(value):
+            match = YEAR_PATTERN.search(text)
+            if match:
+                return int(match.group(1))
+    return None
+
+
+class Catalog:
+    """
+    SQLite catalog of one or more sources.
+
+    Parameters:
+    - path (str): SQLite file; created with its directory if missing.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.connection = sqlite3.connect(path, timeout=TIMEOUT_SECONDS)
+        self.connection.executescript(SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    def sources(self):
+        """Return the names of the sources loaded into the catalog."""
+        rows = self.connection.execute("SELECT DISTINCT source FROM documents ORDER BY source")
+        return [row[0] for row in rows]
+
+    def has_source(self, source_name):
+        row = self.connection.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+                                      (table_name(source_name),)).fetchone()
+        return row is not None
+
+    def ensure_table(self, source_name, columns):
+        """Create the source's table, or add any schema columns it lacks."""
+        name = table_name(source_name)
+        table = _quote(name)
+        existing = {row[1] for row in self.connection.execute(f"PRAGMA table_info({table})")}
+        if not existing:
+            definitions = ", ".join(f"{_quote(c)} TEXT" for c in columns if c != "id")
+            self.connection.execute(f"CREATE TABLE {table} (id INTEGER PRIMARY KEY, {definitions}, year INTEGER)")
+            idno = next((c for c in IDNO_COLUMNS if c in columns), None)
+            if idno is not None:
+                self.connection.execute(
+                    f"CREATE INDEX {_quote(name + '_idno')} ON {table} ({_quote(idno)})")
+            self.connection.execute(f"CREATE INDEX {_quote(name + '_year')} ON {table} (year)")
+            return
+        for column in columns:
+            if column not in existing:
+                self.connection.execute(f"ALTER TABLE {table} ADD COLUMN {_quote(column)} TEXT")
+
+    def upsert(self, source_name, columns, rows, replace=True):
+        """
+        Insert or replace rows of a source, with their nations and search text.
+
+        Parameters:
+        - source_name (str): Source name.
+        - columns (list): Column of each row value; must include 'id'.
+        - rows (iterable): Rows of values (raw or cell text) in `columns` order.
+        - replace (bool): Drop the nations and search text the rows had before;
+          False when the source has just been cleared.
+
+        Returns:
+        - int: Number of rows written.
+        """
+        table = _quote(table_name(source_name))
+        id_position = columns.index("id")
+        nation_positions = [columns.index(c) for c in NATION_COLUMNS if c in columns]
+        year_positions = [columns.index(c) for c in YEAR_COLUMNS if c in columns]
+        search_positions = {field: [columns.index(c) for c in candidates if c in columns]
+                            for field, candidates in SEARCH_FIELDS.items()}
+        insert = (f"INSERT OR REPLACE INTO {table} ({', '.join(_quote(c) for c in columns)}, year) "
+                  f"VALUES ({', '.join('?' * (len(columns) + 1))})")
+        count = 0
+        for values in rows:
+            id = int(float(values[id_position]))
+            decoded = [nested.decode_cell(value) if isinstance(value, str) else value for value in values]
+            cells = [format_cell(value) or None for value in values]
+            cells[id_position] = id
+            if replace:
+                self._delete(source_name, [id], drop_row=False)
+            self.connection.execute(insert, cells + [_year(decoded[i] for i in year_positions)])
+            for position in nation_positions:
+                entries = decoded[position] if isinstance(decoded[position], list) else [decoded[position]]
+                self.connection.executemany(
+                    "INSERT INTO nations (source, id, name, abbreviation) VALUES (?, ?, ?, ?)",
+                    [(source_name, id, entry.get("name"), entry.get("abbreviation"))
+                     for entry in entries if isinstance(entry, dict)])
+            rowid = self.connection.execute("INSERT INTO documents (source, id) VALUES (?, ?)",
+                                            (source_name, id)).lastrowid
+            self.connection.execute(
+                "INSERT INTO search (rowid, title, abstract, keywords, methodology) VALUES (?, ?, ?, ?, ?)",
+                [rowid] + [" ".join(text for i in positions for text in _strings(decoded[i]))
+                           for positions in search_positions.values()])
+            count += 1
+        return count
+
+    def _delete(self, source_name, ids, drop_row=True):
+        for id in ids:
+            row = self.connection.execute("SELECT rowid FROM documents WHERE source = ? AND id = ?",
+                                          (source_name, id)).fetchone()
+            if row is not None:
+                self.connection.execute("DELETE FROM search WHERE rowid = ?", row)
+                self.connection.execute("DELETE FROM documents WHERE rowid = ?", row)
+            self.connection.execute("DELETE FROM nations WHERE source = ? AND id = ?", (source_name, id))
+            if drop_row:
+                self.connection.execute(f"DELETE FROM {_quote(table_name(source_name))} WHERE id = ?", (id,))
+
+    def delete(self, source_name, ids):
+        """Remove datasets of a source from the catalog."""
+        with self.connection:
+            self._delete(source_name, [int(id) for id in ids])
+
+    def load(self, source_name, input_file, columns, chunk_size=1000):
+        """
+        Replace everything the catalog holds for a source with a datasets.csv.
+
+        Returns:
+        - int: Number of rows loaded.
+        """
+        count = 0
+        with self.connection:
+            # Catalogs from before the prefix hold the rows in a table named after the source.
+            if source_name not in SHARED_TABLES and not source_name.startswith("search_"):
+                self.connection.execute(f"DROP TABLE IF EXISTS {_quote(source_name)}")
+            self.ensure_table(source_name, columns)
+            self.connection.execute(f"DELETE FROM {_quote(table_name(source_name))}")
+            self.connection.execute("DELETE FROM search WHERE rowid IN (SELECT rowid FROM documents WHERE source = ?)",
+                                    (source_name,))
+            self.connection.execute("DELETE FROM documents WHERE source = ?", (source_name,))
+            self.connection.execute("DELETE FROM nations WHERE source = ?", (source_name,))
+            for chunk in pd.read_csv(input_file, dtype=str, keep_default_na=False, chunksize=chunk_size):
+                chunk = chunk.reindex(columns=columns, fill_value="")
+                count += self.upsert(source_name, columns, chunk.itertuples(index=False, name=None), replace=False)
+        return count
+
+    def search(self, query, source=None, limit=20):
+        """
+        Full-text search over title, abstract, keywords and methodology.
+
+        Parameters:
+        - query (str): FTS5 query, e.g. 'refugee* AND "cash transfer"'.
+        - source (str): Restrict to one source.
+        - limit (int): Maximum number of results.
+
+        Returns:
+        - list: (source, id, title) tuples, best match first.
+        """
+        sql = ("SELECT documents.source, documents.id, search.title FROM search "
+               "JOIN documents ON documents.rowid = search.rowid WHERE search MATCH ?")
+        parameters = [query]
+        if source is not None:
+            sql += " AND documents.source = ?"
+            parameters.append(source)
+        sql += " ORDER BY rank LIMIT ?"
+        parameters.append(limit)
+        return self.connection.execute(sql, parameters).fetchall()
+
+
+class CatalogUpdater:
+    """
+    Keeps one source's rows of a Catalog in line with datasets.csv, as a
+    derived output of fetch_datasets (see process_meta_merge()).
+
+    Parameters:
+    - path (str): Catalog file (catalog_path()).
+    - source_name (str): Source name.
+    - columns (list): datasets.csv columns in the order fetched rows use.
+    """
+
+    def __init__(self, path, source_name, columns):
+        self.path = path
+        self.source_name = source_name
+        self.columns = list(columns)
+        self._rows = {}
+
+    def add(self, id, values):
+        """Record one fetched row (values in `columns` order)."""
+        self._rows[int(id)] = values
+
+    def is_built(self):
+        """Return True if the source is in the catalog, so write() needs no datasets.csv to load from."""
+        if not os.path.exists(self.path):
+            return False
+        catalog = Catalog(self.path)
+        try:
+            return catalog.has_source(self.source_name)
+        finally:
+            catalog.close()
+
+    def rebuild(self, output_file):
+        """Reload the source from datasets.csv (after a full rebuild of it)."""
+        catalog = Catalog(self.path)
+        try:
+            count = catalog.load(self.source_name, output_file, self.columns)
+        finally:
+            catalog.close()
+        logging.info(f"Loaded {count} {self.source_name} datasets into {self.path}")
+        return count
+
+    def write(self, output_file, changes):
+        """
+        Upsert the rows `changes` lists as added or modified, and delete the
+        removed ones. A source not yet in the catalog is loaded from `output_file`.
+
+        Returns:
+        - int: Number of rows written.
+        """
+        if not os.path.exists(output_file):
+            return 0
+        catalog = Catalog(self.path)
+        try:
+            if not catalog.has_source(self.source_name):
+                count = catalog.load(self.source_name, output_file, self.columns)
+                logging.info(f"Loaded {count} {self.source_name} datasets into {self.path}")
+                return count
+            changed = [id for id in list(changes.added) + list(changes.modified) if id in self._rows]
+            if not changed and not changes.removed:
+                return 0
+            with catalog.connection:
+                catalog.ensure_table(self.source_name, self.columns)
+                count = catalog.upsert(self.source_name, self.columns, (self._rows[id] for id in changed))
+                catalog._delete(self.source_name, [int(id) for id in changes.removed])
+            logging.info(f"Catalog {self.path}: {count} {self.source_name} datasets upserted, "
+                         f"{len(changes.removed)} removed")
+            return count
+        finally:
+            catalog.close()
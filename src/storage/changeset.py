@@ -0,0 +1,97 @@
+"""
+Per-run changeset for datasets.csv.
+
+Every run that changes datasets.csv writes changeset.json next to it:
+
+    {
+      "added": [ids],
+      "modified": {"<id>": [changed columns]},
+      "removed": [ids]
+    }
+
+Rows that were re-fetched but came back identical are not listed. A run
+without changes leaves the previous changeset in place; git history holds the
+changesets of earlier runs.
+"""
+
+import csv
+import json
+import os
+
+from storage.csv_format import format_cell
+from utils import atomic_output
+
+CHANGESET_FILENAME = "changeset.json"
+
+
+def changeset_path(output_file):
+    """Return the changeset.json path that sits next to a datasets.csv."""
+    return os.path.join(os.path.dirname(output_file), CHANGESET_FILENAME)
+
+
+def parse_row(text):
+    """Decode one encoded CSV row back to its list of cell texts."""
+    return next(csv.reader([text]), [])
+
+
+class Changeset:
+    """
+    Accumulates the row-level effect of a run.
+
+    Parameters:
+    - columns (list): Output column order, used to name changed columns.
+    """
+
+    def __init__(self, columns):
+        self.columns = list(columns)
+        self.added = []
+        self.modified = {}
+        self.removed = []
+
+    def __bool__(self):
+        return bool(self.added or self.modified or self.removed)
+
+    def replace(self, id, old_cells, new_cells):
+        """
+        Record a fetched row against the row it replaces.
+
+        Parameters:
+        - id: Dataset ID.
+        - old_cells (list): Cell texts of the previous row, or None if the ID is new.
+        - new_cells (list): Cell texts of the new row.
+        """
+        if old_cells is None:
+            self.added.append(int(id))
+            return
+        width = max(len(old_cells), len(new_cells))
+        old_cells = list(old_cells) + [""] * (width - len(old_cells))
+        new_cells = list(new_cells) + [""] * (width - len(new_cells))
+        changed = [self.columns[i] if i < len(self.columns) else str(i)
+                   for i, (old, new) in enumerate(zip(old_cells, new_cells)) if old != new]
+        if changed:
+            self.modified[int(id)] = changed
+
+    def replace_values(self, id, old_values, new_values):
+        """replace() for rows given as raw values rather than cell texts."""
+        old_cells = None if old_values is None else [format_cell(value) for value in old_values]
+        self.replace(id, old_cells, [format_cell(value) for value in new_values])
+
+    def remove(self, id):
+        self.removed.append(int(id))
+
+    def to_dict(self):
+        return {
+            "added": sorted(self.added),
+            "modified": {str(id): self.modified[id] for id in sorted(self.modified)},
+            "removed": sorted(self.removed),
+        }
+
+    def summary(self):
+        return f"{len(self.added)} added, {len(self.modified)} modified, {len(self.removed)} removed"
+
+    def write(self, path):
+        """Write the changeset as JSON, atomically."""
+        with atomic_output(path) as tmp_file:
+            with open(tmp_file, "w", encoding="utf-8") as f:
+                json.dump(self.to_dict(), f, indent=1)
+                f.write("\n")
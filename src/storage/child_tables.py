@@ -0,0 +1,247 @@
+"""
+Normalized child tables of the repeated fields in datasets.csv.
+
+Each NADA export carries lists such as keywords, topics or producers, which
+datasets.csv keeps as one JSON cell per dataset (storage/nested.py). The same
+lists are also written as flat tables under tables/ next to datasets.csv, one
+row per list entry, keyed by dataset `id` and the entry's `position` in the
+list:
+
+    tables/keywords.csv
+    id,position,keyword,vocab,uri
+    1000,0,Refugees,,
+    1000,1,Asylum seekers,,
+
+so "all datasets with keyword X" is a filter on one column. Each table takes
+its entries from the first of its CHILD_TABLES columns that the source's
+schema has, and keeps a fixed set of fields; other keys are dropped. An entry
+that is a plain string goes into the first field.
+
+Tables are sorted by (id, position) and updated incrementally: after a run,
+only the IDs the run's changeset (storage/changeset.py) lists as added,
+removed, or modified in the table's column are replaced; all other rows are
+copied through as they are. A table that does not exist yet is built from
+datasets.csv and the rows of the run.
+"""
+
+import csv
+import heapq
+import logging
+import os
+
+import pandas as pd
+
+from storage import nested
+from storage.csv_format import DIALECT, format_cell
+from utils import atomic_output
+
+TABLES_DIRNAME = "tables"
+
+# Table name -> (candidate datasets.csv columns, fields).
+CHILD_TABLES = {
+    "keywords": (["keywords"], ["keyword", "vocab", "uri"]),
+    "topics": (["topics"], ["topic", "vocab", "uri"]),
+    "nation": (["nation"], ["name", "abbreviation"]),
+    "producers": (["producers", "study.production_statement.producers", "production_statement.producers"],
+                  ["name", "abbr", "abbreviation", "affiliation", "role"]),
+    "authoring_entity": (["authoring_entity"], ["name", "affiliation"]),
+    "coll_dates": (["coll_dates"], ["start", "end", "cycle"]),
+    "contacts": (["study.distribution_statement.contact", "distribution_statement.contact"],
+                 ["name", "affiliation", "email", "uri"]),
+}
+
+KEY_COLUMNS = ["id", "position"]
+
+
+def tables_path(output_file):
+    """Return the tables/ directory that sits next to a datasets.csv."""
+    return os.path.join(os.path.dirname(output_file), TABLES_DIRNAME)
+
+
+def resolve_tables(columns):
+    """
+    Map each child table to the datasets.csv column it is built from.
+
+    Parameters:
+    - columns (list): datasets.csv columns (the source's schema order).
+
+    Returns:
+    - dict: table name -> column name, for the tables the columns support.
+    """
+    available = set(columns)
+    tables = {}
+    for table, (candidates, _) in CHILD_TABLES.items():
+        column = next((c for c in candidates if c in available), None)
+        if column is not None:
+            tables[table] = column
+    return tables
+
+
+def child_rows(id, value, fields):
+    """
+    Flatten one nested cell into child table rows.
+
+    Parameters:
+    - id (int): Dataset ID.
+    - value: Decoded cell (nested.decode_cell()) or its text.
+    - fields (list): The table's fields.
+
+    Returns:
+    - list: Rows of cell texts, [id, position, *fields].
+    """
+    if isinstance(value, str):
+        value = nested.decode_cell(value)
+    if value is None:
+        return []
+    entries = value if isinstance(value, list) else [value]
+    rows = []
+    for position, entry in enumerate(entries):
+        if isinstance(entry, dict):
+            cells = [format_cell(entry.get(field)) for field in fields]
+        else:
+            cells = [format_cell(entry)] + [""] * (len(fields) - 1)
+        if any(cells):
+            rows.append([str(int(id)), str(position)] + cells)
+    return rows
+
+
+def _row_key(row):
+    return int(row[0]), int(row[1])
+
+
+def _read_rows(path, header):
+    # Existing rows projected onto `header`, whatever order the file's columns are in.
+    with open(path, newline="", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        file_header = next(reader, None)
+        if file_header is None:
+            return
+        positions = [file_header.index(column) if column in file_header else None for column in header]
+        for row in reader:
+            yield [row[i] if i is not None and i < len(row) else "" for i in positions]
+
+
+def write_table(path, fields, rows, replaced_ids=None):
+    """
+    Write a child table, replacing the rows of some IDs.
+
+    Parameters:
+    - path (str): Table CSV file.
+    - fields (list): The table's fields.
+    - rows (list): New rows for the replaced IDs, [id, position, *fields].
+    - replaced_ids (set): IDs whose existing rows are dropped; None to
+      rewrite the table from `rows` alone.
+
+    Returns:
+    - int: Number of rows in the table.
+    """
+    header = KEY_COLUMNS + list(fields)
+    existing = []
+    if replaced_ids is not None and os.path.exists(path):
+        existing = (row for row in _read_rows(path, header) if int(row[0]) not in replaced_ids)
+    count = 0
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with atomic_output(path) as tmp_file:
+        with open(tmp_file, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f, **DIALECT)
+            writer.writerow(header)
+            for row in heapq.merge(existing, sorted(rows, key=_row_key), key=_row_key):
+                writer.writerow(row)
+                count += 1
+    return count
+
+
+class ChildTables:
+    """
+    Collects the child rows of fetched datasets and applies them to the
+    tables once datasets.csv has been written.
+
+    Parameters:
+    - directory (str): The tables/ directory (tables_path()).
+    - columns (list): datasets.csv columns in the order fetched rows use.
+    """
+
+    def __init__(self, directory, columns):
+        self.directory = directory
+        self.columns = list(columns)
+        self.tables = resolve_tables(self.columns)
+        self._positions = {table: self.columns.index(column) for table, column in self.tables.items()}
+        self._rows = {table: {} for table in self.tables}
+
+    def path(self, table):
+        return os.path.join(self.directory, f"{table}.csv")
+
+    def add(self, id, values):
+        """Record the child rows of one fetched row (values in `columns` order)."""
+        id = int(id)
+        for table, position in self._positions.items():
+            self._rows[table][id] = child_rows(id, values[position], CHILD_TABLES[table][1])
+
+    def build(self, output_file, table, removed=()):
+        """
+        Build one table from scratch: the rows collected so far, plus those of
+        the other IDs in datasets.csv (either before or after it was written).
+
+        Parameters:
+        - output_file (str): datasets.csv.
+        - table (str): Table name.
+        - removed (iterable): IDs to leave out.
+
+        Returns:
+        - int: Number of rows written.
+        """
+        column = self.tables[table]
+        fields = CHILD_TABLES[table][1]
+        collected = self._rows[table]
+        skip = set(collected) | set(removed)
+        df = pd.read_csv(output_file, dtype=str, keep_default_na=False, usecols=["id", column])
+        rows = [row for rows in collected.values() for row in rows]
+        for id, value in zip(df["id"], nested.decode_column(df[column])):
+            id = int(float(id))
+            if id not in skip:
+                rows.extend(child_rows(id, value, fields))
+        return write_table(self.path(table), fields, rows)
+
+    def is_built(self):
+        """Return True if every table exists, so write() needs no datasets.csv to build from."""
+        return all(os.path.exists(self.path(table)) for table in self.tables)
+
+    def rebuild(self, output_file):
+        """Rebuild every table from datasets.csv (after a full rebuild of it)."""
+        for table in self.tables:
+            self._rows[table].clear()
+            self.build(output_file, table)
+
+    def write(self, output_file, changes):
+        """
+        Apply a run to the tables: replace the rows of the IDs `changes` lists as
+        added, removed or modified in a table's column. Missing tables are built
+        from `output_file` instead.
+
+        Parameters:
+        - output_file (str): The datasets.csv the run wrote.
+        - changes (Changeset): The run's changeset.
+
+        Returns:
+        - dict: table name -> rows written, for the tables that were written.
+        """
+        written = {}
+        if not os.path.exists(output_file):
+            return written
+        removed = set(changes.removed)
+        for table, column in self.tables.items():
+            path = self.path(table)
+            if not os.path.exists(path):
+                written[table] = self.build(output_file, table, removed)
+                continue
+            replaced = set(changes.added) | removed
+            replaced.update(id for id, changed in changes.modified.items() if column in changed)
+            if not replaced:
+                continue
+            collected = self._rows[table]
+            rows = [row for id in replaced - removed for row in collected.get(id, [])]
+            written[table] = write_table(path, CHILD_TABLES[table][1], rows, replaced)
+        if written:
+            logging.info("Child tables updated: " + ", ".join(f"{table} ({rows} rows)"
+                                                             for table, rows in written.items()))
+        return written
@@ -0,0 +1,201 @@
+"""
+Columnar (Parquet) working store for fetched datasets.
+
+A store is a directory of part files, part-000000.parquet, part-000001.parquet,
+... Each append writes a new part, so a run only writes the rows it fetched.
+A row in a later part replaces the row with the same id in earlier parts, and
+rows flagged `_deleted` are tombstones for pruned IDs. compact() folds the
+parts back into one when they pile up.
+
+Cells are stored as the text written to datasets.csv (id as int64), so
+export_csv() reproduces the public CSV without re-formatting values. The
+format of that text for nested cells (storage/nested.py) is recorded in a
+marker file, so a store written in an older format can be told apart.
+
+pyarrow is an optional dependency, imported on first use.
+"""
+
+import csv
+import glob
+import os
+
+import pandas as pd
+from storage.csv_format import format_cell
+from utils import atomic_output
+
+DELETED_COLUMN = "_deleted"
+PART_PATTERN = "part-*.parquet"
+CELL_FORMAT_FILENAME = "cell_format"
+MAX_PARTS = 32
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError as e:
+        raise ImportError("The parquet store requires pyarrow (pip install pyarrow)") from e
+    return pyarrow
+
+
+def cell_text(value):
+    """Convert a value to the canonical text stored for it (None for missing)."""
+    text = format_cell(value)
+    return text if text != "" else None
+
+
+class ColumnarStore:
+    """
+    Append-only Parquet store for one source.
+
+    Parameters:
+    - directory (str): Directory holding the part files.
+    - columns (list): Schema columns, starting with `id`.
+    """
+
+    def __init__(self, directory, columns):
+        self.directory = directory
+        self.columns = list(columns)
+
+    def parts(self):
+        """Return part file paths in write order."""
+        return sorted(glob.glob(os.path.join(self.directory, PART_PATTERN)))
+
+    def exists(self):
+        return bool(self.parts())
+
+    def cell_format(self):
+        """Return the cell format recorded by set_cell_format(), or None."""
+        try:
+            with open(os.path.join(self.directory, CELL_FORMAT_FILENAME), encoding="utf-8") as f:
+                return f.read().strip()
+        except FileNotFoundError:
+            return None
+
+    def set_cell_format(self, cell_format):
+        os.makedirs(self.directory, exist_ok=True)
+        with atomic_output(os.path.join(self.directory, CELL_FORMAT_FILENAME)) as tmp_file:
+            with open(tmp_file, "w", encoding="utf-8") as f:
+                f.write(cell_format + "\n")
+
+    def clear(self):
+        """Remove every part and the cell format marker."""
+        for part in self.parts():
+            os.remove(part)
+        path = os.path.join(self.directory, CELL_FORMAT_FILENAME)
+        if os.path.exists(path):
+            os.remove(path)
+
+    def _arrow_schema(self):
+        pa = _pyarrow()
+        fields = [pa.field("id", pa.int64())]
+        fields += [pa.field(col, pa.string()) for col in self.columns if col != "id"]
+        fields.append(pa.field(DELETED_COLUMN, pa.bool_()))
+        return pa.schema(fields)
+
+    def _write_part(self, rows):
+        pa = _pyarrow()
+        os.makedirs(self.directory, exist_ok=True)
+        parts = self.parts()
+        next_number = int(os.path.basename(parts[-1])[5:11]) + 1 if parts else 0
+        path = os.path.join(self.directory, f"part-{next_number:06d}.parquet")
+        table = pa.Table.from_pylist(rows, schema=self._arrow_schema())
+        pa.parquet.write_table(table, path + ".tmp", compression="zstd")
+        os.replace(path + ".tmp", path)
+        return path
+
+    def append(self, rows, deleted_ids=()):
+        """
+        Append fetched rows and tombstones as one new part.
+
+        Parameters:
+        - rows (iterable): Lists of values in `columns` order.
+        - deleted_ids (iterable): IDs to mark as removed.
+
+        Returns:
+        - int: Number of rows written to the part.
+        """
+        records = []
+        for values in rows:
+            record = {col: cell_text(value) for col, value in zip(self.columns, values)}
+            record["id"] = int(values[0])
+            record[DELETED_COLUMN] = False
+            records.append(record)
+        for id in deleted_ids:
+            records.append({"id": int(id), DELETED_COLUMN: True})
+        if records:
+            self._write_part(records)
+        return len(records)
+
+    def _read(self, columns, ids=None):
+        pa = _pyarrow()
+        frames = []
+        filters = None
+        if ids is not None:
+            # Filtering on id keeps a row's tombstones and replacements together,
+            # so the filtered read resolves them as the full read would.
+            ids = sorted(int(id) for id in ids)
+            if not ids:
+                return pd.DataFrame(columns=[col for col in columns if col != DELETED_COLUMN])
+            filters = [("id", "in", ids)]
+        for part in self.parts():
+            available = set(pa.parquet.read_schema(part).names)
+            df = pa.parquet.read_table(part, columns=[c for c in columns if c in available],
+                                       filters=filters).to_pandas()
+            for col in columns:
+                if col not in df.columns:
+                    df[col] = None
+            frames.append(df[columns])
+        if not frames:
+            return pd.DataFrame(columns=columns)
+        df = pd.concat(frames, ignore_index=True)
+        df = df.drop_duplicates("id", keep="last")
+        df = df[~df[DELETED_COLUMN].fillna(False).astype(bool)]
+        return df.drop(columns=[DELETED_COLUMN]).sort_values("id").reset_index(drop=True)
+
+    def read(self, columns=None, ids=None):
+        """
+        Return live rows as a DataFrame sorted by id.
+
+        Parameters:
+        - columns (list): Columns to load (projection); defaults to all.
+        - ids (iterable): IDs to load (a row filter pushed into the Parquet
+          reader); defaults to all.
+        """
+        columns = list(columns or self.columns)
+        if "id" not in columns:
+            columns = ["id"] + columns
+        return self._read(columns + [DELETED_COLUMN], ids)
+
+    def import_csv(self, csv_file):
+        """Seed an empty store from an existing datasets.csv."""
+        df = pd.read_csv(csv_file, dtype=str, keep_default_na=False)
+        df = df.reindex(columns=self.columns)
+        rows = [[value if value != "" else None for value in row] for row in df.itertuples(index=False)]
+        return self.append(rows)
+
+    def compact(self, max_parts=MAX_PARTS):
+        """Rewrite the store as a single part once it has more than `max_parts` parts."""
+        old_parts = self.parts()
+        if len(old_parts) <= max_parts:
+            return False
+        df = self.read()
+        self._write_part([dict(row, **{DELETED_COLUMN: False}) for row in df.to_dict("records")])
+        for part in old_parts:
+            os.remove(part)
+        return True
+
+    def export_csv(self, output_file):
+        """
+        Write the live rows to a CSV sorted by id, via a temp file and rename.
+
+        Returns:
+        - int: Number of rows written.
+        """
+        df = self.read()
+        with atomic_output(output_file) as tmp_file:
+            with open(tmp_file, "w", newline="", encoding="utf-8") as f:
+                writer = csv.writer(f, lineterminator="\n")
+                writer.writerow(self.columns)
+                writer.writerows(df[self.columns].itertuples(index=False))
+        return len(df)
@@ -0,0 +1,112 @@
+"""
+Canonical CSV formatting for the git-tracked outputs.
+
+Every CSV the collector commits (metadata.csv, datasets.csv) is written here
+with one fixed dialect: minimal quoting, "\n" line endings, UTF-8, and cells
+formatted by format_cell() independently of the column's pandas dtype. A
+whole-number float (an integer column that picked up a NaN in a concat) is
+written as an integer, missing values as empty cells, and lists and dicts as
+canonical JSON (storage/nested.py). The same row therefore
+always encodes to the same bytes, and unchanged rows never show up in a diff.
+"""
+
+import csv
+import io
+import json
+import math
+
+import numpy as np
+import pandas as pd
+
+from utils import atomic_output
+
+DIALECT = dict(lineterminator="\n", quoting=csv.QUOTE_MINIMAL)
+
+
+def format_cell(value):
+    """
+    Return the canonical text of one cell.
+
+    Parameters:
+    - value: Any cell value (str, int, float, bool, numpy scalar, list, None, NA).
+
+    Returns:
+    - str: Cell text; "" for missing values.
+    """
+    if value is None or value is pd.NA or value is pd.NaT:
+        return ""
+    if isinstance(value, str):
+        return value
+    if isinstance(value, (list, dict)):
+        return json.dumps(value, ensure_ascii=False, sort_keys=True, separators=(",", ":"), default=str)
+    if isinstance(value, (bool, np.bool_)):
+        return str(bool(value))
+    if isinstance(value, (int, np.integer)):
+        return str(int(value))
+    if isinstance(value, (float, np.floating)):
+        value = float(value)
+        if math.isnan(value):
+            return ""
+        if value.is_integer() and abs(value) < 2**53:
+            return str(int(value))
+        return repr(value)
+    return str(value)
+
+
+def encode_row(values):
+    """Encode one row of values as a canonical CSV line (with its terminator)."""
+    buffer = io.StringIO()
+    csv.writer(buffer, **DIALECT).writerow([format_cell(value) for value in values])
+    return buffer.getvalue()
+
+
+def read_header(path):
+    """Return the header row of a CSV file, or None if it is missing or empty."""
+    try:
+        with open(path, newline="", encoding="utf-8") as f:
+            return next(csv.reader(f), None)
+    except FileNotFoundError:
+        return None
+
+
+def stable_columns(columns, previous):
+    """
+    Order `columns` like a previously written header, so that an upstream API
+    reordering its fields does not rewrite every line. Columns not in
+    `previous` keep their relative order at the end.
+
+    Parameters:
+    - columns (list): Columns to write.
+    - previous (list): Header of the file being replaced, or None.
+
+    Returns:
+    - list: `columns` in stable order.
+    """
+    if not previous:
+        return list(columns)
+    present = set(columns)
+    ordered = [col for col in previous if col in present]
+    known = set(ordered)
+    return ordered + [col for col in columns if col not in known]
+
+
+def write_frame(df, output_file, columns=None):
+    """
+    Write a DataFrame to CSV in the canonical format, atomically.
+
+    Parameters:
+    - df (pd.DataFrame): Rows to write, in the order given.
+    - output_file (str): Destination path.
+    - columns (list): Column order; defaults to the DataFrame's.
+
+    Returns:
+    - int: Number of rows written.
+    """
+    columns = list(columns if columns is not None else df.columns)
+    with atomic_output(output_file) as tmp_file:
+        with open(tmp_file, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f, **DIALECT)
+            writer.writerow(columns)
+            for row in df[columns].itertuples(index=False, name=None):
+                writer.writerow([format_cell(value) for value in row])
+    return len(df)
@@ -0,0 +1,384 @@
+"""
+Per-source run manifest.
+
+A small SQLite database under .cache/manifest/<source>.sqlite with one row per
+dataset ID, recording:
+
+- the current listing (`listed`, `created`, `changed`)
+- whether the ID is in datasets.csv (`stored`) and the listing timestamps its
+  row was fetched from (`seen_created`, `seen_changed`)
+- the last fetch attempt (`fetched_at`, `status`, `digest`, `schema_version`,
+  `error`, consecutive failed `attempts`)
+- for failing IDs, when to try again (`retry_at`): failures form a persisted
+  retry queue with exponential backoff across runs, starting at
+  RETRY_BASE_SECONDS and capped at RETRY_CAP_SECONDS
+
+Planning a run is then a few indexed queries instead of parsing metadata.csv
+and datasets.csv. Changes to `stored` are staged in `pending` and applied by
+commit() once datasets.csv has been written. The committed state is exported
+to the git-tracked state.csv, which also seeds a fresh manifest.
+"""
+
+import csv
+import hashlib
+import os
+import sqlite3
+import time
+from utils import CACHE_PATH, atomic_output
+
+csv.field_size_limit(2**31 - 1)
+
+RETRY_BASE_SECONDS = 6 * 3600
+RETRY_CAP_SECONDS = 30 * 86400
+
+SIGNATURE_BLOCK = 1 << 20
+
+# path -> ((inode, mtime_ns, size), signature), see file_signature().
+_signatures = {}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS datasets (
+    id INTEGER PRIMARY KEY,
+    listed INTEGER NOT NULL DEFAULT 0,
+    created TEXT,
+    changed TEXT,
+    stored INTEGER NOT NULL DEFAULT 0,
+    seen_created TEXT,
+    seen_changed TEXT,
+    fetched_at REAL,
+    status INTEGER,
+    digest TEXT,
+    schema_version TEXT,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    pending INTEGER,
+    retry_at REAL
+);
+CREATE INDEX IF NOT EXISTS datasets_listed_stored ON datasets (listed, stored);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+def manifest_path(source_name, root=CACHE_PATH):
+    """Return the manifest location for a source."""
+    return os.path.join(root, "manifest", f"{source_name}.sqlite")
+
+
+def file_signature(path):
+    """
+    Content signature (size and SHA-256) of a file, or None if missing.
+
+    Based on content rather than mtime, so a fresh git checkout of unchanged
+    files keeps their signatures. Digests are remembered per process by
+    inode, mtime and size, so a file is hashed once per run unless it changes.
+    """
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    key = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+    cached = _signatures.get(path)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(SIGNATURE_BLOCK), b""):
+            digest.update(block)
+    signature = f"{stat.st_size}:{digest.hexdigest()}"
+    _signatures[path] = (key, signature)
+    return signature
+
+
+def _text(value):
+    if value is None or value == "" or (isinstance(value, float) and value != value):
+        return None
+    return str(value)
+
+
+def listing_stamp(created, changed):
+    """Return the listing timestamps of an ID as one comparable string."""
+    return f"{_text(created) or ''}|{_text(changed) or ''}"
+
+
+class Manifest:
+    """
+    Fetch-state index for one source.
+
+    Parameters:
+    - path (str): SQLite file; created with its directory if missing.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.connection = sqlite3.connect(path)
+        self.connection.executescript(SCHEMA)
+        columns = {row[1] for row in self.connection.execute("PRAGMA table_info(datasets)")}
+        if "retry_at" not in columns:
+            with self.connection:
+                self.connection.execute("ALTER TABLE datasets ADD COLUMN retry_at REAL")
+
+    @classmethod
+    def for_source(cls, source_name):
+        return cls(manifest_path(source_name))
+
+    def close(self):
+        self.connection.close()
+
+    def get_meta(self, key):
+        row = self.connection.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key, value):
+        with self.connection:
+            self.connection.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    # Listing
+
+    def record_listing(self, rows, signature=None, fingerprint=None):
+        """
+        Replace the current listing.
+
+        Parameters:
+        - rows (iterable): (id, created, changed) tuples; timestamps may be None.
+        - signature (str): file_signature() of the metadata.csv the rows came from.
+        - fingerprint (str): Fingerprint of the listing response
+          (list_metadata.listing_fingerprint()), or None if unknown.
+        """
+        with self.connection:
+            self.connection.execute("UPDATE datasets SET listed = 0 WHERE listed = 1")
+            self.connection.executemany(
+                "INSERT INTO datasets (id, listed, created, changed) VALUES (?, 1, ?, ?) "
+                "ON CONFLICT (id) DO UPDATE SET listed = 1, created = excluded.created, changed = excluded.changed",
+                ((int(id), _text(created), _text(changed)) for id, created, changed in rows))
+            self.connection.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('listing_signature', ?)",
+                                    (signature,))
+            self.connection.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('listing_fingerprint', ?)",
+                                    (fingerprint,))
+
+    def record_listing_frame(self, df_meta, input_file, fingerprint=None):
+        """Record a listing DataFrame that has just been saved to `input_file`."""
+        created = df_meta["created"] if "created" in df_meta.columns else [None] * len(df_meta)
+        changed = df_meta["changed"] if "changed" in df_meta.columns else [None] * len(df_meta)
+        self.record_listing(zip(df_meta["id"], created, changed), file_signature(input_file), fingerprint)
+
+    def sync_listing(self, input_file):
+        """Re-index metadata.csv if it changed since the listing was last recorded."""
+        signature = file_signature(input_file)
+        if signature is None or signature == self.get_meta("listing_signature"):
+            return False
+        with open(input_file, newline="", encoding="utf-8") as f:
+            reader = csv.DictReader(f)
+            rows = [(row["id"], row.get("created"), row.get("changed")) for row in reader]
+        self.record_listing(rows, signature)
+        return True
+
+    # Stored datasets
+
+    def seed(self, output_file, state_file):
+        """
+        (Re)initialise `stored` and `seen_*` from datasets.csv and state.csv.
+
+        Used when the manifest is new or datasets.csv was changed outside the
+        collector. Only the `id` column of datasets.csv is decoded.
+        """
+        rows = []
+        if os.path.exists(output_file):
+            with open(output_file, newline="", encoding="utf-8") as f:
+                reader = csv.reader(f)
+                id_position = next(reader).index("id")
+                rows = [(int(float(row[id_position])),) for row in reader]
+        seen = []
+        if os.path.exists(state_file):
+            with open(state_file, newline="", encoding="utf-8") as f:
+                seen = [(_text(row["created"]), _text(row["changed"]), int(row["id"])) for row in csv.DictReader(f)]
+        with self.connection:
+            self.connection.execute("UPDATE datasets SET stored = 0, seen_created = NULL, seen_changed = NULL, "
+                                    "pending = NULL")
+            self.connection.executemany(
+                "INSERT INTO datasets (id, stored) VALUES (?, 1) ON CONFLICT (id) DO UPDATE SET stored = 1", rows)
+            self.connection.executemany(
+                "UPDATE datasets SET seen_created = ?, seen_changed = ? WHERE id = ?", seen)
+        return len(rows)
+
+    def _ids(self, query, params=()):
+        return [row[0] for row in self.connection.execute(query, params)]
+
+    def stored_ids(self):
+        return set(self._ids("SELECT id FROM datasets WHERE stored = 1"))
+
+    def stored_count(self):
+        return self.connection.execute("SELECT COUNT(*) FROM datasets WHERE stored = 1").fetchone()[0]
+
+    def listed_ids(self):
+        return set(self._ids("SELECT id FROM datasets WHERE listed = 1"))
+
+    def listed_count(self):
+        return self.connection.execute("SELECT COUNT(*) FROM datasets WHERE listed = 1").fetchone()[0]
+
+    # IDs still backing off after a failure are left out of added/modified
+    # until their retry_at has passed; see deferred_ids().
+
+    def added_ids(self):
+        return self._ids("SELECT id FROM datasets WHERE listed = 1 AND stored = 0 "
+                         "AND (retry_at IS NULL OR retry_at <= ?) ORDER BY id", (time.time(),))
+
+    def modified_ids(self):
+        # Rows without seen_* timestamps are taken as up to date (baseline).
+        return self._ids(
+            "SELECT id FROM datasets WHERE listed = 1 AND stored = 1 "
+            "AND (seen_created IS NOT NULL OR seen_changed IS NOT NULL) "
+            "AND (created IS NOT seen_created OR changed IS NOT seen_changed) "
+            "AND (retry_at IS NULL OR retry_at <= ?) ORDER BY id", (time.time(),))
+
+    def listing_stamps(self):
+        """Return listing_stamp() of every listed ID."""
+        rows = self.connection.execute("SELECT id, created, changed FROM datasets WHERE listed = 1")
+        return {id: listing_stamp(created, changed) for id, created, changed in rows}
+
+    def needs_fetch(self, rows):
+        """
+        Return the IDs among freshly listed rows that the next plan would fetch
+        (new, or with moved timestamps), before the listing itself is recorded.
+
+        Parameters:
+        - rows (iterable): (id, created, changed) tuples from a listing page.
+
+        Returns:
+        - list: IDs to fetch, in the order given.
+        """
+        rows = [(int(id), _text(created), _text(changed)) for id, created, changed in rows]
+        known = {}
+        for start in range(0, len(rows), 500):
+            chunk = [id for id, _, _ in rows[start:start + 500]]
+            known.update((row[0], row[1:]) for row in self.connection.execute(
+                f"SELECT id, stored, seen_created, seen_changed, retry_at FROM datasets "
+                f"WHERE id IN ({','.join('?' * len(chunk))})", chunk))
+        now = time.time()
+        ids = []
+        for id, created, changed in rows:
+            stored, seen_created, seen_changed, retry_at = known.get(id, (0, None, None, None))
+            if retry_at is not None and retry_at > now:
+                continue
+            if not stored or ((seen_created is not None or seen_changed is not None)
+                              and (created, changed) != (seen_created, seen_changed)):
+                ids.append(id)
+        return ids
+
+    def deferred_ids(self):
+        """Return listed IDs whose last fetch failed and whose retry is not yet due."""
+        return self._ids("SELECT id FROM datasets WHERE listed = 1 AND retry_at > ? ORDER BY id", (time.time(),))
+
+    def removed_ids(self):
+        return self._ids("SELECT id FROM datasets WHERE listed = 0 AND stored = 1 ORDER BY id")
+
+    # Fetch results
+
+    def record_fetch(self, id, status, digest=None, schema_version=None, error=None):
+        """
+        Record one fetch attempt.
+
+        A failure schedules the next attempt RETRY_BASE_SECONDS * 2**(n - 1)
+        seconds ahead (capped) for the n-th consecutive failure; a success
+        clears it.
+
+        Parameters:
+        - id: Dataset ID.
+        - status (int): HTTP status, or None if no response was received.
+        - digest (str): Body digest of a successful fetch.
+        - schema_version (str): Schema the row was projected with.
+        - error (str): Error message of a failed fetch.
+        """
+        with self.connection:
+            if error is None:
+                self.connection.execute(
+                    "INSERT INTO datasets (id, fetched_at, status, digest, schema_version, error, attempts, retry_at) "
+                    "VALUES (?, ?, ?, ?, ?, NULL, 0, NULL) ON CONFLICT (id) DO UPDATE SET "
+                    "fetched_at = excluded.fetched_at, status = excluded.status, digest = excluded.digest, "
+                    "schema_version = excluded.schema_version, error = NULL, attempts = 0, retry_at = NULL",
+                    (int(id), time.time(), status, digest, schema_version))
+            else:
+                now = time.time()
+                self.connection.execute(
+                    "INSERT INTO datasets (id, fetched_at, status, error, attempts, retry_at) "
+                    "VALUES (?, ?, ?, ?, 1, ?) "
+                    "ON CONFLICT (id) DO UPDATE SET fetched_at = excluded.fetched_at, status = excluded.status, "
+                    "error = excluded.error, attempts = attempts + 1, "
+                    "retry_at = excluded.fetched_at + MIN(?, ? * (1 << MIN(attempts, 30)))",
+                    (int(id), now, status, error, now + RETRY_BASE_SECONDS, RETRY_CAP_SECONDS, RETRY_BASE_SECONDS))
+
+    def record_schema(self, ids, schema_version):
+        """Record that stored rows were re-projected with `schema_version` without fetching them."""
+        with self.connection:
+            self.connection.executemany("UPDATE datasets SET schema_version = ? WHERE id = ?",
+                                        ((schema_version, int(id)) for id in ids))
+
+    def stage(self, fetched_ids, removed_ids):
+        """Stage the effect of the datasets.csv about to be written; see commit()."""
+        with self.connection:
+            self.connection.execute("UPDATE datasets SET pending = NULL WHERE pending IS NOT NULL")
+            self.connection.executemany("UPDATE datasets SET pending = 1 WHERE id = ?",
+                                        ((int(id),) for id in fetched_ids))
+            self.connection.executemany("UPDATE datasets SET pending = 0 WHERE id = ?",
+                                        ((int(id),) for id in removed_ids))
+
+    def commit(self):
+        """
+        Apply staged changes after datasets.csv has been written.
+
+        Fetched rows take the current listing timestamps as seen_*; removed rows
+        are cleared; stored rows still without seen_* get the listing as baseline.
+        """
+        with self.connection:
+            self.connection.execute(
+                "UPDATE datasets SET stored = 1, seen_created = created, seen_changed = changed WHERE pending = 1")
+            self.connection.execute(
+                "UPDATE datasets SET stored = 0, seen_created = NULL, seen_changed = NULL WHERE pending = 0")
+            self.connection.execute("UPDATE datasets SET pending = NULL WHERE pending IS NOT NULL")
+            self.connection.execute(
+                "UPDATE datasets SET seen_created = created, seen_changed = changed WHERE stored = 1 AND listed = 1 "
+                "AND seen_created IS NULL AND seen_changed IS NULL")
+
+    def export_state(self, state_file):
+        """Write stored IDs with their seen_* timestamps to state.csv, if there are any."""
+        rows = self.connection.execute(
+            "SELECT id, seen_created, seen_changed FROM datasets WHERE stored = 1 "
+            "AND (seen_created IS NOT NULL OR seen_changed IS NOT NULL) ORDER BY id").fetchall()
+        if not rows:
+            return False
+        with atomic_output(state_file) as tmp_file:
+            with open(tmp_file, "w", newline="", encoding="utf-8") as f:
+                writer = csv.writer(f, lineterminator="\n")
+                writer.writerow(["id", "created", "changed"])
+                writer.writerows(rows)
+        return True
+
+    # Reporting
+
+    def failing(self):
+        """Return (id, status, attempts, error, retry_at) for IDs whose last fetch failed."""
+        return self.connection.execute(
+            "SELECT id, status, attempts, error, retry_at FROM datasets WHERE error IS NOT NULL ORDER BY id").fetchall()
+
+    def stale(self, max_age_days, schema_version=None):
+        """
+        Return stored IDs last fetched more than `max_age_days` ago, never
+        fetched, or (with `schema_version`) fetched under a different schema.
+        """
+        cutoff = time.time() - max_age_days * 86400
+        query = "SELECT id FROM datasets WHERE stored = 1 AND (fetched_at IS NULL OR fetched_at < ?"
+        params = [cutoff]
+        if schema_version is not None:
+            query += " OR schema_version IS NOT ?"
+            params.append(schema_version)
+        return self._ids(query + ") ORDER BY id", params)
+
+    def summary(self):
+        """Return counts of listed, stored, failing and never-fetched IDs."""
+        row = self.connection.execute(
+            "SELECT SUM(listed), SUM(stored), SUM(error IS NOT NULL), SUM(stored = 1 AND fetched_at IS NULL) "
+            "FROM datasets").fetchone()
+        return dict(zip(["listed", "stored", "failing", "never_fetched"], [value or 0 for value in row]))
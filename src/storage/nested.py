@@ -0,0 +1,223 @@
+"""
+Nested (list/dict) cells of datasets.csv.
+
+NADA exports carry repeated structures such as keywords, topics, nation,
+producers and coll_dates as lists of dicts. They are written as canonical
+JSON (csv_format.format_cell(): sorted keys, no whitespace, UTF-8), e.g.
+
+    [{"abbreviation":"KEN","name":"Kenya"}]
+
+Schema columns that hold them are typed 'json' (schemas/column_mappings.py),
+so readers know which columns to decode without trial-parsing every cell.
+Older files hold Python repr strings ([{'name': 'Kenya', ...}]); the decoders
+here still read them, and upgrade_file() rewrites them as JSON once.
+
+Plain strings in a 'json' column (some fields are a list in one export and a
+string in another) are left as they are.
+"""
+
+import ast
+import csv
+import json
+
+import pandas as pd
+
+from storage.csv_format import DIALECT, format_cell
+from utils import atomic_output
+
+JSON_TYPE = "json"
+STARTS = ("[", "{")
+
+
+def json_columns(schema):
+    """Return the columns a schema types as 'json', in schema order."""
+    return [column for column, kind in schema.items() if kind == JSON_TYPE]
+
+
+def decode_cell(text):
+    """
+    Decode one nested cell.
+
+    Parameters:
+    - text (str): Cell text; JSON, a legacy Python repr, or a plain string.
+
+    Returns:
+    - list, dict, str or None: The structure, the text itself if it is not
+      one, or None for an empty cell.
+    """
+    if not isinstance(text, str):
+        return None if text is None or pd.isna(text) else text
+    if not text:
+        return None
+    if not text.startswith(STARTS):
+        return text
+    try:
+        return json.loads(text)
+    except ValueError:
+        pass
+    try:
+        value = ast.literal_eval(text)
+    except (ValueError, SyntaxError, TypeError, MemoryError, RecursionError):
+        return text
+    return value if isinstance(value, (list, dict)) else text
+
+
+def decode_column(series):
+    """
+    Decode a column of nested cells.
+
+    The cells starting with a bracket are joined into one JSON array and
+    parsed with a single json.loads() call; only if that fails are they
+    decoded one by one.
+
+    Parameters:
+    - series (pd.Series): Cell texts.
+
+    Returns:
+    - pd.Series: Object series of lists/dicts, plain strings and None.
+    """
+    cells = series.tolist()
+    result = [None if cell is None or cell == "" or (isinstance(cell, float) and cell != cell) else cell
+              for cell in cells]
+    positions = [i for i, cell in enumerate(result) if isinstance(cell, str) and cell.startswith(STARTS)]
+    if positions:
+        candidates = [result[i] for i in positions]
+        try:
+            values = json.loads("[" + ",".join(candidates) + "]")
+        except ValueError:
+            values = None
+        if values is None or len(values) != len(candidates):
+            # A legacy repr, a plain string starting with a bracket, or a cell
+            # holding several JSON values ("[1],[2]"); decode one by one.
+            values = [decode_cell(cell) for cell in candidates]
+        for i, value in zip(positions, values):
+            result[i] = value
+    return pd.Series(result, index=series.index, name=series.name, dtype=object)
+
+
+def decode_frame(df, schema):
+    """
+    Decode every 'json' column of a DataFrame read as text.
+
+    Parameters:
+    - df (pd.DataFrame): e.g. from fetch_datasets.read_datasets().
+    - schema (dict): The source's schema.
+
+    Returns:
+    - pd.DataFrame: A copy with the nested columns decoded.
+    """
+    df = df.copy()
+    for column in json_columns(schema):
+        if column in df.columns:
+            df[column] = decode_column(df[column])
+    return df
+
+
+def _joined(values, sep):
+    return sep.join(str(value) for value in values if value not in (None, ""))
+
+
+def merge_records(value, sep=";"):
+    """
+    Merge a list of dicts into one dict whose values join the entries' values.
+
+    [{'name': 'A', 'role': ''}, {'name': 'B', 'role': 'x'}] -> {'name': 'A;B', 'role': 'x'}
+
+    Empty values are skipped. A dict is returned as is; anything else gives {}.
+
+    Parameters:
+    - value: Decoded cell (see decode_cell()).
+    - sep (str): Separator between joined values.
+
+    Returns:
+    - dict
+    """
+    if isinstance(value, dict):
+        return value
+    if not isinstance(value, list):
+        return {}
+    collected = {}
+    for entry in value:
+        if isinstance(entry, dict):
+            for key, item in entry.items():
+                collected.setdefault(key, []).append(item)
+    return {key: _joined(items, sep) for key, items in collected.items()}
+
+
+def merge_column(series, sep=";", prefix=None):
+    """
+    Project a column of lists of dicts onto one column per key, each cell
+    joining that key's values across the list.
+
+    Parameters:
+    - series (pd.Series): Cell texts or decoded cells.
+    - sep (str): Separator between joined values.
+    - prefix (str): Column name prefix; defaults to "<series name>.".
+
+    Returns:
+    - pd.DataFrame: Same index as `series`; "" where a row has no value.
+    """
+    if prefix is None:
+        prefix = f"{series.name}." if series.name is not None else ""
+    decoded = decode_column(series) if series.map(lambda v: isinstance(v, str)).any() else series
+    entries = decoded.map(lambda v: [v] if isinstance(v, dict) else v if isinstance(v, list) else None)
+    entries = entries.explode().dropna()
+    entries = entries[entries.map(lambda v: isinstance(v, dict))]
+    if entries.empty:
+        return pd.DataFrame(index=series.index)
+    flat = pd.DataFrame.from_records(entries.tolist(), index=entries.index)
+    flat = flat.astype(object).where(flat.notna(), "").astype(str)
+    merged = flat.groupby(level=0, sort=False).agg(lambda values: sep.join(v for v in values if v))
+    merged = merged.reindex(series.index, fill_value="")
+    merged.columns = [f"{prefix}{column}" for column in merged.columns]
+    return merged
+
+
+def _is_legacy(text):
+    # A list/dict cell that is not JSON but decodes as a Python literal.
+    if not text.startswith(STARTS):
+        return False
+    try:
+        json.loads(text)
+        return False
+    except ValueError:
+        return isinstance(decode_cell(text), (list, dict))
+
+
+def upgrade_file(path, columns):
+    """
+    Rewrite legacy Python-repr cells of a CSV as canonical JSON, in place.
+
+    The file is scanned first and only rewritten (streamed, atomically) if it
+    holds legacy cells.
+
+    Parameters:
+    - path (str): CSV file, e.g. datasets.csv.
+    - columns (list): Columns to upgrade (json_columns() of the schema).
+
+    Returns:
+    - int: Number of cells rewritten.
+    """
+    columns = set(columns)
+    with open(path, newline="", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            return 0
+        positions = [i for i, column in enumerate(header) if column in columns]
+        if not any(_is_legacy(row[i]) for row in reader for i in positions if i < len(row)):
+            return 0
+
+    changed = 0
+    with open(path, newline="", encoding="utf-8") as f, atomic_output(path) as tmp_file:
+        reader = csv.reader(f)
+        with open(tmp_file, "w", newline="", encoding="utf-8") as out:
+            writer = csv.writer(out, **DIALECT)
+            writer.writerow(next(reader))
+            for row in reader:
+                for i in positions:
+                    if i < len(row) and _is_legacy(row[i]):
+                        row[i] = format_cell(decode_cell(row[i]))
+                        changed += 1
+                writer.writerow(row)
+    return changed
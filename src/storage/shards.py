@@ -0,0 +1,193 @@
+"""
+Sharded layout of datasets.csv.
+
+With the 'shards' layout (NadaSource(layout="shards")), a source's rows are
+kept in shards/ next to metadata.csv instead of one datasets.csv, one CSV per
+range of SHARD_WIDTH IDs:
+
+    shards/0000000.csv    ids 0-99
+    shards/0000100.csv    ids 100-199
+    shards.csv            id,shard index of every stored row
+
+Each shard has the datasets.csv header and is sorted by id, so a run merges
+its fetched rows into only the shards they fall in, by the same linear merge
+as a datasets.csv (spill.merge_sorted()); other shards are not touched, and
+neither rewritten nor diffed. The index is what the run manifest tracks in
+place of datasets.csv (storage/manifest.py). A consolidated datasets.csv is
+written on demand by consolidate().
+
+The shards are seeded from datasets.csv by split() when a source is switched
+to the layout. SHARD_WIDTH is fixed for a set of shards: to change it,
+consolidate, delete shards/ and shards.csv, and split again.
+"""
+
+import csv
+import itertools
+import logging
+import os
+from contextlib import contextmanager
+
+from storage import spill as spill_files
+from storage.spill import IO_BUFFER, id_key
+from utils import atomic_output
+
+SHARD_WIDTH = 100
+INDEX_COLUMNS = ["id", "shard"]
+
+
+class _ShardRows:
+    # The rows of a batch that fall in one shard, as merge_sorted() reads them.
+
+    def __init__(self, ids, rows):
+        self._ids = ids
+        self._rows = rows
+
+    def ids(self):
+        return self._ids
+
+    def iter_sorted(self):
+        return self._rows
+
+
+class ShardedDatasets:
+    """
+    The shards and index of one source.
+
+    Parameters:
+    - directory (str): Shard directory (NadaSource.shards_path).
+    - index_file (str): Index CSV (NadaSource.stored_file).
+    - columns (list): datasets.csv columns (the source's schema order).
+    - width (int): IDs per shard.
+    """
+
+    def __init__(self, directory, index_file, columns, width=SHARD_WIDTH):
+        self.directory = directory
+        self.index_file = index_file
+        self.columns = list(columns)
+        self.width = width
+
+    def exists(self):
+        return os.path.exists(self.index_file)
+
+    def shard_of(self, id):
+        """Return the file name of the shard holding `id`."""
+        return f"{id_key(id) // self.width * self.width:07d}.csv"
+
+    def path(self, shard):
+        return os.path.join(self.directory, shard)
+
+    def read_index(self):
+        """Return the index as a dict of id -> shard file name."""
+        if not self.exists():
+            return {}
+        with open(self.index_file, newline="", encoding="utf-8") as f:
+            return {int(row["id"]): row["shard"] for row in csv.DictReader(f)}
+
+    def _write_index(self, index):
+        with atomic_output(self.index_file) as tmp_file:
+            with open(tmp_file, "w", newline="", encoding="utf-8") as f:
+                writer = csv.writer(f, lineterminator="\n")
+                writer.writerow(INDEX_COLUMNS)
+                writer.writerows(sorted(index.items()))
+
+    def paths(self):
+        """Return the paths of all shards, in id order."""
+        return [self.path(shard) for shard in sorted(set(self.read_index().values()))]
+
+    def split(self, input_file):
+        """
+        Seed the shards from a datasets.csv sorted by id (projected onto
+        `columns`), replacing any existing shards.
+
+        Returns:
+        - int: Number of rows written.
+
+        Raises:
+        - spill.UnsortedInputError: If `input_file` is not sorted by id.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        index = {}
+        rows = spill_files.iter_projected_rows(input_file, self.columns)
+        for shard, shard_rows in itertools.groupby(rows, key=lambda item: self.shard_of(item[0])):
+            with atomic_output(self.path(shard)) as tmp_file:
+                with open(tmp_file, "w", newline="", encoding="utf-8", buffering=IO_BUFFER) as out:
+                    csv.writer(out, lineterminator="\n").writerow(self.columns)
+                    for id, text in shard_rows:
+                        out.write(text)
+                        index[id] = shard
+        self._write_index(index)
+        return len(index)
+
+    def merge(self, batch, drop_ids=(), changes=None):
+        """
+        Merge a batch of rows into the shards they fall in, as
+        spill.merge_sorted() does into datasets.csv, and update the index.
+        Only shards with fetched or dropped IDs are rewritten.
+
+        Parameters:
+        - batch (SpillFile, RowBatch or ShardFiles): Newly fetched rows.
+        - drop_ids (set): IDs to prune.
+        - changes (Changeset): Filled with added, modified and removed IDs, if given.
+
+        Returns:
+        - int: Number of rows in all shards.
+        """
+        index = self.read_index()
+        batch_ids = batch.ids()
+        drop_ids = {id_key(id) for id in drop_ids} & set(index)
+        touched = {}
+        for id in batch_ids | drop_ids:
+            touched.setdefault(self.shard_of(id), set()).add(id)
+
+        os.makedirs(self.directory, exist_ok=True)
+        # The batch comes in id order, so each shard's rows are one run of it.
+        groups = itertools.groupby(batch.iter_sorted(), key=lambda item: self.shard_of(item[0]))
+        group = next(groups, None)
+        for shard in sorted(touched):
+            rows = iter(())
+            if group is not None and group[0] == shard:
+                rows = group[1]
+            ids = touched[shard]
+            path = self.path(shard)
+            count = spill_files.merge_sorted(path, _ShardRows(ids & batch_ids, rows), self.columns, path,
+                                             ids & drop_ids, changes)
+            if group is not None and group[0] == shard:
+                group = next(groups, None)
+            if count == 0:
+                os.remove(path)
+            for id in ids:
+                if id in drop_ids and id not in batch_ids:
+                    index.pop(id, None)
+                else:
+                    index[id] = shard
+        self._write_index(index)
+        logging.info(f"Rewrote {len(touched)} of {len(set(index.values()))} shards in {self.directory}")
+        return len(index)
+
+    def consolidate(self, output_file):
+        """
+        Write all shards as one datasets.csv, sorted by id.
+
+        Returns:
+        - int: Number of rows written.
+        """
+        count = 0
+        with atomic_output(output_file) as tmp_file:
+            with open(tmp_file, "w", newline="", encoding="utf-8", buffering=IO_BUFFER) as out:
+                csv.writer(out, lineterminator="\n").writerow(self.columns)
+                for path in self.paths():
+                    for _, text in spill_files.iter_projected_rows(path, self.columns):
+                        out.write(text)
+                        count += 1
+        return count
+
+    @contextmanager
+    def consolidated(self):
+        """Yield the path of a temporary consolidated datasets.csv, removed afterwards."""
+        path = os.path.join(self.directory, f"datasets.{os.getpid()}.tmp")
+        try:
+            self.consolidate(path)
+            yield path
+        finally:
+            if os.path.exists(path):
+                os.remove(path)
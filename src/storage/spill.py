@@ -0,0 +1,294 @@
+"""
+Spill files and bounded-memory merging for datasets.csv.
+
+A SpillFile receives CSV-encoded rows in completion order and keeps only a
+small (id, offset, length) index in memory; a RowBatch does the same in memory
+for small runs, and ShardFiles reads several sorted files of rows as one
+batch. merge_sorted() then produces the final file by a single linear pass
+over the existing datasets.csv (already sorted by id, read through a large
+buffer) and the new rows in id order. When the file's header already
+matches the schema, untouched rows are copied through as raw text, so a
+routine run costs about as much as copying the file.
+"""
+
+import csv
+import heapq
+import io
+import os
+from storage.changeset import parse_row
+from utils import atomic_output
+
+csv.field_size_limit(2**31 - 1)
+
+IO_BUFFER = 1 << 20
+
+
+def id_key(value):
+    """Sort key for an `id` cell read back from CSV."""
+    return int(float(value))
+
+
+class SpillFile:
+    """
+    Append-only file of encoded CSV rows, indexed by dataset ID.
+
+    Parameters:
+    - path (str): Location of the spill file; it is truncated on open.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "w+b")
+        self._index = {}
+
+    def __len__(self):
+        return len(self._index)
+
+    def append(self, id, text):
+        """Append one encoded row (including its line terminator) for `id`."""
+        data = text.encode("utf-8")
+        offset = self._file.seek(0, os.SEEK_END)
+        self._file.write(data)
+        self._index[id_key(id)] = (offset, len(data))
+
+    def ids(self):
+        """Return the set of IDs written so far."""
+        return set(self._index)
+
+    def iter_sorted(self):
+        """Yield (id, text) pairs in id order."""
+        self._file.flush()
+        for id in sorted(self._index):
+            offset, length = self._index[id]
+            self._file.seek(offset)
+            yield id, self._file.read(length).decode("utf-8")
+
+    def close(self, remove=True):
+        """Close the spill file, deleting it unless `remove` is False."""
+        self._file.close()
+        if remove and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class RowBatch:
+    """
+    In-memory counterpart of SpillFile for small batches of rows.
+    """
+
+    def __init__(self):
+        self._rows = {}
+
+    def __len__(self):
+        return len(self._rows)
+
+    def append(self, id, text):
+        """Add one encoded row (including its line terminator) for `id`."""
+        self._rows[id_key(id)] = text
+
+    def ids(self):
+        """Return the set of IDs added so far."""
+        return set(self._rows)
+
+    def iter_sorted(self):
+        """Yield (id, text) pairs in id order."""
+        for id in sorted(self._rows):
+            yield id, self._rows[id]
+
+    def close(self, remove=True):
+        self._rows.clear()
+
+
+class ShardFiles:
+    """
+    Files of encoded rows, each sorted by id, read together as one batch for
+    merge_sorted() (e.g. the shards of orchestrators/rebuild.py).
+
+    Parameters:
+    - shards (list): (path, ids) pairs; `ids` are the IDs written to the file.
+    - extra (RowBatch or SpillFile): Further rows to merge in, or None.
+    """
+
+    def __init__(self, shards, extra=None):
+        self.shards = list(shards)
+        self.extra = extra if extra is not None else RowBatch()
+
+    def __len__(self):
+        return sum(len(ids) for _, ids in self.shards) + len(self.extra)
+
+    def ids(self):
+        """Return the set of IDs in all shards."""
+        ids = self.extra.ids()
+        for _, shard_ids in self.shards:
+            ids.update(id_key(id) for id in shard_ids)
+        return ids
+
+    def _shard_rows(self, path):
+        with open(path, newline="", encoding="utf-8", buffering=IO_BUFFER) as f:
+            for text in iter_records(f):
+                if text.strip():
+                    yield id_key(text.split(",", 1)[0]), text
+
+    def iter_sorted(self):
+        """Yield (id, text) pairs in id order."""
+        sources = [self._shard_rows(path) for path, _ in self.shards] + [self.extra.iter_sorted()]
+        return heapq.merge(*sources, key=lambda item: item[0])
+
+    def close(self, remove=True):
+        """Close the batch, deleting the shard files unless `remove` is False."""
+        self.extra.close(remove)
+        if remove:
+            for path, _ in self.shards:
+                if os.path.exists(path):
+                    os.remove(path)
+
+
+def iter_records(lines):
+    """
+    Yield the raw text of each CSV record, joining physical lines that end
+    inside a quoted field (an odd number of quote characters so far).
+    """
+    pending = []
+    quotes = 0
+    for line in lines:
+        pending.append(line)
+        quotes += line.count('"')
+        if quotes % 2 == 0:
+            yield "".join(pending)
+            pending = []
+            quotes = 0
+    if pending:
+        yield "".join(pending)
+
+
+class UnsortedInputError(ValueError):
+    """Raised when the existing file is not sorted by id."""
+
+
+def iter_projected_rows(input_file, columns, skip_ids=(), on_skip=None):
+    """
+    Stream rows of a sorted CSV, projected onto `columns`.
+
+    Columns missing from the file are written empty, extra columns dropped,
+    mirroring enforce_schema(). If the header already equals `columns`, rows
+    are passed through unparsed.
+
+    Parameters:
+    - input_file (str): CSV with an `id` column, sorted by id.
+    - columns (list): Output column order.
+    - skip_ids (set): IDs to leave out.
+    - on_skip (callable): Called as on_skip(id, text) for each row left out.
+
+    Yields:
+    - tuple: (id, encoded row text)
+    """
+    with open(input_file, newline="", encoding="utf-8", buffering=IO_BUFFER) as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            return
+        if header == list(columns) and header[0] == "id":
+            records = _raw_records(f, input_file)
+        else:
+            records = _reencoded_records(reader, header, columns, input_file)
+        for id, text in records:
+            if id not in skip_ids:
+                yield id, text
+            elif on_skip is not None:
+                on_skip(id, text)
+
+
+def _check_order(ids, input_file):
+    previous = None
+    for id, text in ids:
+        if previous is not None and id < previous:
+            raise UnsortedInputError(f"{input_file} is not sorted by id")
+        previous = id
+        yield id, text
+
+
+def _raw_records(f, input_file):
+    # Header matches the output: pass each record through byte for byte.
+    def records():
+        for text in iter_records(f):
+            if not text.strip():
+                continue
+            if not text.endswith("\n"):
+                text += "\n"
+            yield id_key(text.split(",", 1)[0].strip()), text
+    return _check_order(records(), input_file)
+
+
+def _reencoded_records(reader, header, columns, input_file):
+    positions = [header.index(col) if col in header else None for col in columns]
+    id_position = header.index("id")
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+
+    def records():
+        for row in reader:
+            writer.writerow([row[pos] if pos is not None else "" for pos in positions])
+            yield id_key(row[id_position]), buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    return _check_order(records(), input_file)
+
+
+def merge_sorted(existing_file, spill, columns, output_file, drop_ids=(), changes=None):
+    """
+    Write `output_file` from the existing sorted file plus the spill rows.
+
+    Spill rows replace existing rows with the same id; `drop_ids` are removed.
+    The output is written to a temporary file and renamed into place.
+
+    Parameters:
+    - existing_file (str): Current datasets.csv, or None.
+    - spill (SpillFile or RowBatch): Newly fetched rows.
+    - columns (list): Output column order (the schema).
+    - output_file (str): Destination path.
+    - drop_ids (set): IDs to prune.
+    - changes (Changeset): Filled with added, modified and removed IDs, if given.
+
+    Returns:
+    - int: Number of rows written.
+    """
+    drop_ids = {id_key(id) for id in drop_ids}
+    skip_ids = spill.ids() | drop_ids
+
+    # Old and new text of a replaced row meet here in whichever order the
+    # merge reaches them; both sides advance in id order, so this stays small.
+    old_rows, new_rows = {}, {}
+
+    def pair(id):
+        if id in old_rows and id in new_rows:
+            changes.replace(id, parse_row(old_rows.pop(id)), parse_row(new_rows.pop(id)))
+
+    def skipped(id, text):
+        if id in drop_ids and id not in new_rows:
+            changes.remove(id)
+        else:
+            old_rows[id] = text
+            pair(id)
+
+    def fetched():
+        for id, text in spill.iter_sorted():
+            if changes is not None:
+                new_rows[id] = text
+                pair(id)
+            yield id, text
+
+    sources = [fetched()]
+    if existing_file is not None and os.path.exists(existing_file):
+        sources.append(iter_projected_rows(existing_file, columns, skip_ids,
+                                           skipped if changes is not None else None))
+
+    count = 0
+    with atomic_output(output_file) as tmp_file:
+        with open(tmp_file, "w", newline="", encoding="utf-8", buffering=IO_BUFFER) as out:
+            csv.writer(out, lineterminator="\n").writerow(columns)
+            for _, text in heapq.merge(*sources, key=lambda item: item[0]):
+                out.write(text)
+                count += 1
+    if changes is not None:
+        for id, text in new_rows.items():
+            changes.replace(id, None, parse_row(text))
+    return count
@@ -0,0 +1,137 @@
+"""
+Append-only time series of volatile listing counters.
+
+The UNHCR listing carries live counters (`total_views`, `total_downloads`)
+that change on almost every run. Instead of rewriting them in metadata.csv,
+they are kept in long format under data/unhcr/stats/, one CSV per year:
+
+    date,id,total_views,total_downloads
+    2026-10-18,1000,4039,0
+
+A row is appended for an ID only when one of its counters differs from the
+last recorded value, so a quiet week adds a few lines and existing lines never
+change. The value of a counter on any date is its last row on or before that
+date (as_of()).
+
+Long-format CSV rather than Parquet: appended lines delta-compress well in git,
+diffs stay readable, and the scheduled workflow needs no extra dependency.
+"""
+
+import csv
+import glob
+import os
+import time
+
+import pandas as pd
+
+from storage.csv_format import DIALECT, format_cell
+from utils import atomic_output
+
+FILE_PATTERN = "[0-9][0-9][0-9][0-9].csv"
+
+
+def today():
+    """Return the current UTC date as YYYY-MM-DD."""
+    return time.strftime("%Y-%m-%d", time.gmtime())
+
+
+class CounterSeries:
+    """
+    Yearly CSV files of (date, id) -> counter values.
+
+    Parameters:
+    - directory (str): Directory holding the <year>.csv files.
+    - columns (list): Counter columns, in file order.
+    """
+
+    def __init__(self, directory, columns):
+        self.directory = directory
+        self.columns = list(columns)
+
+    def files(self):
+        """Return the yearly files in date order."""
+        return sorted(glob.glob(os.path.join(self.directory, FILE_PATTERN)))
+
+    def read(self, start=None, end=None, ids=None):
+        """
+        Return recorded rows, optionally filtered.
+
+        Parameters:
+        - start (str): First date to include (YYYY-MM-DD), or None.
+        - end (str): Last date to include, or None.
+        - ids (iterable): Dataset IDs to include, or None for all.
+
+        Returns:
+        - pd.DataFrame: `date`, `id` and the counter columns, sorted by date then id.
+        """
+        frames = []
+        for path in self.files():
+            year = os.path.basename(path)[:4]
+            if (start and year < start[:4]) or (end and year > end[:4]):
+                continue
+            frames.append(pd.read_csv(path, dtype={"date": str, "id": "int64"}))
+        columns = ["date", "id"] + self.columns
+        if not frames:
+            return pd.DataFrame(columns=columns)
+        df = pd.concat(frames, ignore_index=True).reindex(columns=columns)
+        if start:
+            df = df[df["date"] >= start]
+        if end:
+            df = df[df["date"] <= end]
+        if ids is not None:
+            df = df[df["id"].isin(set(ids))]
+        return df.sort_values(["date", "id"], kind="stable").reset_index(drop=True)
+
+    def as_of(self, date=None):
+        """
+        Return each ID's counters as they stood on `date` (default: latest).
+
+        Returns:
+        - pd.DataFrame: Indexed by id, one column per counter.
+        """
+        df = self.read(end=date)
+        return df.drop_duplicates("id", keep="last").set_index("id")[self.columns].sort_index()
+
+    def history(self, id):
+        """Return the recorded changes of one dataset, oldest first."""
+        return self.read(ids=[id]).set_index("date")[self.columns]
+
+    def append(self, df, date=None):
+        """
+        Record the counters of a listing, keeping only values that changed.
+
+        Parameters:
+        - df (pd.DataFrame): Listing with an `id` column and the counter columns.
+        - date (str): Date of the observation; defaults to today (UTC).
+
+        Returns:
+        - int: Number of rows appended.
+        """
+        date = date or today()
+        previous = {}
+        for id, row in self.as_of().iterrows():
+            previous[int(id)] = [format_cell(value) for value in row]
+
+        rows = []
+        for row in df[["id"] + self.columns].sort_values("id").itertuples(index=False, name=None):
+            id, values = int(row[0]), [format_cell(value) for value in row[1:]]
+            if previous.get(id) != values:
+                rows.append([date, id] + values)
+        if not rows:
+            return 0
+
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"{date[:4]}.csv")
+        existing = ""
+        if os.path.exists(path):
+            with open(path, newline="", encoding="utf-8") as f:
+                existing = f.read()
+        with atomic_output(path) as tmp_file:
+            with open(tmp_file, "w", newline="", encoding="utf-8") as f:
+                writer = csv.writer(f, **DIALECT)
+                if existing:
+                    f.write(existing)
+                else:
+                    writer.writerow(["date", "id"] + self.columns)
+                writer.writerows(rows)
+        return len(rows)
@@ -0,0 +1,411 @@
+"""
+Run telemetry: stage timings, request latency histograms, bytes and memory.
+
+Sources, orchestrators and schemas report into one process-wide collector:
+
+- record_stage() / stage(): time spent and records handled per (source, stage),
+  with the process's peak RSS when the stage last ended;
+- record_request(): one HTTP request, by host and status, into a latency
+  histogram with the bytes downloaded.
+
+write_report() saves everything under .cache/telemetry/ as run.json and as
+run.prom in the Prometheus text exposition format (for a node_exporter
+textfile collector or a pushgateway).
+
+Profiling is opt-in: stages named in PROFILE_STAGES (or passed to
+enable_profiling()) run under cProfile wherever the code asks for profiler(),
+currently the flatten stage of fetch_datasets.fetch_rows(). Each thread
+profiles on its own; write_report() merges them into one .prof file per
+source and stage, plus the top functions as text.
+"""
+
+import bisect
+import cProfile
+import functools
+import io
+import json
+import math
+import os
+import pstats
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+from utils import CACHE_PATH, atomic_output
+
+try:
+    import resource
+except ImportError:  # Not available on Windows.
+    resource = None
+
+TELEMETRY_PATH = os.path.join(CACHE_PATH, "telemetry")
+
+# Upper bounds (seconds) of the request latency histogram buckets.
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, math.inf)
+
+# Stages to run under cProfile, e.g. ("flatten",).
+PROFILE_STAGES = ()
+PROFILE_TOP = 40
+
+METRIC_PREFIX = "mdl_collector"
+
+_lock = threading.Lock()
+_profile_stages = set(PROFILE_STAGES)
+# Held while any profile is enabled; see StageProfiler.
+_profiling = threading.Lock()
+
+
+def peak_rss_bytes():
+    """Return the process's peak resident set size in bytes, or None where unsupported."""
+    if resource is None:
+        return None
+    # ru_maxrss is in KiB on Linux and in bytes on macOS.
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class _StageStats:
+    __slots__ = ("calls", "seconds", "records", "errors", "peak_rss")
+
+    def __init__(self):
+        self.calls = 0
+        self.seconds = 0.0
+        self.records = 0
+        self.errors = 0
+        self.peak_rss = None
+
+
+class _RequestStats:
+    __slots__ = ("buckets", "count", "seconds", "bytes", "max")
+
+    def __init__(self):
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+        self.count = 0
+        self.seconds = 0.0
+        self.bytes = 0
+        self.max = 0.0
+
+
+_started = time.time()
+_stages = {}
+_requests = {}
+_profilers = {}
+
+
+def reset():
+    """Forget everything recorded so far and restart the run clock."""
+    global _started
+    with _lock:
+        _started = time.time()
+        _stages.clear()
+        _requests.clear()
+        _profilers.clear()
+
+
+def record_stage(source, stage, seconds, records=0, error=None):
+    """
+    Add time spent in a stage.
+
+    Parameters:
+    - source (str): Source name, or None for work not tied to one source.
+    - stage (str): Stage name, e.g. 'list', 'fetch', 'flatten', 'write'.
+    - seconds (float): Time spent.
+    - records (int): Records handled in that time.
+    - error (Exception): Set if the stage failed.
+    """
+    _add_stage(source, stage, seconds, records, error, peak_rss_bytes())
+
+
+def _add_stage(source, stage, seconds, records, error, peak=None):
+    with _lock:
+        stats = _stages.get((source, stage))
+        if stats is None:
+            stats = _stages[(source, stage)] = _StageStats()
+        stats.calls += 1
+        stats.seconds += seconds
+        stats.records += records
+        stats.errors += error is not None
+        if peak is not None:
+            stats.peak_rss = peak
+
+
+class StageTimer:
+    """Handle yielded by stage(); add to `records` as records are handled."""
+
+    def __init__(self):
+        self.records = 0
+
+
+@contextmanager
+def stage(source, name):
+    """
+    Time a block as one call of a stage. Exceptions are recorded and re-raised.
+
+    Yields:
+    - StageTimer: Set or add to its `records`.
+    """
+    timer = StageTimer()
+    start = time.perf_counter()
+    error = None
+    try:
+        yield timer
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        record_stage(source, name, time.perf_counter() - start, timer.records, error)
+
+
+def timed(name, source=None, records=None):
+    """
+    Decorator recording every call of a function as one call of a stage.
+
+    Unlike stage(), it does not sample peak memory, which keeps its cost to
+    about a microsecond per call, so it suits per-record functions.
+
+    Parameters:
+    - name (str): Stage name.
+    - source (str): Source name, or None.
+    - records (int): Records per call; by default the len() of the first
+      argument (e.g. a DataFrame).
+    """
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            error = None
+            try:
+                return function(*args, **kwargs)
+            except BaseException as e:
+                error = e
+                raise
+            finally:
+                if records is not None:
+                    count = records
+                else:
+                    count = len(args[0]) if args and hasattr(args[0], "__len__") else 0
+                _add_stage(source, name, time.perf_counter() - start, count, error)
+        return wrapper
+    return decorator
+
+
+def record_request(host, status, seconds, size=0):
+    """
+    Add one HTTP request to the latency histogram.
+
+    Parameters:
+    - host (str): Host as returned by http_client.host_of().
+    - status: HTTP status, or a short error class such as 'timeout' or 'error'.
+    - seconds (float): Time until the body was read (or the request failed).
+    - size (int): Response body bytes downloaded.
+    """
+    index = bisect.bisect_left(LATENCY_BUCKETS, seconds)
+    with _lock:
+        stats = _requests.get((host, str(status)))
+        if stats is None:
+            stats = _requests[(host, str(status))] = _RequestStats()
+        stats.buckets[index] += 1
+        stats.count += 1
+        stats.seconds += seconds
+        stats.bytes += size
+        stats.max = max(stats.max, seconds)
+
+
+def enable_profiling(*stages):
+    """Run the named stages under cProfile for the rest of the process."""
+    _profile_stages.update(stages)
+
+
+class StageProfiler:
+    """
+    cProfile collection of one stage of one source, safe to use from several
+    threads (parallel sources, the prefetcher).
+
+    Each thread profiles into its own cProfile.Profile, and stats() merges
+    them. Only one profile in the process is enabled at a time: on Python
+    3.12+ cProfile is built on sys.monitoring, which takes a second enabled
+    profiler as an error, so enable() waits for any other thread's profiled
+    call to finish. (There, an enabled profile also sees other threads, so
+    keep the profiled calls short, as the flatten stage's are.)
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self._profiles = []
+
+    def enable(self):
+        profile = getattr(self._local, "profile", None)
+        if profile is None:
+            profile = self._local.profile = cProfile.Profile()
+            with _lock:
+                self._profiles.append(profile)
+        _profiling.acquire()
+        profile.enable()
+
+    def disable(self):
+        self._local.profile.disable()
+        _profiling.release()
+
+    def stats(self, stream=None):
+        """Return the merged pstats.Stats of every thread, or None if nothing was profiled."""
+        with _lock:
+            profiles = list(self._profiles)
+        if not profiles:
+            return None
+        stats = pstats.Stats(profiles[0], stream=stream)
+        for profile in profiles[1:]:
+            stats.add(profile)
+        return stats
+
+
+def profiler(source, stage):
+    """
+    Return the StageProfiler collecting a stage of a source, or None if the
+    stage is not being profiled. Wrap the work in enable()/disable().
+    """
+    if stage not in _profile_stages:
+        return None
+    with _lock:
+        profile = _profilers.get((source, stage))
+        if profile is None:
+            profile = _profilers[(source, stage)] = StageProfiler()
+    return profile
+
+
+def _quantile(stats, q):
+    # Upper bound of the bucket holding the q-th request; the maximum for the open bucket.
+    rank = q * stats.count
+    seen = 0
+    for bound, count in zip(LATENCY_BUCKETS, stats.buckets):
+        seen += count
+        if seen >= rank:
+            return bound if bound != math.inf else stats.max
+    return stats.max
+
+
+def snapshot():
+    """
+    Return everything recorded so far as a JSON-serialisable dict.
+
+    Returns:
+    - dict: started/duration, peak_rss_bytes, stages and requests.
+    """
+    with _lock:
+        stages = [
+            {"source": source, "stage": name, "calls": s.calls, "seconds": round(s.seconds, 6),
+             "records": s.records, "records_per_second": round(s.records / s.seconds, 3) if s.seconds else None,
+             "errors": s.errors, "peak_rss_bytes": s.peak_rss}
+            for (source, name), s in sorted(_stages.items(), key=lambda item: (item[0][0] or "", item[0][1]))
+        ]
+        requests = [
+            {"host": host, "status": status, "count": r.count, "seconds": round(r.seconds, 6),
+             "bytes": r.bytes, "max_seconds": round(r.max, 6),
+             "p50_seconds": _quantile(r, 0.5), "p99_seconds": _quantile(r, 0.99),
+             "buckets": {("+Inf" if bound == math.inf else str(bound)): count
+                         for bound, count in zip(LATENCY_BUCKETS, r.buckets)}}
+            for (host, status), r in sorted(_requests.items())
+        ]
+        started = _started
+    return {
+        "started": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(started)),
+        "duration_seconds": round(time.time() - started, 3),
+        "peak_rss_bytes": peak_rss_bytes(),
+        "stages": stages,
+        "requests": requests,
+    }
+
+
+def _labels(**labels):
+    pairs = []
+    for key, value in labels.items():
+        if value is None:
+            continue
+        value = str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+        pairs.append(f'{key}="{value}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def to_prometheus(report):
+    """
+    Render a snapshot() in the Prometheus text exposition format.
+
+    Parameters:
+    - report (dict): Result of snapshot().
+
+    Returns:
+    - str
+    """
+    p = METRIC_PREFIX
+    lines = []
+
+    def metric(name, kind, help_text, samples):
+        lines.append(f"# HELP {p}_{name} {help_text}")
+        lines.append(f"# TYPE {p}_{name} {kind}")
+        for suffix, labels, value in samples:
+            lines.append(f"{p}_{name}{suffix}{labels} {value}")
+
+    metric("run_duration_seconds", "gauge", "Wall time of the run.",
+           [("", "", report["duration_seconds"])])
+    if report["peak_rss_bytes"] is not None:
+        metric("peak_rss_bytes", "gauge", "Peak resident memory of the run.",
+               [("", "", report["peak_rss_bytes"])])
+
+    stages = report["stages"]
+    metric("stage_seconds_total", "counter", "Time spent per stage.",
+           [("", _labels(source=s["source"], stage=s["stage"]), s["seconds"]) for s in stages])
+    metric("stage_calls_total", "counter", "Times each stage ran.",
+           [("", _labels(source=s["source"], stage=s["stage"]), s["calls"]) for s in stages])
+    metric("stage_records_total", "counter", "Records handled per stage.",
+           [("", _labels(source=s["source"], stage=s["stage"]), s["records"]) for s in stages])
+    metric("stage_errors_total", "counter", "Failed runs of each stage.",
+           [("", _labels(source=s["source"], stage=s["stage"]), s["errors"]) for s in stages])
+
+    samples = []
+    for r in report["requests"]:
+        cumulative = 0
+        for bound, count in r["buckets"].items():
+            cumulative += count
+            samples.append(("_bucket", _labels(host=r["host"], status=r["status"], le=bound), cumulative))
+        samples.append(("_sum", _labels(host=r["host"], status=r["status"]), r["seconds"]))
+        samples.append(("_count", _labels(host=r["host"], status=r["status"]), r["count"]))
+    metric("http_request_duration_seconds", "histogram", "HTTP request latency by host and status.", samples)
+    metric("http_response_bytes_total", "counter", "Response body bytes downloaded by host and status.",
+           [("", _labels(host=r["host"], status=r["status"]), r["bytes"]) for r in report["requests"]])
+    return "\n".join(lines) + "\n"
+
+
+def _write_text(path, text):
+    with atomic_output(path) as tmp_file:
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            f.write(text)
+
+
+def write_report(directory=TELEMETRY_PATH):
+    """
+    Write run.json and run.prom, and dump any collected profiles.
+
+    Parameters:
+    - directory (str): Output directory.
+
+    Returns:
+    - dict: The report written to run.json.
+    """
+    os.makedirs(directory, exist_ok=True)
+    report = snapshot()
+    _write_text(os.path.join(directory, "run.json"), json.dumps(report, indent=1) + "\n")
+    _write_text(os.path.join(directory, "run.prom"), to_prometheus(report))
+
+    with _lock:
+        profiles = list(_profilers.items())
+    for (source, stage), profile in profiles:
+        text = io.StringIO()
+        stats = profile.stats(text)
+        if stats is None:
+            continue
+        base = os.path.join(directory, f"profile-{stage}-{source or 'all'}")
+        stats.dump_stats(base + ".prof")
+        stats.sort_stats("cumulative").print_stats(PROFILE_TOP)
+        _write_text(base + ".txt", text.getvalue())
+    print(f"Telemetry written to {directory}")
+    return report
@@ -1,15 +1,54 @@
-import pandas as pd
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, List
 import ast
-from typing import List
+import json
 import os
 
+# pandas is imported where it is used, so that scripts which only plan
+# (e.g. cli.py --plan) start without it.
+if TYPE_CHECKING:
+    import pandas as pd
+
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 PROJECT_ROOT = os.path.dirname(SCRIPT_DIR)
-UNHCR_DATA_PATH = os.path.join(PROJECT_ROOT, "data", "unhcr") + "/"
-WB_DATA_PATH = os.path.join(PROJECT_ROOT, "data", "world_bank") + "/"
+DATA_PATH = os.path.join(PROJECT_ROOT, "data")
+UNHCR_DATA_PATH = os.path.join(DATA_PATH, "unhcr") + "/"
+WB_DATA_PATH = os.path.join(DATA_PATH, "world_bank") + "/"
+# Local working state (HTTP cache etc.); not committed, restored by the workflow cache.
+CACHE_PATH = os.path.join(PROJECT_ROOT, ".cache") + "/"
+
+
+@contextmanager
+def atomic_output(path):
+    """
+    Write a file atomically: yields a temporary path next to `path`, then
+    fsyncs it and renames it over `path` if the block succeeds. A crash midway
+    leaves the previous file untouched.
+
+    Parameters:
+    path (str): Final file path.
+    """
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        yield tmp_path
+        with open(tmp_path, "rb") as f:
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
 
+def _decode_literal(text):
+    # Canonical JSON, or the Python repr of older files (storage/nested.py);
+    # anything else raises as ast.literal_eval() does.
+    try:
+        return json.loads(text)
+    except (TypeError, ValueError):
+        return ast.literal_eval(text)
 
-def find_list_columns(df: pd.DataFrame) -> List[str]:
+
+def find_list_columns(df: "pd.DataFrame") -> List[str]:
     """
     Identifies which columns in a DataFrame contain strings that represent lists.
 
@@ -24,20 +63,22 @@ def find_list_columns(df: pd.DataFrame) -> List[str]:
     for column in df.columns:
             for item in df[column]:
                 try:
-                    if isinstance(item, str) and isinstance(ast.literal_eval(item), list) and item.startswith("[{"):
+                    if isinstance(item, str) and isinstance(_decode_literal(item), list) and item.startswith("[{"):
                         list_columns.append(column)
                         break  # Break after finding the first list in the column
                 except:
-                    # If literal_eval fails, the string is not a list
+                    # If decoding fails, the string is not a list
                     continue
 
     return list_columns
 
 def merge_dicts(input,sep=';'):
+    import pandas as pd
+
     if (isinstance(input,float) and pd.isna(input)) | (str(input) == ",[]"):
       return ""
 
-    input = ast.literal_eval(input)
+    input = _decode_literal(input)
 
     if isinstance(input,dict):
       return input
@@ -0,0 +1,80 @@
+"""
+Shared fixtures. The collector's state (manifests, journals) goes to a
+temporary directory instead of .cache/, and the stand-in NADA server from
+benchmarks/nada_server.py plays the catalog where a test needs one.
+"""
+
+import os
+
+import pytest
+
+from storage import journal, manifest
+
+
+def fresh_checkout(*paths):
+    """
+    Rewrite files with their own content, as a fresh git checkout does: new
+    inode and mtime, same bytes. Also forgets the signatures computed so far,
+    as a new process would.
+    """
+    for path in paths:
+        with open(path, "rb") as f:
+            content = f.read()
+        os.remove(path)
+        with open(path, "wb") as f:
+            f.write(content)
+        os.utime(path, ns=(1, 1))
+    manifest._signatures.clear()
+
+
+@pytest.fixture
+def state_root(tmp_path, monkeypatch):
+    """Keep manifests and journals under a temporary directory."""
+    root = tmp_path / "state"
+    monkeypatch.setattr(manifest, "manifest_path", lambda source_name: str(root / "manifest" / f"{source_name}.sqlite"))
+    monkeypatch.setattr(journal, "journal_path", lambda source_name: str(root / "journal" / f"{source_name}.jsonl"))
+    manifest._signatures.clear()
+    return root
+
+
+def set_catalog(server, ids):
+    """Make the stand-in server list exactly `ids`."""
+    server.ids = list(ids)
+    server.id_set = frozenset(server.ids)
+    server.catalog_size = len(server.ids)
+
+
+def run_source(source, **options):
+    """Run one source's listing and fetch stages, as scheduler.run_pipeline() does."""
+    from orchestrators import fetch_datasets, list_metadata
+    list_metadata.list_source(source)
+    fetch_datasets.run_source(source, **options)
+
+
+def stand_in_source(server, root, name="test"):
+    """An unregistered source for the stand-in server, with its files and response cache under `root`."""
+    from bench_pipeline import bench_source
+    from sources import registry
+    from sources.response_cache import ResponseCache
+
+    source = bench_source(registry.get("unhcr"), name, server.base_url, str(root / "data" / name) + "/", 15)
+    source.max_concurrency = 4
+    source.cache = ResponseCache(name, root=str(root))
+    return source
+
+
+@pytest.fixture
+def catalog(tmp_path, state_root):
+    """
+    A stand-in catalog of 40 IDs and an unregistered source for it, with its
+    files under a temporary directory. Yields (server, source).
+    """
+    from nada_server import start_server
+
+    server = start_server(catalog_size=40)
+    source = stand_in_source(server, tmp_path)
+    try:
+        yield server, source
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,59 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+import requests
+
+from nada_server import start_server, synthetic_export
+
+BENCHMARKS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks")
+
+
+def bench(script, *args):
+    completed = subprocess.run([sys.executable, os.path.join(BENCHMARKS, script), *args],
+                               capture_output=True, text=True, timeout=300)
+    assert completed.returncode == 0, completed.stderr
+    return completed.stdout
+
+
+def test_stand_in_server_pages_and_revalidates():
+    server = start_server(catalog_size=25)
+    try:
+        search = f"{server.base_url}/index.php/api/catalog/search"
+        page = requests.get(search, params={"ps": 10, "page": 3}).json()["result"]
+        assert (page["found"], [row["id"] for row in page["rows"]]) == (25, list(range(21, 26)))
+        export = f"{server.base_url}/index.php/metadata/export/7/json"
+        first = requests.get(export)
+        assert isinstance(first.json(), dict) and first.headers["ETag"]
+        assert requests.get(export, headers={"If-None-Match": first.headers["ETag"]}).status_code == 304
+        assert requests.get(f"{server.base_url}/index.php/metadata/export/26/json").status_code == 404
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_synthetic_exports_are_deterministic():
+    from schemas.column_mappings import UNHCR_SCHEMA
+    assert synthetic_export(5, UNHCR_SCHEMA) == synthetic_export(5, UNHCR_SCHEMA)
+    assert synthetic_export(5, UNHCR_SCHEMA) != synthetic_export(6, UNHCR_SCHEMA)
+
+
+def test_bench_pipeline(tmp_path):
+    saved = str(tmp_path / "results.json")
+    output = bench("bench_pipeline.py", "--sizes", "60", "--latency", "0", "--page-size", "25", "--save", saved)
+    assert "60 IDs -> 60 rows" in output
+    with open(saved, encoding="utf-8") as f:
+        result = json.load(f)["results"][0]
+    assert result["stages"]["fetch"]["calls"] == 60
+    assert result["stages"]["list"]["items"] == 60
+
+
+@pytest.mark.parametrize("script, args, expected", [
+    ("bench_fetch.py", ["--ids", "40", "--latency", "0", "--modes", "threads", "async"], "async"),
+    ("bench_flatten.py", ["--records", "20", "--exports", "missing"], "speed-up"),
+    ("bench_decode.py", ["--records", "20", "--exports", "missing"], "speed-up"),
+])
+def test_micro_benchmarks(script, args, expected):
+    assert expected in bench(script, *args)
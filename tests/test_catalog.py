@@ -0,0 +1,70 @@
+import sqlite3
+
+import pandas as pd
+import pytest
+
+from nada_server import synthetic_export
+from schemas.column_mappings import UNHCR_SCHEMA
+from schemas.extractor import SchemaExtractor
+from storage import csv_format
+from storage.catalog import Catalog, CatalogUpdater
+from storage.changeset import Changeset
+
+EXTRACTOR = SchemaExtractor(UNHCR_SCHEMA)
+
+
+def write_datasets(path, ids):
+    rows = [EXTRACTOR.values(synthetic_export(id, UNHCR_SCHEMA)) for id in ids]
+    csv_format.write_frame(pd.DataFrame.from_records(rows, columns=EXTRACTOR.columns), str(path))
+
+
+def stored_ids(path, source_name):
+    catalog = Catalog(str(path))
+    try:
+        rows = catalog.connection.execute(f'SELECT id FROM "src_{source_name}" ORDER BY id').fetchall()
+        indexed = catalog.connection.execute("SELECT COUNT(*) FROM search").fetchone()[0]
+        return [id for id, in rows], indexed
+    finally:
+        catalog.close()
+
+
+@pytest.mark.parametrize("source_name", ["search", "documents", "nations", "unhcr"])
+def test_source_names_never_collide_with_shared_tables(tmp_path, source_name):
+    datasets = tmp_path / "datasets.csv"
+    write_datasets(datasets, range(1, 6))
+    path = tmp_path / "catalog.sqlite"
+    updater = CatalogUpdater(str(path), source_name, EXTRACTOR.columns)
+
+    assert updater.write(str(datasets), Changeset(EXTRACTOR.columns)) == 5
+    assert updater.is_built()
+    assert stored_ids(path, source_name) == ([1, 2, 3, 4, 5], 5)
+
+    changes = Changeset(EXTRACTOR.columns)
+    updater.add(6, EXTRACTOR.values(synthetic_export(6, UNHCR_SCHEMA)))
+    changes.replace(6, None, [])
+    changes.remove(2)
+    assert updater.write(str(datasets), changes) == 1
+    assert stored_ids(path, source_name) == ([1, 3, 4, 5, 6], 5)
+
+    catalog = Catalog(str(path))
+    title = catalog.connection.execute(f'SELECT title FROM "src_{source_name}" WHERE id = 6').fetchone()[0]
+    assert [(source, id) for source, id, _ in catalog.search(f'"{title}"')] == [(source_name, 6)]
+    catalog.close()
+
+
+def test_legacy_table_is_dropped_on_reload(tmp_path):
+    datasets = tmp_path / "datasets.csv"
+    write_datasets(datasets, range(1, 4))
+    path = tmp_path / "catalog.sqlite"
+    connection = sqlite3.connect(path)
+    connection.execute("CREATE TABLE unhcr (id INTEGER PRIMARY KEY, title TEXT)")
+    connection.commit()
+    connection.close()
+
+    updater = CatalogUpdater(str(path), "unhcr", EXTRACTOR.columns)
+    assert not updater.is_built()
+    assert updater.write(str(datasets), Changeset(EXTRACTOR.columns)) == 3
+    connection = sqlite3.connect(path)
+    tables = {name for name, in connection.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    connection.close()
+    assert "unhcr" not in tables and "src_unhcr" in tables
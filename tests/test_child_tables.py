@@ -0,0 +1,32 @@
+import filecmp
+import os
+
+from conftest import run_source, set_catalog
+from schemas.extractor import get_extractor
+from storage.child_tables import CHILD_TABLES, ChildTables, child_rows, tables_path
+
+
+def test_child_rows_flatten_one_cell():
+    cell = '[{"keyword":"Refugees","vocab":"UNHCR","extra":1},"Asylum",{"keyword":""}]'
+    assert child_rows(1000, cell, CHILD_TABLES["keywords"][1]) == [
+        ["1000", "0", "Refugees", "UNHCR", ""],
+        ["1000", "1", "Asylum", "", ""],
+    ]
+    assert child_rows(1000, "", CHILD_TABLES["keywords"][1]) == []
+
+
+def test_incremental_tables_match_a_rebuild(catalog, tmp_path):
+    server, source = catalog
+    run_source(source)
+    set_catalog(server, [id for id in range(1, 61) if id % 4])
+    run_source(source)
+
+    directory = tables_path(source.datasets_file)
+    tables = sorted(os.listdir(directory))
+    assert "nation.csv" in tables and "keywords.csv" in tables
+    with open(os.path.join(directory, "keywords.csv"), encoding="utf-8") as f:
+        assert {line.split(",", 1)[0] for line in f.readlines()[1:]} >= {"41", "59"}
+    rebuilt = ChildTables(str(tmp_path / "rebuilt"), get_extractor(source.name, source.schema).columns)
+    rebuilt.rebuild(source.datasets_file)
+    for table in tables:
+        assert filecmp.cmp(os.path.join(directory, table), os.path.join(rebuilt.directory, table), shallow=False)
@@ -0,0 +1,46 @@
+import argparse
+import os
+import subprocess
+import sys
+
+import pytest
+
+import cli
+from conftest import run_source, set_catalog
+from orchestrators import list_metadata
+
+SRC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+
+
+def test_parse_ids():
+    assert cli.parse_ids("1000, 1200-1203,,7") == [1000, 1200, 1201, 1202, 1203, 7]
+    for text in ("12-10", "a", "1-x"):
+        with pytest.raises(argparse.ArgumentTypeError):
+            cli.parse_ids(text)
+
+
+def test_help_does_not_load_pandas():
+    script = f"import sys; sys.argv = ['cli.py', '--help']; import cli\n" \
+             f"try:\n    cli.main()\nexcept SystemExit:\n    pass\nprint('pandas' in sys.modules)"
+    completed = subprocess.run([sys.executable, "-c", script], cwd=SRC, capture_output=True, text=True)
+    assert completed.stdout.strip().endswith("False")
+
+
+def test_plan_matches_the_run(catalog, capsys):
+    server, source = catalog
+    run_source(source)
+    set_catalog(server, [id for id in range(1, 46) if id != 4])
+    list_metadata.list_source(source)
+    capsys.readouterr()
+
+    assert cli.plan_source(source, ["fetch"]) == 5
+    plan = capsys.readouterr().out
+    assert "fetch: 5 new, 0 modified, 1 removed" in plan
+    assert "ids: 41 42 43 44 45" in plan
+
+    assert cli.plan_source(source, ["fetch"], ids=[3, 4, 41, 99]) == 2
+    assert "fetch: 1 new, 1 modified, 0 removed" in capsys.readouterr().out
+
+    run_source(source, ids=[3, 41])
+    assert "Fetching 1 new and 1 modified datasets" in capsys.readouterr().out
+    assert cli.plan_source(source, ["fetch"]) == 4
@@ -0,0 +1,44 @@
+import os
+
+import pandas as pd
+
+from conftest import run_source, set_catalog, stand_in_source
+from orchestrators import fetch_datasets
+from storage import csv_format, nested
+from storage.columnar import ColumnarStore
+
+
+def read_bytes(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def test_parquet_store_matches_csv_and_drops_legacy_cells(catalog, tmp_path, monkeypatch):
+    server, source = catalog
+    plain = stand_in_source(server, tmp_path, "plain")
+    monkeypatch.setattr(fetch_datasets, "CACHE_PATH", str(tmp_path / "cache"))
+    store_dir = os.path.join(str(tmp_path / "cache"), "store", source.name)
+
+    run_source(source, store_format="parquet")
+    run_source(plain)
+    assert read_bytes(source.datasets_file) == read_bytes(plain.datasets_file)
+
+    # A store written before the JSON cell format, holding Python repr cells.
+    legacy = pd.read_csv(source.datasets_file, dtype=str, keep_default_na=False)
+    for column in nested.json_columns(source.schema):
+        legacy[column] = [repr(value) if isinstance(value, (list, dict)) else cell
+                          for cell, value in zip(legacy[column], map(nested.decode_cell, legacy[column]))]
+    legacy_file = str(tmp_path / "legacy.csv")
+    csv_format.write_frame(legacy, legacy_file)
+    store = ColumnarStore(store_dir, legacy.columns)
+    store.clear()
+    store.import_csv(legacy_file)
+    assert store.cell_format() is None
+
+    set_catalog(server, range(1, 46))
+    run_source(source, store_format="parquet")
+    run_source(plain)
+    assert store.cell_format() == nested.JSON_TYPE
+    assert read_bytes(source.datasets_file) == read_bytes(plain.datasets_file)
+    stored = store.read(ids=[1, 2, 44])
+    assert stored["id"].tolist() == [1, 2, 44]
@@ -0,0 +1,48 @@
+import json
+
+import numpy as np
+import pandas as pd
+
+import nada_server
+from conftest import run_source, set_catalog
+from storage import csv_format
+from storage.changeset import changeset_path
+
+
+def test_cells_encode_independently_of_dtype():
+    assert [csv_format.format_cell(value) for value in
+            (None, pd.NA, float("nan"), 3.0, np.float64(2.5), np.int64(7), True, "x", {"b": 1, "a": "é"})] == \
+        ["", "", "", "3", "2.5", "7", "True", "x", '{"a":"é","b":1}']
+    # An integer column that picked up a missing value writes as it did before.
+    assert csv_format.encode_row(pd.Series([1, None, 3]).tolist()) == "1,,3\n"
+    assert csv_format.encode_row([1, 'say "hi"', "a,b"]) == '1,"say ""hi""","a,b"\n'
+
+
+def test_stable_columns_keep_the_previous_order():
+    assert csv_format.stable_columns(["c", "a", "d", "b"], ["a", "b", "c"]) == ["a", "b", "c", "d"]
+    assert csv_format.stable_columns(["c", "a"], None) == ["c", "a"]
+
+
+def test_a_changed_export_rewrites_only_its_line(catalog, monkeypatch, capsys):
+    server, source = catalog
+    run_source(source)
+    with open(source.datasets_file, encoding="utf-8") as f:
+        before = f.readlines()
+    with open(changeset_path(source.datasets_file), encoding="utf-8") as f:
+        assert len(json.load(f)["added"]) == 40
+
+    export_body, listing_row = nada_server._export_body, nada_server.synthetic_listing_row
+    monkeypatch.setattr(nada_server, "_export_body", lambda id, unhcr_shaped: export_body(id, unhcr_shaped).replace(
+        b'"access_place": "', b'"access_place": "Revised. ') if id == 9 else export_body(id, unhcr_shaped))
+    monkeypatch.setattr(nada_server, "synthetic_listing_row", lambda id: dict(
+        listing_row(id), changed="2026-01-01T00:00:00+00:00") if id in (9, 10) else listing_row(id))
+    set_catalog(server, range(1, 41))
+    capsys.readouterr()
+    run_source(source)
+    assert "Changeset: 0 added, 1 modified, 0 removed" in capsys.readouterr().out
+    with open(source.datasets_file, encoding="utf-8") as f:
+        after = f.readlines()
+    assert [i for i, (old, new) in enumerate(zip(before, after)) if old != new] == [9]
+    assert len(after) == len(before)
+    with open(changeset_path(source.datasets_file), encoding="utf-8") as f:
+        assert json.load(f) == {"added": [], "modified": {"9": ["data_access.dataset_availability.access_place"]}, "removed": []}
@@ -0,0 +1,34 @@
+import logging
+
+import pandas as pd
+import pytest
+
+from bench_flatten import three_step
+from nada_server import synthetic_export
+from schemas.column_mappings import UNHCR_SCHEMA, WORLD_BANK_SCHEMA
+from schemas.extractor import SchemaExtractor, get_extractor, raw_paths
+
+
+@pytest.mark.parametrize("schema", [UNHCR_SCHEMA, WORLD_BANK_SCHEMA], ids=["unhcr", "world_bank"])
+def test_extractor_matches_json_normalize(schema, caplog):
+    records = [synthetic_export(id, schema) for id in range(1, 201)]
+    with caplog.at_level(logging.ERROR):
+        expected = three_step(records, schema)
+    # Where several raw paths map to one column, the old path kept them all as
+    # duplicate columns; the extractor keeps the first in document order.
+    expected = expected.T.groupby(level=0, sort=False).first().T.reindex(columns=list(schema))
+    actual = SchemaExtractor(schema).to_frame(records)
+    assert list(actual.columns) == list(schema)
+    pd.testing.assert_frame_equal(actual.astype(object).where(actual.notna(), None),
+                                  expected.astype(object).where(expected.notna(), None))
+
+
+def test_dict_at_a_leaf_column_stays_empty():
+    extractor = SchemaExtractor({"id": "int", "title": "str", "nation": "json"})
+    assert extractor.values({"id": 1, "title": {"en": "x"}, "nation": [{"name": "Kenya"}], "other": 2}) == \
+        [1, None, [{"name": "Kenya"}]]
+
+
+def test_extractors_are_shared_per_schema():
+    assert get_extractor("unhcr", UNHCR_SCHEMA) is get_extractor("anything", dict(UNHCR_SCHEMA))
+    assert get_extractor("unhcr", UNHCR_SCHEMA) is not get_extractor("world_bank", WORLD_BANK_SCHEMA)
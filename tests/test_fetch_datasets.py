@@ -0,0 +1,83 @@
+import glob
+import os
+
+from conftest import fresh_checkout, run_source, set_catalog, stand_in_source
+
+
+def data_files(source):
+    return {path: os.stat(path).st_mtime_ns
+            for path in glob.glob(source.data_path + "**", recursive=True) if os.path.isfile(path)}
+
+
+def test_unchanged_listing_after_fresh_checkout_skips_fetch(catalog, capsys):
+    server, source = catalog
+    run_source(source)
+    run_source(source)
+    fresh_checkout(*data_files(source))
+    capsys.readouterr()
+
+    before = data_files(source)
+    run_source(source)
+    assert "listing is unchanged since the last run; nothing to fetch" in capsys.readouterr().out
+    assert data_files(source) == before
+
+    set_catalog(server, range(1, 43))
+    run_source(source)
+    assert "Fetching 2 new and 0 modified datasets" in capsys.readouterr().out
+
+
+def test_sort_datasets_keeps_every_cell(tmp_path):
+    import random
+
+    import pandas as pd
+    from nada_server import synthetic_export
+    from orchestrators.fetch_datasets import read_datasets, sort_datasets
+    from schemas.column_mappings import UNHCR_SCHEMA
+    from schemas.extractor import SchemaExtractor
+    from storage import csv_format
+
+    extractor = SchemaExtractor(UNHCR_SCHEMA)
+    ids = list(range(1, 301))
+    random.Random(0).shuffle(ids)
+    rows = [extractor.values(synthetic_export(id, UNHCR_SCHEMA)) for id in ids]
+    path = str(tmp_path / "datasets.csv")
+    csv_format.write_frame(pd.DataFrame.from_records(rows, columns=extractor.columns), path)
+
+    expected = str(tmp_path / "expected.csv")
+    csv_format.write_frame(read_datasets(path).sort_values("id", kind="stable"), expected)
+    typed = read_datasets(path, UNHCR_SCHEMA)
+    assert str(typed["id"].dtype) == "Int64"
+    assert any(str(dtype) == "category" for dtype in typed.dtypes)
+
+    sort_datasets(path, UNHCR_SCHEMA)
+    with open(path, "rb") as f, open(expected, "rb") as g:
+        assert f.read() == g.read()
+
+
+def test_streaming_run_matches_in_memory_run(catalog, tmp_path):
+    server, source = catalog
+    in_memory = stand_in_source(server, tmp_path, "in_memory")
+    for ids in (range(1, 41), [id for id in range(1, 71) if id % 5]):
+        set_catalog(server, ids)
+        run_source(source, streaming=True)
+        run_source(in_memory, streaming=False)
+        for name in ("datasets.csv", "changeset.json", "state.csv"):
+            with open(source.data_path + name, "rb") as f, open(in_memory.data_path + name, "rb") as g:
+                assert f.read() == g.read(), name
+
+
+def test_unsorted_datasets_file_is_sorted_before_the_merge(catalog, tmp_path):
+    server, source = catalog
+    plain = stand_in_source(server, tmp_path, "plain")
+    run_source(source)
+    run_source(plain)
+    with open(source.datasets_file, encoding="utf-8") as f:
+        header, *rows = f.readlines()
+    with open(source.datasets_file, "w", encoding="utf-8") as f:
+        f.writelines([header] + rows[::-1])
+
+    set_catalog(server, range(1, 46))
+    run_source(source)
+    run_source(plain)
+    with open(source.datasets_file, "rb") as f, open(plain.datasets_file, "rb") as g:
+        assert f.read() == g.read()
@@ -0,0 +1,27 @@
+import pytest
+
+from orchestrators import fetch_engine
+from sources import http_client
+
+
+def collect(source, mode, ids):
+    fetch_function = source.fetch_dataset_async if mode == "async" else source.fetch_dataset
+    return {id: (data, error) for id, data, error in fetch_engine.fetch_results(ids, fetch_function, mode, 4)}
+
+
+@pytest.mark.parametrize("mode", fetch_engine.FETCH_MODES)
+def test_engine_yields_every_id_once(catalog, mode):
+    server, source = catalog
+    source.cache = None
+    results = collect(source, mode, list(range(1, 41)) + [99])
+    assert sorted(results) == list(range(1, 41)) + [99]
+    assert all(data["id"] == id and error is None for id, (data, error) in results.items() if id != 99)
+    data, error = results[99]
+    assert data is None and http_client.status_of(error) == 404
+
+
+def test_engines_agree(catalog):
+    server, source = catalog
+    source.cache = None
+    ids = list(range(1, 41))
+    assert collect(source, "threads", ids) == collect(source, "async", ids)
@@ -0,0 +1,65 @@
+import asyncio
+import json
+
+import pytest
+
+from nada_server import start_server
+from sources import http_client
+from sources.response_cache import ResponseCache
+
+
+def fetch(mode, url, cache, key):
+    if mode == "threads":
+        return http_client.get_json(url, cache=cache, key=key)
+
+    async def fetch_async():
+        async with http_client.open_async_session(2) as session:
+            return await http_client.get_json_async(session, url, cache=cache, key=key)
+    return asyncio.run(fetch_async())
+
+
+@pytest.fixture
+def recorded(tmp_path):
+    """A stand-in server replaying 1.json (a JSON export) and 2.json (an HTML error page)."""
+    directory = tmp_path / "recorded"
+    directory.mkdir()
+    (directory / "1.json").write_text(json.dumps({"id": 1, "title": "Kenya"}))
+    (directory / "2.json").write_text("<html>Service unavailable</html>")
+    server = start_server(recorded=str(directory))
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def export_url(server, id):
+    return f"{server.base_url}/index.php/metadata/export/{id}/json"
+
+
+@pytest.mark.parametrize("mode", ["threads", "async"])
+def test_body_that_is_not_json_is_not_cached(recorded, tmp_path, mode):
+    cache = ResponseCache("test", root=str(tmp_path))
+    with pytest.raises(ValueError):
+        fetch(mode, export_url(recorded, 2), cache, 2)
+    assert cache.lookup(2) is None and cache.load(2) is None
+
+
+@pytest.mark.parametrize("mode", ["threads", "async"])
+def test_not_modified_is_answered_from_the_cache(recorded, tmp_path, monkeypatch, mode):
+    cache = ResponseCache("test", root=str(tmp_path))
+    assert fetch(mode, export_url(recorded, 1), cache, 1) == {"id": 1, "title": "Kenya"}
+    assert cache.conditional_headers(1)
+
+    revalidated = []
+    original = cache.revalidated
+    monkeypatch.setattr(cache, "revalidated", lambda key: revalidated.append(key) or original(key))
+    assert fetch(mode, export_url(recorded, 1), cache, 1) == {"id": 1, "title": "Kenya"}
+    assert revalidated == [1]
+
+    # A 304 for a corrupt cached body falls back to a full fetch, which stores it again.
+    with open(cache._body_path(1), "w") as f:
+        f.write("{}")
+    assert fetch(mode, export_url(recorded, 1), cache, 1) == {"id": 1, "title": "Kenya"}
+    assert revalidated == [1, 1]
+    assert cache.load(1) is not None
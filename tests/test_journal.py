@@ -0,0 +1,51 @@
+import os
+
+import pytest
+
+from conftest import run_source, stand_in_source
+from orchestrators import fetch_datasets
+from storage import journal
+from storage.journal import Journal
+
+
+def test_replay_skips_torn_lines_and_stale_rows(tmp_path):
+    path = str(tmp_path / "journal.jsonl")
+    writer = Journal(path, sync_every=1)
+    writer.append(1, [1, "a"], "v1", "s1")
+    writer.append(2, [2, "b"], "v1", "s1")
+    writer.append(3, [3, "c"], "v0", "s1")
+    writer.append(1, [1, "a2"], "v1", "s2")
+    writer.close()
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"id": 4, "schema": "v1", "row": [4')
+
+    assert Journal(path).replay("v1") == {1: [1, "a2"], 2: [2, "b"]}
+    assert Journal(path).replay("v1", {1: "s1", 2: "s2"}) == {1: [1, "a"]}
+    Journal(path).clear()
+    assert Journal(path).replay("v1") == {}
+
+
+def test_interrupted_run_resumes_from_journal(catalog, tmp_path, monkeypatch, capsys):
+    server, source = catalog
+    plain = stand_in_source(server, tmp_path, "plain")
+    run_source(plain)
+
+    def crash(*args, **kwargs):
+        raise RuntimeError("killed while writing")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(fetch_datasets.spill_files, "merge_sorted", crash)
+        with pytest.raises(RuntimeError):
+            run_source(source)
+    assert os.path.exists(journal.journal_path(source.name))
+
+    fetched = []
+    fetch_dataset = source.fetch_dataset
+    monkeypatch.setattr(source, "fetch_dataset", lambda id: fetched.append(id) or fetch_dataset(id))
+    capsys.readouterr()
+    run_source(source)
+    assert "Resuming from journal: 40 datasets already fetched" in capsys.readouterr().out
+    assert fetched == []
+    with open(source.datasets_file, "rb") as f, open(plain.datasets_file, "rb") as g:
+        assert f.read() == g.read()
+    assert not os.path.exists(journal.journal_path(source.name))
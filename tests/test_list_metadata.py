@@ -0,0 +1,29 @@
+import pandas as pd
+import pytest
+
+from conftest import set_catalog
+from orchestrators import list_metadata
+
+
+def test_listing_is_fetched_page_by_page(catalog):
+    server, source = catalog
+    pages = []
+    df = list_metadata.fetch_metadata_list(source, on_page=lambda rows: pages.append(len(rows)))
+    assert sorted(pages) == [10, 15, 15]
+    assert sorted(df["id"]) == list(range(1, 41))
+
+
+def test_listing_that_does_not_add_up_is_refused(catalog):
+    server, source = catalog
+    server.catalog_size = 41
+    with pytest.raises(list_metadata.InconsistentListingError):
+        list_metadata.fetch_metadata_list(source)
+
+
+def test_empty_listing_is_saved_with_its_columns(catalog):
+    server, source = catalog
+    set_catalog(server, [])
+    df = list_metadata.list_source(source)
+    assert df.empty
+    saved = pd.read_csv(source.metadata_file)
+    assert list(saved.columns) == list_metadata.LISTING_COLUMNS and saved.empty
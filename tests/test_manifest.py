@@ -0,0 +1,65 @@
+import os
+
+import pytest
+
+from conftest import fresh_checkout
+from orchestrators import planner
+from storage.manifest import Manifest, file_signature
+
+
+def write(path, text):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        f.write(text)
+    return str(path)
+
+
+@pytest.fixture
+def files(tmp_path):
+    metadata = write(tmp_path / "metadata.csv", "id,idno,created,changed\n1,A,2020,2021\n2,B,2020,2022\n3,C,2020,2023\n")
+    datasets = write(tmp_path / "datasets.csv", "id,title\n1,one\n2,two\n")
+    return metadata, datasets
+
+
+def test_signature_follows_content_not_mtime(tmp_path):
+    path = write(tmp_path / "a.csv", "id\n1\n")
+    signature = file_signature(path)
+    fresh_checkout(path)
+    assert file_signature(path) == signature
+    write(path, "id\n2\n")
+    assert file_signature(path) != signature
+    assert file_signature(str(tmp_path / "missing.csv")) is None
+
+
+def test_fresh_checkout_does_not_reseed(state_root, files, monkeypatch):
+    metadata, datasets = files
+    manifest = planner.open_manifest("src", metadata, datasets)
+    work = planner.plan(manifest)
+    assert (work.added, work.modified, work.removed) == ([3], [], [])
+    manifest.stage([], [])
+    planner.commit(manifest, datasets)
+    manifest.close()
+
+    fresh_checkout(metadata, datasets, planner.state_path(datasets))
+
+    def fail(*args, **kwargs):
+        raise AssertionError("re-read after a checkout that changed no content")
+    monkeypatch.setattr(Manifest, "seed", fail)
+    monkeypatch.setattr(Manifest, "record_listing", fail)
+    manifest = planner.open_manifest("src", metadata, datasets)
+    assert manifest.stored_ids() == {1, 2}
+    assert planner.plan(manifest).added == [3]
+    manifest.close()
+
+
+def test_edited_datasets_file_reseeds(state_root, files):
+    metadata, datasets = files
+    manifest = planner.open_manifest("src", metadata, datasets)
+    manifest.stage([], [])
+    planner.commit(manifest, datasets)
+    manifest.close()
+
+    write(datasets, "id,title\n1,one\n2,two\n3,three\n")
+    manifest = planner.open_manifest("src", metadata, datasets)
+    assert manifest.stored_ids() == {1, 2, 3}
+    assert planner.plan(manifest).added == []
+    manifest.close()
@@ -0,0 +1,39 @@
+import pandas as pd
+
+from storage import csv_format, nested
+
+VALUES = [
+    [{"abbreviation": "KEN", "name": "Kenya"}],
+    {"start": "2020", "end": None},
+    [{"keyword": "réfugiés", "vocab": ""}, {"keyword": "camps"}],
+]
+
+
+def test_cells_are_canonical_json():
+    assert csv_format.format_cell(VALUES[0]) == '[{"abbreviation":"KEN","name":"Kenya"}]'
+    assert csv_format.format_cell(VALUES[2]).startswith('[{"keyword":"réfugiés"')
+
+
+def test_decode_column_reads_json_repr_and_plain_cells():
+    cells = [csv_format.format_cell(value) for value in VALUES] + [repr(VALUES[0]), "[Draft] title", "", None]
+    decoded = nested.decode_column(pd.Series(cells)).tolist()
+    assert decoded == VALUES + [VALUES[0], "[Draft] title", None, None]
+    assert decoded == [nested.decode_cell(cell) for cell in cells]
+
+
+def test_upgrade_file_rewrites_only_legacy_cells(tmp_path):
+    path = tmp_path / "datasets.csv"
+    df = pd.DataFrame({"id": [1, 2], "nation": [repr(VALUES[0]), csv_format.format_cell(VALUES[0])],
+                       "title": [repr(VALUES[0]), "x"]})
+    csv_format.write_frame(df, str(path))
+
+    assert nested.upgrade_file(str(path), ["nation"]) == 1
+    upgraded = pd.read_csv(path, dtype=str)
+    assert upgraded["nation"].tolist() == [csv_format.format_cell(VALUES[0])] * 2
+    assert upgraded["title"][0] == repr(VALUES[0])
+    assert nested.upgrade_file(str(path), ["nation"]) == 0
+
+
+def test_merge_column_joins_every_entry():
+    merged = nested.merge_column(pd.Series([csv_format.format_cell(VALUES[2]), ""], name="keywords"))
+    assert merged.to_dict("list") == {"keywords.keyword": ["réfugiés;camps", ""], "keywords.vocab": ["", ""]}
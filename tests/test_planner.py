@@ -0,0 +1,50 @@
+import json
+import logging
+
+import pandas as pd
+
+import nada_server
+from conftest import run_source, set_catalog
+from storage.changeset import changeset_path
+
+
+def stored_ids(source):
+    return pd.read_csv(source.datasets_file, usecols=["id"])["id"].tolist()
+
+
+def test_changed_timestamps_and_removals_are_planned(catalog, monkeypatch, capsys):
+    server, source = catalog
+    run_source(source)
+    capsys.readouterr()
+
+    listing_row = nada_server.synthetic_listing_row
+
+    def edited_row(id):
+        row = listing_row(id)
+        if id in (3, 5):
+            row["changed"] = "2026-01-01T00:00:00+00:00"
+        return row
+
+    monkeypatch.setattr(nada_server, "synthetic_listing_row", edited_row)
+    set_catalog(server, [id for id in range(1, 41) if id not in (7, 8)])
+    run_source(source)
+    assert "Fetching 0 new and 2 modified datasets out of 38 total; removing 2" in capsys.readouterr().out
+    assert stored_ids(source) == [id for id in range(1, 41) if id not in (7, 8)]
+    with open(changeset_path(source.datasets_file), encoding="utf-8") as f:
+        assert json.load(f) == {"added": [], "modified": {}, "removed": [7, 8]}
+    state = pd.read_csv(source.data_path + "state.csv", dtype=str).set_index("id")
+    assert state.loc["3", "changed"] == "2026-01-01T00:00:00+00:00"
+
+    # The same listing again plans nothing.
+    run_source(source)
+    assert "nothing to fetch" in capsys.readouterr().out
+
+
+def test_listing_that_loses_most_rows_is_not_pruned(catalog, caplog):
+    server, source = catalog
+    run_source(source)
+    set_catalog(server, range(1, 11))
+    with caplog.at_level(logging.WARNING):
+        run_source(source)
+    assert "Listing would remove 30 of 40 datasets; skipping pruning for this run" in caplog.text
+    assert stored_ids(source) == list(range(1, 41))
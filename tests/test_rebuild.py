@@ -0,0 +1,41 @@
+import json
+import os
+
+import pytest
+
+from conftest import run_source
+from orchestrators import rebuild
+from schemas.column_mappings import UNHCR_SCHEMA
+from sources.response_cache import ResponseCache
+
+
+def test_flatten_shard_treats_unusable_bodies_as_missing(tmp_path):
+    cache = ResponseCache("test", root=str(tmp_path))
+    cache.store(1, "url", {}, json.dumps({"title": "Kenya"}).encode())
+    cache.store(2, "url", {}, b'["not", "an", "export"]')
+    cache.store(3, "url", {}, b"<html>")
+    for tag_id in (True, False):
+        path = str(tmp_path / f"{tag_id}.csv")
+        written, missing, _ = rebuild.flatten_shard(UNHCR_SCHEMA, cache, tag_id, [1, 2, 3, 4], path)
+        assert (written, missing) == ([1], [2, 3, 4])
+        with open(path, encoding="utf-8") as f:
+            assert f.read().startswith("1,")
+
+
+@pytest.mark.parametrize("layout", ["file", "shards"])
+def test_rebuild_reproduces_fetched_datasets(catalog, tmp_path, monkeypatch, capsys, layout):
+    server, source = catalog
+    source.layout = layout
+    monkeypatch.setattr(rebuild, "CACHE_PATH", str(tmp_path / "cache"))
+    run_source(source)
+    with open(source.datasets_file, "rb") as f:
+        fetched = f.read()
+    os.remove(source.cache._body_path(7))
+    capsys.readouterr()
+
+    assert rebuild.rebuild_source(source, workers=2, catalog=None) == 40
+    with open(source.datasets_file, "rb") as f:
+        assert f.read() == fetched
+    output = capsys.readouterr().out
+    assert "Fetching 1 datasets without a cached export" in output
+    assert "Changeset: 0 added, 0 modified, 0 removed" in output
@@ -0,0 +1,42 @@
+import pandas as pd
+import pytest
+
+from bench_pipeline import bench_source
+from conftest import run_source, stand_in_source
+from nada_server import start_server
+from schemas.column_mappings import UNHCR_SCHEMA
+from sources import registry
+from sources.nada import NadaSource
+
+
+def test_registry_lookups():
+    assert registry.names() == ["worldbank", "unhcr"]
+    assert [source.name for source in registry.all_sources(["unhcr"])] == ["unhcr"]
+    with pytest.raises(ValueError, match="Unknown source: ihsn"):
+        registry.get("ihsn")
+    with pytest.raises(ValueError, match="already registered"):
+        registry.register(NadaSource(name="unhcr", label="UNHCR", base_url="http://localhost", schema={}))
+
+
+def test_unregistered_source_uses_its_own_schema(catalog, tmp_path):
+    server, source = catalog
+    source.schema = {column: UNHCR_SCHEMA[column] for column in ("id", "title", "idno", "nation")}
+    run_source(source)
+    datasets = pd.read_csv(source.datasets_file, dtype=str)
+    assert list(datasets.columns) == ["id", "title", "idno", "nation"]
+    assert datasets["id"].astype(int).tolist() == list(range(1, 41))
+    assert datasets["title"].notna().any()
+
+
+def test_list_idno_catalog(tmp_path, state_root):
+    server = start_server(catalog_size=25)
+    try:
+        source = bench_source(registry.get("worldbank"), "wb_test", server.base_url,
+                              str(tmp_path / "data" / "wb_test") + "/", None)
+        source.cache = stand_in_source(server, tmp_path, "wb_test").cache
+        run_source(source)
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert pd.read_csv(source.metadata_file)["id"].tolist() == list(range(1, 26))
+    assert pd.read_csv(source.datasets_file, usecols=["id"])["id"].tolist() == list(range(1, 26))
@@ -0,0 +1,39 @@
+import os
+
+import telemetry
+from conftest import stand_in_source
+from orchestrators import fetch_engine, scheduler
+from orchestrators.scheduler import RunReport
+
+
+def test_critical_path_follows_each_source_back():
+    report = RunReport()
+    start = report.started
+    report.add("a", "listing", start, start + 1)
+    report.add("a", "prefetch", start + 0.5, start + 2)
+    report.add("a", "fetch", start + 2, start + 5)
+    report.add("b", "listing", start, start + 4)
+    report.add("b", "fetch", start + 4, start + 4.5)
+    assert [(stage.source, stage.name) for stage in report.critical_path()] == \
+        [("a", "prefetch"), ("a", "fetch")]
+
+
+def test_sources_run_concurrently_and_fail_alone(catalog, tmp_path, monkeypatch, capsys):
+    server, source = catalog
+    plain = stand_in_source(server, tmp_path, "plain")
+    broken = stand_in_source(server, tmp_path, "broken")
+    broken.list_url = broken.list_url.replace(server.base_url, "http://127.0.0.1:9")
+    monkeypatch.setattr(fetch_engine, "BACKOFF_BASE", 0.01)
+    write_report = telemetry.write_report
+    monkeypatch.setattr(telemetry, "write_report", lambda: write_report(str(tmp_path / "telemetry")))
+
+    report = scheduler.run(sources=[source, broken], pipelined=True)
+    failed = {(stage.source, stage.name) for stage in report.stages if stage.error is not None}
+    assert failed == {("broken", "listing")}
+    assert not os.path.exists(broken.datasets_file)
+    assert "critical path" in capsys.readouterr().out
+
+    scheduler.run_pipeline(plain, RunReport(), pipelined=False)
+    with open(source.datasets_file, "rb") as f, open(plain.datasets_file, "rb") as g:
+        assert f.read() == g.read()
+    assert os.listdir(tmp_path / "telemetry")
@@ -0,0 +1,32 @@
+import os
+
+from conftest import run_source, set_catalog, stand_in_source
+
+
+def read_bytes(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def test_sharded_source_matches_file_layout(catalog, tmp_path):
+    server, sharded = catalog
+    plain = stand_in_source(server, tmp_path, "plain")
+    run_source(sharded)
+    run_source(plain)
+
+    # The first run after the switch splits datasets.csv and keeps it.
+    sharded.layout = "shards"
+    run_source(sharded)
+    assert os.path.exists(sharded.stored_file)
+    assert read_bytes(sharded.datasets_file) == read_bytes(plain.datasets_file)
+
+    # Later runs rewrite the shards and republish datasets.csv from them.
+    set_catalog(server, [id for id in range(1, 261) if id % 7])
+    run_source(sharded)
+    run_source(plain)
+    assert len(os.listdir(sharded.shards_path)) == 3
+    assert read_bytes(sharded.datasets_file) == read_bytes(plain.datasets_file)
+
+    os.remove(sharded.datasets_file)
+    run_source(sharded)
+    assert read_bytes(sharded.datasets_file) == read_bytes(plain.datasets_file)
@@ -0,0 +1,61 @@
+import os
+
+import pytest
+
+from storage.changeset import Changeset
+from storage.spill import RowBatch, SpillFile, UnsortedInputError, merge_sorted
+
+
+def test_spill_file_yields_rows_in_id_order(tmp_path):
+    path = str(tmp_path / "rows.spill")
+    spill = SpillFile(path)
+    for id in (30, 4, 12, 4.0):
+        spill.append(id, f"{int(id)},é{id}\n")
+    assert len(spill) == 3 and spill.ids() == {4, 12, 30}
+    # A later row for the same ID replaces the earlier one.
+    assert list(spill.iter_sorted()) == [(4, "4,é4.0\n"), (12, "12,é12\n"), (30, "30,é30\n")]
+    spill.close()
+    assert not os.path.exists(path)
+
+
+def write_text(path, text):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        f.write(text)
+
+
+def read_text(path):
+    with open(path, newline="", encoding="utf-8") as f:
+        return f.read()
+
+
+def test_merge_sorted_replaces_adds_and_drops(tmp_path):
+    existing = str(tmp_path / "datasets.csv")
+    write_text(existing, 'id,title,notes\n1,a,"two\nlines"\n2,b,\n3,c,x\n7,g,\n')
+    batch = RowBatch()
+    batch.append(5, "5,e,\n")
+    batch.append(3, "3,c,y\n")
+    batch.append(1, '1,a,"two\nlines"\n')
+    changes = Changeset(["id", "title", "notes"])
+
+    output = str(tmp_path / "merged.csv")
+    assert merge_sorted(existing, batch, ["id", "title", "notes"], output, {2}, changes) == 4
+    assert read_text(output) == 'id,title,notes\n1,a,"two\nlines"\n3,c,y\n5,e,\n7,g,\n'
+    assert (changes.added, changes.modified, changes.removed) == ([5], {3: ["notes"]}, [2])
+
+
+def test_merge_sorted_projects_an_older_header(tmp_path):
+    existing = str(tmp_path / "datasets.csv")
+    write_text(existing, "title,id,dropped\na,1,z\nc,3,z\n")
+    batch = RowBatch()
+    batch.append(2, "2,b,\n")
+    output = str(tmp_path / "merged.csv")
+    assert merge_sorted(existing, batch, ["id", "title", "notes"], output) == 3
+    assert read_text(output) == "id,title,notes\n1,a,\n2,b,\n3,c,\n"
+
+
+def test_merge_sorted_refuses_unsorted_input(tmp_path):
+    existing = str(tmp_path / "datasets.csv")
+    write_text(existing, "id,title\n3,c\n1,a\n")
+    with pytest.raises(UnsortedInputError):
+        merge_sorted(existing, RowBatch(), ["id", "title"], str(tmp_path / "merged.csv"))
+    assert read_text(existing) == "id,title\n3,c\n1,a\n"
@@ -0,0 +1,69 @@
+import threading
+
+import pytest
+
+import telemetry
+
+
+@pytest.fixture
+def profiling(monkeypatch):
+    monkeypatch.setattr(telemetry, "_profile_stages", {"flatten"})
+    telemetry.reset()
+    yield
+    telemetry.reset()
+
+
+def work(n):
+    return sum(i * i for i in range(n))
+
+
+def test_profiler_is_safe_across_threads(profiling, tmp_path):
+    profile = telemetry.profiler("src", "flatten")
+    errors = []
+
+    def run():
+        try:
+            for _ in range(200):
+                profile.enable()
+                try:
+                    work(200)
+                finally:
+                    profile.disable()
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=run) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+
+    telemetry.write_report(str(tmp_path))
+    stats = profile.stats()
+    calls = [count for (_, _, name), (_, count, *_) in stats.stats.items() if name == "work"]
+    assert calls == [800]
+    assert (tmp_path / "profile-flatten-src.prof").exists()
+
+
+def test_timed_records_calls_and_records(profiling):
+    @telemetry.timed("extract", records=1)
+    def extract(record):
+        return record
+
+    for i in range(3):
+        extract(i)
+    stage = next(s for s in telemetry.snapshot()["stages"] if s["stage"] == "extract")
+    assert (stage["calls"], stage["records"]) == (3, 3)
+
+
+def test_extractor_values_are_timed(profiling):
+    from nada_server import synthetic_export
+    from schemas.column_mappings import UNHCR_SCHEMA
+    from schemas.extractor import SchemaExtractor
+
+    extractor = SchemaExtractor(UNHCR_SCHEMA)
+    for id in range(1, 6):
+        extractor.values(synthetic_export(id, UNHCR_SCHEMA))
+    stage = next(s for s in telemetry.snapshot()["stages"] if s["stage"] == "extract")
+    assert (stage["source"], stage["calls"], stage["records"]) == (None, 5, 5)
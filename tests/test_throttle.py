@@ -0,0 +1,71 @@
+import time
+
+from orchestrators import fetch_engine
+from sources import throttle
+from sources.throttle import AdaptiveLimiter
+
+
+def serve(limiter, latency=0.01, **outcome):
+    limiter.acquire()
+    limiter.release(latency, **outcome)
+
+
+def test_limit_grows_by_one_per_healthy_window():
+    limiter = AdaptiveLimiter(8, initial=2)
+    for _ in range(2):
+        serve(limiter)
+    assert limiter.limit == 3
+    for _ in range(3 + 4 + 5 + 6 + 7 + 10):
+        serve(limiter)
+    assert limiter.limit == 8
+
+
+def test_limit_holds_while_latency_climbs():
+    limiter = AdaptiveLimiter(8, initial=2)
+    serve(limiter, latency=0.01)
+    for _ in range(20):
+        serve(limiter, latency=1.0)
+    assert limiter.limit == 2
+
+
+def test_throttling_halves_once_per_cooldown(monkeypatch):
+    limiter = AdaptiveLimiter(16, initial=16)
+    for _ in range(5):
+        serve(limiter, throttled=True)
+    assert limiter.limit == 8
+    monkeypatch.setattr(throttle, "MIN_COOLDOWN", 0.0)
+    for _ in range(10):
+        serve(limiter, failed=True)
+    assert limiter.limit == throttle.DEFAULT_MINIMUM
+
+
+def test_retry_after_pauses_every_request():
+    limiter = AdaptiveLimiter(4, initial=4)
+    serve(limiter, throttled=True, retry_after=0.2)
+    started = time.monotonic()
+    limiter.acquire()
+    assert time.monotonic() - started >= 0.15
+    limiter.release(0.01)
+
+
+class Unavailable(ConnectionError):
+    pass
+
+
+def test_transient_failures_are_retried(monkeypatch):
+    monkeypatch.setattr(fetch_engine, "BACKOFF_BASE", 0.001)
+    attempts = {}
+
+    def flaky(id):
+        attempts[id] = attempts.get(id, 0) + 1
+        if id % 2 and attempts[id] < fetch_engine.RETRY_LIMIT:
+            raise Unavailable(f"reset while fetching {id}")
+        if id == 4:
+            raise ValueError("not JSON")
+        return {"id": id}
+
+    results = {id: (data, error) for id, data, error in fetch_engine.fetch_results(range(1, 7), flaky, concurrency=3)}
+    assert {id: data for id, (data, _) in results.items()} == {1: {"id": 1}, 2: {"id": 2}, 3: {"id": 3},
+                                                               4: None, 5: {"id": 5}, 6: {"id": 6}}
+    assert isinstance(results[4][1], ValueError)
+    assert attempts == {1: 4, 2: 1, 3: 4, 4: 1, 5: 4, 6: 1}
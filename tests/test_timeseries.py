@@ -0,0 +1,45 @@
+import os
+
+import pandas as pd
+
+import nada_server
+from orchestrators import list_metadata
+from storage import timeseries
+from storage.timeseries import CounterSeries
+
+COLUMNS = ["total_views", "total_downloads"]
+
+
+def listing(views):
+    return pd.DataFrame({"id": list(views), "total_views": list(views.values()), "total_downloads": 0})
+
+
+def test_only_changed_counters_are_appended(tmp_path):
+    series = CounterSeries(str(tmp_path), COLUMNS)
+    assert series.append(listing({1: 10, 2: 20, 3: 30}), "2025-12-30") == 3
+    assert series.append(listing({1: 10, 2: 21, 3: 30}), "2025-12-31") == 1
+    assert series.append(listing({1: 10, 2: 21, 3: 30}), "2026-01-01") == 0
+    assert series.append(listing({1: 11, 2: 21, 3: 30, 4: 40}), "2026-01-02") == 2
+    assert [os.path.basename(path) for path in series.files()] == ["2025.csv", "2026.csv"]
+
+    assert series.as_of("2025-12-31")["total_views"].to_dict() == {1: 10, 2: 21, 3: 30}
+    assert series.as_of()["total_views"].to_dict() == {1: 11, 2: 21, 3: 30, 4: 40}
+    assert series.history(2)["total_views"].to_dict() == {"2025-12-30": 20, "2025-12-31": 21}
+
+
+def test_counters_leave_metadata_csv_unchanged(catalog, monkeypatch):
+    server, source = catalog
+    list_metadata.list_source(source)
+    with open(source.metadata_file, "rb") as f:
+        before = f.read()
+    assert b"total_views" not in before.splitlines()[0]
+
+    listing_row = nada_server.synthetic_listing_row
+    monkeypatch.setattr(nada_server, "synthetic_listing_row", lambda id: dict(
+        listing_row(id), total_views=listing_row(id)["total_views"] + 1) if id == 5 else listing_row(id))
+    monkeypatch.setattr(timeseries, "today", lambda: "2099-01-01")
+    list_metadata.list_source(source)
+    with open(source.metadata_file, "rb") as f:
+        assert f.read() == before
+    series = CounterSeries(os.path.join(source.data_path, list_metadata.STATS_DIRNAME), COLUMNS)
+    assert series.read(start="2099-01-01")["id"].tolist() == [5]
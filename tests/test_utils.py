@@ -0,0 +1,24 @@
+import pandas as pd
+
+from utils import find_list_columns, merge_dicts
+
+PRODUCERS = [{"name": "UNHCR", "role": ""}, {"name": "WFP", "role": "data"}]
+
+
+def test_merge_dicts_keeps_the_first_dict():
+    # Only the first dict of the list is merged, in legacy repr and JSON cells alike.
+    assert merge_dicts(repr(PRODUCERS)) == {"name": "UNHCR", "role": ""}
+    assert merge_dicts('[{"name":"UNHCR","role":""},{"name":"WFP","role":"data"}]') == {"name": "UNHCR", "role": ""}
+    assert merge_dicts('{"name":"UNHCR"}') == {"name": "UNHCR"}
+    assert merge_dicts(float("nan")) == ""
+    assert merge_dicts(",[]") == ""
+
+
+def test_find_list_columns_reads_every_cell():
+    df = pd.DataFrame({
+        "id": ["1", "2", "3"],
+        "title": ["[{ not a list", "[{'a': 1}] trailing", ""],
+        "keywords": ["", "[{ broken", '[{"keyword":"refugees"}]'],
+        "nation": pd.Series(["[{'name': 'Kenya'}]", None, None], dtype="string"),
+    })
+    assert find_list_columns(df) == ["keywords", "nation"]